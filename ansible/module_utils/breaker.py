@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Circuit breaker for unreachable hosts.
+<ansible.module_utils.remote_management.yama.breaker>
+
+The health records live in one JSON file guarded by a lock file, so every
+Ansible fork shares them. After <threshold> consecutive connection failures
+the breaker of a host opens and connect() fails immediately. Once the backoff
+has passed, a single fork is let through as a probe (half-open); its outcome
+closes the breaker or opens it again with a longer backoff.
+"""
+
+import os
+import time
+import json
+import fcntl
+import random
+from ansible.module_utils.remote_management.yama.object_error import \
+    ErrorObject
+from ansible.module_utils.remote_management.yama.exception import getexcept
+from ansible.module_utils.remote_management.yama.valid import isdir
+from ansible.module_utils.remote_management.yama.strings import readjson
+
+
+class Breaker(ErrorObject):
+    """Per host health records with open, half-open and closed states.
+    """
+    filename = '/tmp/yama/breaker.json'
+    threshold = 1        # Consecutive failures that open the breaker.
+    backoff = 30         # Seconds of the first open period.
+    backoff_max = 3600   # Upper limit of the open period.
+    probe_timeout = 60   # Seconds a half-open probe has to report back.
+
+    def __init__(self, filename='/tmp/yama/breaker.json', threshold=1,
+                 backoff=30, backoff_max=3600):
+        """Initializes a Breaker object.
+
+        :param filename: (str) JSON file shared by every process.
+        :param threshold: (int) Consecutive failures that open the breaker.
+        :param backoff: (int) Seconds of the first open period. It doubles
+            with every further failure.
+        :param backoff_max: (int) Upper limit of the open period.
+        """
+        super(Breaker, self).__init__()
+
+        self.filename = filename
+        self.threshold = max(int(threshold), 1)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    @staticmethod
+    def key(host, port=22):
+        """Builds the record key of a host.
+
+        :param host: (str) Remote host.
+        :param port: (int) SSH Port.
+        :return: (str) host:port
+        """
+        return '{}:{}'.format(host, port)
+
+    def update(self, function):
+        """Runs <function> on the records while holding the lock, and saves
+        them if it returns True.
+
+        :param function: (callable) Receives the records dictionary.
+        :return: (bool) True on success, False on failure.
+        """
+        if not isdir(os.path.dirname(self.filename), True):
+            return self.err(1, self.filename)
+
+        try:
+            with open(self.filename + '.lock', 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                records = readjson(self.filename) or {}
+
+                if function(records):
+                    temp = '{}.{}'.format(self.filename, os.getpid())
+                    with open(temp, 'w') as handler:
+                        json.dump(records, handler)
+                    os.rename(temp, self.filename)
+
+            return True
+
+        except (IOError, OSError):
+            _, message = getexcept()
+            return self.err(2, message)
+
+    def delay(self, failures):
+        """Open period after <failures> consecutive failures, exponential with
+        jitter.
+
+        :param failures: (int) Consecutive failures.
+        :return: (float) Seconds.
+        """
+        exponent = max(failures - self.threshold, 0)
+        delay = min(self.backoff * (2 ** min(exponent, 16)), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def allow(self, host, port=22):
+        """Decides if a connection to host may be attempted. In half-open
+        state only one caller is allowed until it reports back.
+
+        :param host: (str) Remote host.
+        :param port: (int) SSH Port.
+        :return: (bool) True if the connection may be attempted.
+        """
+        key = self.key(host, port)
+        now = time.time()
+        decision = [True]
+
+        def check(records):
+            """Checks and marks the probe.
+            """
+            record = records.get(key)
+
+            if not record or record['failures'] < self.threshold:
+                return False
+
+            if now < record['until']:
+                decision[0] = False
+                return False
+
+            if record.get('probe') and \
+                    now - record['probe'] < self.probe_timeout:
+                decision[0] = False
+                return False
+
+            record['probe'] = now
+            return True
+
+        if not self.update(check):
+            return True  # A broken store must not block connections.
+
+        return decision[0]
+
+    def success(self, host, port=22):
+        """Closes the breaker of host.
+
+        :param host: (str) Remote host.
+        :param port: (int) SSH Port.
+        :return: (bool) True on success, False on failure.
+        """
+        key = self.key(host, port)
+
+        def close(records):
+            """Drops the record.
+            """
+            return records.pop(key, None) is not None
+
+        return self.update(close)
+
+    def failure(self, host, port=22, code=0, message=''):
+        """Records a connection failure of host.
+
+        :param host: (str) Remote host.
+        :param port: (int) SSH Port.
+        :param code: (int) Error code of connect().
+        :param message: (str) Error message.
+        :return: (bool) True on success, False on failure.
+        """
+        key = self.key(host, port)
+        now = time.time()
+
+        def record_failure(records):
+            """Increments the failures and opens the breaker.
+            """
+            record = records.get(key) or {'failures': 0}
+            record['failures'] += 1
+            record['code'] = code
+            record['message'] = message[-256:]
+            record['time'] = now
+            record['until'] = now
+            record['probe'] = None
+
+            if record['failures'] >= self.threshold:
+                record['until'] = now + self.delay(record['failures'])
+
+            records[key] = record
+            return True
+
+        return self.update(record_failure)
+
+    def release(self, host, port=22):
+        """Clears the half-open probe of host without counting a failure, so
+        the next caller may probe again.
+
+        :param host: (str) Remote host.
+        :param port: (int) SSH Port.
+        :return: (bool) True on success, False on failure.
+        """
+        key = self.key(host, port)
+
+        def clear(records):
+            """Drops the probe mark.
+            """
+            record = records.get(key)
+
+            if not record or not record.get('probe'):
+                return False
+
+            record['probe'] = None
+            return True
+
+        return self.update(clear)
+
+    def getstate(self, host, port=22):
+        """Returns the state of the breaker of host.
+
+        :param host: (str) Remote host.
+        :param port: (int) SSH Port.
+        :return: (str) 'closed', 'open' or 'half-open'.
+        """
+        record = (readjson(self.filename) or {}).get(self.key(host, port))
+
+        if not record or record['failures'] < self.threshold:
+            return 'closed'
+
+        if time.time() < record['until']:
+            return 'open'
+
+        return 'half-open'
@@ -0,0 +1,511 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Content-addressed store of exports and backups.
+<ansible.module_utils.remote_management.yama.chunk_store>
+
+Files are cut to chunks at content-defined boundaries (gear hash), so an
+insertion only changes the chunks around it. Every chunk is stored once,
+compressed, under its sha256, and every stored file is a manifest that lists
+its chunks. Identical configurations and firmware of many routers cost the
+space of one.
+
+    <directory>/chunks/<2 hex>/<sha256>          zlib compressed chunk.
+    <directory>/manifests/<host>/<time>.json     Manifest of a file.
+
+Example:
+    store = ChunkStore('/data/store')
+    manifest = store.put('192.0.2.1', handler, 'export.rsc')
+    store.get('192.0.2.1', manifest['time'], '/tmp/export.rsc')
+
+Maintenance:
+    python -m ansible.module_utils.remote_management.yama.chunk_store \\
+        /data/store retention --keep 30 --days 90
+    python -m ansible.module_utils.remote_management.yama.chunk_store \\
+        /data/store gc
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+import zlib
+import errno
+import fcntl
+import hashlib
+import tempfile
+from ansible.module_utils.remote_management.yama.object_error import \
+    ErrorObject
+from ansible.module_utils.remote_management.yama.exception import getexcept
+from ansible.module_utils.remote_management.yama.valid import hasstring, \
+    isdir, isfile
+from ansible.module_utils.remote_management.yama.strings import readjson
+
+# 64 bit gear values of every byte, derived from a fixed seed, so chunk
+# boundaries are the same on every run.
+GEAR = [int(hashlib.sha256('yama-gear-{}'.format(index)).hexdigest()[:16], 16)
+        for index in range(0, 256)]
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def chunks(stream, minsize=2048, avgsize=8192, maxsize=65536, block=65536):
+    """Cuts a stream to content-defined chunks.
+
+    :param stream: (obj / iterable) File-like object with read(), or an
+        iterable of strings.
+    :param minsize: (int) Minimum size of a chunk.
+    :param avgsize: (int) Average size of a chunk, a power of 2.
+    :param maxsize: (int) Maximum size of a chunk.
+    :param block: (int) Bytes read at once from a file-like object.
+    :return: (generator) Chunks.
+    """
+    mask = (avgsize - 1) << (64 - avgsize.bit_length() + 1)
+    # The digest only depends on the last 64 bytes, so the bytes before
+    # them are not hashed at all.
+    skip = max(minsize - 64, 0)
+    gear = GEAR
+    buf = bytearray()
+    digest = 0
+    index = 0
+
+    if hasattr(stream, 'read'):
+        blocks = iter(lambda: stream.read(block), '')
+    else:
+        blocks = stream
+
+    for data in blocks:
+        buf.extend(data)
+
+        while True:
+            if index < skip:
+                if len(buf) < skip:
+                    break
+                index = skip
+
+            end = min(len(buf), maxsize)
+            cut = 0
+
+            while index < end:
+                digest = ((digest << 1) + gear[buf[index]]) & MASK64
+                index += 1
+                if index >= minsize and not digest & mask:
+                    cut = index
+                    break
+
+            if not cut and index >= maxsize:
+                cut = maxsize
+
+            if not cut:
+                break
+
+            yield str(buf[:cut])
+            del buf[:cut]
+            digest = 0
+            index = 0
+
+    if buf:
+        yield str(buf)
+
+
+class ChunkStore(ErrorObject):
+    """Deduplicated files per (host, time), with retention and garbage
+    collection.
+    """
+    directory = '/data/store'
+
+    def __init__(self, directory='/data/store'):
+        """Initializes a ChunkStore object.
+
+        :param directory: (str) Directory of the store.
+        """
+        super(ChunkStore, self).__init__()
+
+        self.directory = directory
+
+    def lock(self, operation):
+        """Locks the store. put() holds a shared lock, retention() and gc()
+        an exclusive one, so no chunk is collected while a file is being
+        stored.
+
+        :param operation: (int) fcntl.LOCK_SH or fcntl.LOCK_EX.
+        :return: (file) Lock file, closing it releases the lock. None on
+            error.
+        """
+        if not isdir(self.directory, True):
+            self.err(1, self.directory)
+            return None
+
+        try:
+            handler = open(os.path.join(self.directory, '.lock'), 'a')
+            fcntl.flock(handler, operation)
+            return handler
+
+        except IOError:
+            _, message = getexcept()
+            self.err(2, message)
+            return None
+
+    def chunkpath(self, digest):
+        """Returns the path of a chunk.
+
+        :param digest: (str) sha256 of the chunk.
+        :return: (str) Path.
+        """
+        return os.path.join(self.directory, 'chunks', digest[:2], digest)
+
+    def manifestpath(self, host, stamp=None):
+        """Returns the path of a manifest, or the manifest directory of host.
+
+        :param host: (str) Host.
+        :param stamp: (str) Time of the file.
+        :return: (str) Path.
+        """
+        path = os.path.join(self.directory, 'manifests',
+                            host.replace('/', '_'))
+
+        if stamp is None:
+            return path
+
+        return os.path.join(path, stamp + '.json')
+
+    def put(self, host, stream, name='', abort=None):
+        """Stores a file. Temporary files have unique names, so several
+        threads and processes can store at the same time.
+
+        :param host: (str) Host.
+        :param stream: (obj / iterable) File-like object with read(), or an
+            iterable of strings.
+        :param name: (str) Name of the file, e.g. its remote path.
+        :param abort: (callable) Called when the stream is exhausted. If it
+            returns True, the stream was incomplete and no manifest is
+            written. Its chunks stay until <self.gc>.
+        :return: (dict) Manifest with 'host', 'time', 'name', 'size',
+            'sha256', 'chunks' and the number of 'new' chunks. None on error.
+        """
+        if not hasstring(host):
+            self.err(1, host)
+            return None
+
+        lock = self.lock(fcntl.LOCK_SH)
+        if lock is None:
+            return None
+
+        manifest = {'host': host, 'name': name, 'size': 0, 'chunks': [],
+                    'new': 0}
+        digest = hashlib.sha256()
+
+        try:
+            for chunk in chunks(stream):
+                key = hashlib.sha256(chunk).hexdigest()
+                path = self.chunkpath(key)
+
+                if not isfile(path):
+                    if not isdir(os.path.dirname(path), True):
+                        self.err(2, path)
+                        return None
+
+                    self.writefile(path, zlib.compress(chunk))
+                    manifest['new'] += 1
+
+                digest.update(chunk)
+                manifest['size'] += len(chunk)
+                manifest['chunks'].append(key)
+
+            if abort is not None and abort():
+                self.err(5, name)
+                return None
+
+            manifest['sha256'] = digest.hexdigest()
+
+            path = self.manifestpath(host)
+            if not isdir(path, True):
+                self.err(3, path)
+                return None
+
+            now = time.time()
+            while True:
+                manifest['time'] = time.strftime(
+                    '%Y%m%dT%H%M%S', time.gmtime(now)) + \
+                    '.{:06d}Z'.format(int(now % 1 * 1000000))
+                if self.writefile(self.manifestpath(host, manifest['time']),
+                                  json.dumps(manifest), False):
+                    break
+                now += 0.000001
+
+        except (IOError, OSError):
+            _, message = getexcept()
+            self.err(4, message)
+            return None
+
+        finally:
+            lock.close()
+
+        return manifest
+
+    @staticmethod
+    def writefile(path, data, replace=True):
+        """Writes a file under a unique temporary name in its directory and
+        moves it to <path>, so it is never seen half written.
+
+        :param path: (str) File.
+        :param data: (str) Content.
+        :param replace: (bool) Replaces an existing <path>.
+        :return: (bool) True, False when <path> exists and <replace> is
+            False. Raises on failure.
+        """
+        descriptor, temp = tempfile.mkstemp(prefix='.', suffix='.tmp',
+                                            dir=os.path.dirname(path))
+        try:
+            with os.fdopen(descriptor, 'wb') as handler:
+                handler.write(data)
+            os.chmod(temp, 0644)
+
+            if replace:
+                os.rename(temp, path)
+                return True
+
+            os.link(temp, path)  # Fails if it exists, unlike rename
+            return True
+
+        except OSError as error:
+            if error.errno == errno.EEXIST and not replace:
+                return False
+            raise
+
+        finally:
+            if isfile(temp):
+                os.remove(temp)
+
+    @staticmethod
+    def summary(manifest):
+        """Drops the chunk list of a manifest, for reports.
+
+        :param manifest: (dict) Manifest.
+        :return: (dict) Manifest without 'chunks'.
+        """
+        return dict((key, value) for key, value in manifest.items()
+                    if key != 'chunks')
+
+    def manifest(self, host, stamp=None):
+        """Loads the manifest of a file.
+
+        :param host: (str) Host.
+        :param stamp: (str) Time of the file, the latest when None.
+        :return: (dict) Manifest. None on error.
+        """
+        if stamp is None:
+            stamps = self.list(host)
+            if not stamps:
+                self.err(1, host)
+                return None
+            stamp = stamps[-1]['time']
+
+        manifest = readjson(self.manifestpath(host, stamp))
+
+        if manifest is None:
+            self.err(2, stamp)
+
+        return manifest
+
+    def read(self, host, stamp=None):
+        """Reads a stored file, chunk by chunk.
+
+        :param host: (str) Host.
+        :param stamp: (str) Time of the file, the latest when None.
+        :return: (generator) Chunks. It stops early on a missing or corrupt
+            chunk, with an error recorded.
+        """
+        manifest = self.manifest(host, stamp)
+
+        if manifest is None:
+            return
+
+        for key in manifest['chunks']:
+            try:
+                with open(self.chunkpath(key), 'rb') as handler:
+                    chunk = zlib.decompress(handler.read())
+
+            except (IOError, zlib.error):
+                _, message = getexcept()
+                self.err(1, message)
+                return
+
+            if hashlib.sha256(chunk).hexdigest() != key:
+                self.err(2, key)
+                return
+
+            yield chunk
+
+    def get(self, host, stamp=None, filename=''):
+        """Restores a stored file.
+
+        :param host: (str) Host.
+        :param stamp: (str) Time of the file, the latest when None.
+        :param filename: (str) File to write.
+        :return: (bool) True on success, False on failure.
+        """
+        if not (hasstring(filename) and
+                isdir(os.path.dirname(os.path.abspath(filename)), True)):
+            return self.err(1, filename)
+
+        errc = self.errc()
+
+        try:
+            with open(filename, 'wb') as handler:
+                for chunk in self.read(host, stamp):
+                    handler.write(chunk)
+
+        except IOError:
+            _, message = getexcept()
+            return self.err(2, message)
+
+        return self.errc() == errc
+
+    def list(self, host=None):
+        """Lists the stored files.
+
+        :param host: (str) Host, all hosts when None.
+        :return: (list) Dictionaries with 'host', 'time', 'name' and 'size',
+            oldest first per host.
+        """
+        results = []
+        path = os.path.join(self.directory, 'manifests')
+
+        if host is not None:
+            hosts = [host.replace('/', '_')]
+        elif isdir(path):
+            hosts = sorted(os.listdir(path))
+        else:
+            hosts = []
+
+        for name in hosts:
+            if not isdir(os.path.join(path, name)):
+                continue
+
+            for filename in sorted(os.listdir(os.path.join(path, name))):
+                if not filename.endswith('.json'):
+                    continue
+
+                manifest = readjson(os.path.join(path, name, filename)) or {}
+                results.append({'host': manifest.get('host', name),
+                                'time': filename[:-5],
+                                'name': manifest.get('name'),
+                                'size': manifest.get('size')})
+
+        return results
+
+    def retention(self, keep=0, days=0, host=None):
+        """Removes old files. Their chunks stay until <self.gc>.
+
+        :param keep: (int) Files kept per host and name, all when 0.
+        :param days: (int) Files older than that are removed, unless they
+            are within <keep>. Never when 0.
+        :param host: (str) Host, all hosts when None.
+        :return: (int) Number of removed files. None on error.
+        """
+        lock = self.lock(fcntl.LOCK_EX)
+        if lock is None:
+            return None
+
+        groups = {}
+        removed = 0
+        limit = time.strftime('%Y%m%dT%H%M%S',
+                              time.gmtime(time.time() - days * 86400))
+
+        try:
+            for item in self.list(host):
+                groups.setdefault((item['host'], item['name']),
+                                  []).append(item)
+
+            for items in groups.values():
+                for index, item in enumerate(reversed(items)):
+                    if index < keep or not (keep or days):
+                        continue  # Within the newest <keep>, or no policy
+                    if days and item['time'] >= limit:
+                        continue
+
+                    os.remove(self.manifestpath(item['host'], item['time']))
+                    removed += 1
+
+        except OSError:
+            _, message = getexcept()
+            self.err(1, message)
+            return None
+
+        finally:
+            lock.close()
+
+        return removed
+
+    def gc(self):
+        """Removes the chunks that no manifest refers to.
+
+        :return: (int) Number of removed chunks. None on error.
+        """
+        lock = self.lock(fcntl.LOCK_EX)
+        if lock is None:
+            return None
+
+        removed = 0
+        referenced = set()
+
+        try:
+            for item in self.list():
+                manifest = readjson(self.manifestpath(item['host'],
+                                                      item['time']))
+                if manifest is None:
+                    self.err(1, item['time'])
+                    return None  # Never collect with an unreadable manifest
+                referenced.update(manifest['chunks'])
+
+            path = os.path.join(self.directory, 'chunks')
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if name not in referenced:
+                        os.remove(os.path.join(root, name))
+                        removed += 1
+
+        except (IOError, OSError):
+            _, message = getexcept()
+            self.err(2, message)
+            return None
+
+        finally:
+            lock.close()
+
+        return removed
+
+
+def main():
+    """Command line entry point for the maintenance of a store.
+    """
+    parser = argparse.ArgumentParser(description='Yama chunk store')
+    parser.add_argument('directory')
+    parser.add_argument('action', choices=['list', 'retention', 'gc'])
+    parser.add_argument('--host')
+    parser.add_argument('--keep', type=int, default=0)
+    parser.add_argument('--days', type=int, default=0)
+    args = parser.parse_args()
+
+    store = ChunkStore(args.directory)
+
+    if args.action == 'list':
+        result = store.list(args.host)
+    elif args.action == 'retention':
+        result = store.retention(args.keep, args.days, args.host)
+    else:
+        result = store.gc()
+
+    print json.dumps(result)
+
+    if store.errc():
+        sys.stderr.write(store.errors() + '\n')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Persistent worker that keeps sessions warm between tasks.
+<ansible.module_utils.remote_management.yama.daemon>
+
+Every mt_* task starts a new interpreter, imports paramiko and authenticates
+again. The daemon is started on first use, listens on a Unix socket and keeps
+the authenticated Router/SFTPClient objects for later tasks. Modules become
+thin clients that send one JSON line and receive one JSON line back.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import hashlib
+import argparse
+import threading
+import SocketServer
+from ansible.module_utils.remote_management.yama.object_error import \
+    ErrorObject
+from ansible.module_utils.remote_management.yama.exception import getexcept
+from ansible.module_utils.remote_management.yama.strings import writefile, \
+    ifnull
+from ansible.module_utils.remote_management.yama.mikrotik import Router
+from ansible.module_utils.remote_management.yama.sftp_client import SFTPClient
+from ansible.module_utils.remote_management.yama.session import Session
+from ansible.module_utils.remote_management.yama.breaker import Breaker
+from ansible.module_utils.remote_management.yama.export_archive import \
+    ExportArchive
+from ansible.module_utils.remote_management.yama.chunk_store import \
+    ChunkStore
+from ansible.module_utils.remote_management.yama.daemon_client import \
+    SOCKET, socket_check
+
+
+class SessionCache(ErrorObject):
+    """Authenticated sessions, keyed by (kind, host, port, username, auth).
+    """
+    max_host = 2        # Sessions per host, busy and idle together.
+    idle_timeout = 300  # Seconds an idle session is kept.
+    wait_timeout = 60   # Seconds to wait for a busy session to be released.
+
+    def __init__(self, max_host=2, idle_timeout=300):
+        """Initializes a SessionCache object.
+
+        :param max_host: (int) Maximum number of sessions per host.
+        :param idle_timeout: (int) Seconds before an idle session is evicted.
+        """
+        super(SessionCache, self).__init__()
+
+        self.max_host = max_host
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.condition = threading.Condition()
+
+    @staticmethod
+    def key(kind, connection):
+        """Builds the key of a session. Credentials are hashed, so a session
+        is never handed to a request with different credentials.
+
+        :param kind: (str) 'router', 'session' or 'sftp'.
+        :param connection: (dict) Connection parameters.
+        :return: (tuple) Session key.
+        """
+        auth = hashlib.sha1('\0'.join([
+            ifnull(connection.get('password'), ''),
+            ifnull(connection.get('pkey_string'), ''),
+            ifnull(connection.get('pkey_file'), ''),
+            ifnull(connection.get('branch_file'), '')])).hexdigest()
+
+        return (kind, connection['host'], int(connection.get('port') or 22),
+                connection.get('username'), auth)
+
+    def hostcount(self, host):
+        """Counts the sessions, busy or idle, that belong to <host>.
+
+        :param host: (str) Remote host.
+        :return: (int) Number of sessions.
+        """
+        count = 0
+
+        for key in self.sessions:
+            if key[1] == host:
+                count += len(self.sessions[key])
+
+        return count
+
+    def acquire(self, kind, connection, errors=None):
+        """Hands out an idle session or creates a new one. Blocks while the
+        host has reached <self.max_host> sessions.
+
+        :param kind: (str) 'router', 'session' or 'sftp'.
+        :param connection: (dict) Connection parameters.
+        :param errors: (obj) ErrorObject of the request that receives the
+            errors, so they do not leak to other requests. <self> when None.
+        :return: (obj) Router, Session or SFTPClient, None on failure.
+        """
+        if errors is None:
+            errors = self
+
+        key = self.key(kind, connection)
+        deadline = time.time() + self.wait_timeout
+
+        with self.condition:
+            while True:
+                for entry in self.sessions.get(key, []):
+                    if not entry['busy']:
+                        entry['busy'] = True
+                        entry['device'].err0()
+                        if kind != 'sftp':  # SSHClient.history never shrinks
+                            entry['device'].history = []
+                        return entry['device']
+
+                if self.hostcount(key[1]) < self.max_host:
+                    break
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    errors.err(1, key[1])
+                    return None
+                self.condition.wait(remaining)
+
+            entry = {'device': None, 'busy': True, 'used': time.time()}
+            self.sessions.setdefault(key, []).append(entry)
+
+        device = None
+
+        try:
+            if kind in ('router', 'session'):
+                factory = Session if kind == 'session' else Router
+                device = factory(connection['host'],
+                                 port=connection.get('port') or 22,
+                                 username=connection.get('username'),
+                                 password=connection.get('password'),
+                                 pkey_string=connection.get('pkey_string'),
+                                 pkey_file=connection.get('pkey_file'),
+                                 branch_file=connection.get('branch_file'))
+            else:
+                device = SFTPClient(connection['host'],
+                                    port=connection.get('port') or 22,
+                                    username=connection.get('username'),
+                                    password=connection.get('password'),
+                                    pkey_string=connection.get('pkey_string'),
+                                    pkey_file=connection.get('pkey_file'))
+
+            if device.status < 0:
+                errors.err(3, device.errors())
+                device = None
+
+        except Exception:
+            _, message = getexcept(False)
+            errors.err(2, message)
+
+        with self.condition:
+            if device is None:
+                self.sessions[key].remove(entry)
+                self.condition.notify_all()
+                return None
+            entry['device'] = device
+
+        return device
+
+    def release(self, device, drop=False):
+        """Returns a session to the cache.
+
+        :param device: (obj) Router or SFTPClient from <self.acquire>.
+        :param drop: (bool) Disconnects and forgets the session.
+        :return: (bool) True on success, False on failure.
+        """
+        with self.condition:
+            for key in self.sessions:
+                for entry in self.sessions[key]:
+                    if entry['device'] is device:
+                        entry['busy'] = False
+                        entry['used'] = time.time()
+
+                        if drop:
+                            self.sessions[key].remove(entry)
+                            device.disconnect()
+
+                        self.condition.notify_all()
+                        return True
+
+        return self.err(1)
+
+    def evict(self, force=False):
+        """Disconnects idle sessions older than <self.idle_timeout>.
+
+        :param force: (bool) Evicts every idle session.
+        :return: (int) Number of evicted sessions.
+        """
+        evicted = []
+        limit = time.time() - self.idle_timeout
+
+        with self.condition:
+            for key in list(self.sessions):
+                for entry in list(self.sessions[key]):
+                    if entry['busy']:
+                        continue
+                    if force or entry['used'] < limit:
+                        self.sessions[key].remove(entry)
+                        evicted.append(entry['device'])
+
+                if not self.sessions[key]:
+                    del self.sessions[key]
+
+            self.condition.notify_all()
+
+        for device in evicted:
+            device.disconnect()
+
+        return len(evicted)
+
+
+def execute(cache, request):
+    """Serves one request with a cached session. It mirrors the logic of the
+    corresponding module.
+
+    :param cache: (obj) SessionCache.
+    :param request: (dict) Request with keys 'action', 'connection' and
+        'params'.
+    :return: (dict) Arguments for <module.exit_json>.
+    """
+    messages = []
+    result = []
+    changed = 0
+    unreachable = 1
+    failed = 0
+
+    action = request.get('action')
+    params = request.get('params') or {}
+    kind = 'router'
+    if action in ('upload', 'download'):
+        kind = 'session' if params.get('commands') else 'sftp'
+    elif action == 'bulkload':
+        kind = 'session'
+
+    errors = ErrorObject()
+    device = cache.acquire(kind, request['connection'], errors)
+
+    if device is None:
+        return {'changed': 0, 'unreachable': 1, 'failed': 1, 'result': [],
+                'msg': errors.errors()}
+
+    device.breaker = None
+    if request['connection'].get('breaker_file'):
+        device.breaker = Breaker(request['connection']['breaker_file'])
+
+    if device.connect():
+        unreachable = 0
+
+        if action == 'commands' and params.get('store'):
+            commands = params['commands']
+            store = ChunkStore(params['store'])
+            manifest = device.command_tostore(commands[0], store,
+                                              params.get('output'),
+                                              params.get('raw'))
+            if manifest is not None:
+                result = [store.summary(manifest)]
+                if len(commands) > 1:
+                    result += device.commands(commands[1:], params.get('raw'),
+                                              shell=params.get('shell')) or []
+
+        elif action == 'commands' and params.get('output') and \
+                params.get('stream'):
+            commands = params['commands']
+            count = device.command_tofile(commands[0], params['output'],
+                                          params.get('raw'))
+            if count is None:
+                messages.append('Unable to create Output File.')
+            else:
+                result = [count]
+                if len(commands) > 1:
+                    result += device.commands(commands[1:], params.get('raw'),
+                                              shell=params.get('shell')) or []
+
+        elif action == 'commands':
+            result = device.commands(params['commands'], params.get('raw'),
+                                     shell=params.get('shell'),
+                                     parallel=params.get('parallel') or 0)
+
+            if result and params.get('output'):
+                if not writefile(params['output'], result[0]):
+                    messages.append('Unable to create Output File.')
+
+        elif action == 'get':
+            device.wireformat = params.get('wireformat') or 'csv'
+
+            if params.get('output'):
+                result = device.getvalues_tofile(
+                    params['branch'], params['properties'], params['output'],
+                    ifnull(params.get('find'), ''),
+                    fmt='csv' if params.get('format') == 'csv' else 'jsonl')
+            elif params.get('chunk'):
+                result = device.getvalues_chunked(
+                    params['branch'], params['properties'],
+                    ifnull(params.get('find'), ''),
+                    size=params['chunk'], parallel=params.get('parallel') or 4,
+                    checkpoint=params.get('checkpoint'),
+                    csvout=params.get('format') == 'csv',
+                    columnar=params.get('format') == 'columns')
+            else:
+                result = device.getvalues(
+                    params['branch'], params['properties'],
+                    ifnull(params.get('find'), ''),
+                    csvout=params.get('format') == 'csv',
+                    columnar=params.get('format') == 'columns')
+
+            if params.get('format') == 'columns' and result is not None:
+                result = result.todict()
+
+        elif action == 'set':
+            find = ifnull(params.get('find'), '')
+
+            if params['action'] == 'add':
+                result = device.addentry(params['branch'], params['propvals'])
+
+            elif params['action'] == 'remove':
+                result = device.removeentry(params['branch'], find)
+
+            elif params['action'] == 'set':
+                result = device.setvalues(params['branch'],
+                                          params['propvals'], find)
+
+            if result:
+                changed = 1
+
+        elif action == 'reconcile':
+            result = device.reconcile(params['branch'], params['entries'],
+                                      params.get('purge'),
+                                      params.get('chunk') or 100,
+                                      ifnull(params.get('find'), ''))
+
+            if result and result['changed']:
+                changed = 1
+
+        elif action == 'facts':
+            result = device.getinfo_facts()
+
+        elif action == 'export':
+            archive = ExportArchive(params['directory'],
+                                    params.get('keep') or 0)
+            result = device.export_archive(archive, params.get('command') or
+                                           '/export')
+
+            if result and result['changed']:
+                changed = 1
+
+        elif action == 'bulkload':
+            result = device.bulkload(params['branch'], params['entries'],
+                                     params.get('directory'),
+                                     params.get('size') or 65536,
+                                     params.get('tolerant', True))
+
+            if result and result['loaded']:
+                changed = 1
+
+        elif action == 'upload':
+            result = device.upload(params['local'], params['remote'])
+            changed = 1
+
+            if result and params.get('commands'):
+                result = device.commands(params['commands'])
+
+        elif action == 'download' and params.get('store'):
+            store = ChunkStore(params['store'])
+            manifest = device.download_file(params['remote'], params['local'],
+                                            store)
+            if manifest:
+                result = store.summary(manifest)
+
+        elif action == 'download':
+            result = device.download(params['remote'], params['local'])
+
+        else:
+            device.err(1, action)
+
+    if device.errc():
+        failed = 1
+
+    messages.append(device.errors())
+    cache.release(device, drop=bool(unreachable))
+
+    return {'changed': changed, 'unreachable': unreachable, 'failed': failed,
+            'result': result, 'msg': ' '.join(messages)}
+
+
+class RequestHandler(SocketServer.StreamRequestHandler):
+    """Reads one JSON line and answers with one JSON line.
+    """
+
+    def handle(self):
+        """Handles a client connection.
+        """
+        self.server.touch()
+
+        try:
+            request = json.loads(self.rfile.readline())
+            response = execute(self.server.cache, request)
+        except Exception:
+            _, message = getexcept(False)
+            response = {'changed': 0, 'unreachable': 1, 'failed': 1,
+                        'result': [], 'msg': message}
+
+        self.wfile.write(json.dumps(response) + '\n')
+        self.server.touch()
+
+
+class DaemonServer(SocketServer.ThreadingMixIn,
+                   SocketServer.UnixStreamServer):
+    """Threaded Unix socket server that owns the SessionCache.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, cache, lifetime=900):
+        """Initializes a DaemonServer object.
+
+        :param path: (str) Unix socket path.
+        :param cache: (obj) SessionCache.
+        :param lifetime: (int) Seconds without requests before shutting down.
+        """
+        self.cache = cache
+        self.lifetime = lifetime
+        self.last = time.time()
+
+        if os.path.exists(path):
+            os.unlink(path)
+
+        umask = os.umask(0177)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, path, RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def touch(self):
+        """Marks the server as used.
+        """
+        self.last = time.time()
+
+    def housekeeping(self):
+        """Evicts idle sessions and stops the server once it is unused for
+        <self.lifetime> seconds.
+        """
+        while True:
+            time.sleep(10)
+            self.cache.evict()
+
+            if time.time() - self.last > self.lifetime:
+                self.cache.evict(True)
+                self.shutdown()
+                return
+
+
+def serve(path=SOCKET, max_host=2, idle_timeout=300, lifetime=900):
+    """Runs the daemon in the foreground. Only one daemon per socket runs,
+    a second one exits immediately. It refuses to run when the directory of
+    the socket is not private, see <socket_check>.
+
+    :param path: (str) Unix socket path.
+    :param max_host: (int) Maximum number of sessions per host.
+    :param idle_timeout: (int) Seconds before an idle session is evicted.
+    :param lifetime: (int) Seconds without requests before shutting down.
+    :return: (bool) True on clean shutdown, False if already running.
+    """
+    if not socket_check(path, True):
+        return False
+
+    lock = open(path + '.lock', 'w')
+
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError:
+        lock.close()
+        return False
+
+    server = DaemonServer(path, SessionCache(max_host, idle_timeout),
+                          lifetime)
+
+    housekeeper = threading.Thread(target=server.housekeeping)
+    housekeeper.daemon = True
+    housekeeper.start()
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+        lock.close()
+
+    return True
+
+
+def main():
+    """Command line entry point of the daemon.
+    """
+    parser = argparse.ArgumentParser(description='Yama session daemon')
+    parser.add_argument('--socket', default=SOCKET)
+    parser.add_argument('--max-host', type=int, default=2)
+    parser.add_argument('--idle-timeout', type=int, default=300)
+    parser.add_argument('--lifetime', type=int, default=900)
+    args = parser.parse_args()
+
+    if not serve(args.socket, args.max_host, args.idle_timeout,
+                 args.lifetime):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
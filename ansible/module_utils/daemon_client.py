@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Client of the session daemon.
+<ansible.module_utils.remote_management.yama.daemon_client>
+
+It is all that a module with daemon: yes imports. paramiko and the session
+classes are only loaded by the daemon itself, see <daemon>.
+"""
+
+import os
+import sys
+import stat
+import json
+import time
+import errno
+import socket
+import subprocess
+from ansible.module_utils.remote_management.yama.exception import getexcept
+from ansible.module_utils.remote_management.yama.valid import hasstring, \
+    hasdict
+
+MODULE = 'ansible.module_utils.remote_management.yama.daemon'
+
+
+def socket_dir():
+    """Returns the private directory of the daemon socket, in
+    $XDG_RUNTIME_DIR or else in ~/.ansible. Credentials pass through the
+    socket, so it is never placed in a shared directory like /tmp.
+
+    :return: (str) Directory.
+    """
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, 'yama')
+
+    return os.path.join(os.path.expanduser('~'), '.ansible', 'yama')
+
+
+def socket_check(path, create=False):
+    """Checks that the directory of the socket belongs to the current user
+    and that nobody else has access to it.
+
+    :param path: (str) Unix socket path.
+    :param create: (bool) Creates the directory with mode 0700.
+    :return: (bool) True if the directory is private.
+    """
+    directory = os.path.dirname(path)
+
+    try:
+        if create and not os.path.lexists(directory):
+            os.makedirs(directory, 0700)
+
+        info = os.lstat(directory)
+
+    except OSError:
+        return False
+
+    return (stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and
+            not info.st_mode & 0077)
+
+
+SOCKET = os.path.join(socket_dir(), 'daemon.sock')
+
+
+def spawn(path=SOCKET):
+    """Starts the daemon as a detached process.
+
+    :param path: (str) Unix socket path.
+    :return: (bool) True on success, False on failure.
+    """
+    try:
+        with open(os.devnull, 'r+') as devnull:
+            subprocess.Popen([sys.executable, '-m', MODULE, '--socket', path],
+                             stdin=devnull, stdout=devnull, stderr=devnull,
+                             close_fds=True, preexec_fn=os.setsid)
+        return True
+
+    except OSError:
+        return getexcept(False)[0]
+
+
+def request(action, connection, params, path=SOCKET, timeout=600):
+    """Sends a request to the daemon, starting it on first use.
+
+    :param action: (str) One of 'commands', 'get', 'set', 'reconcile',
+        'facts', 'export', 'bulkload', 'upload' and 'download'.
+    :param connection: (dict) host, port, username, password, pkey_string,
+        pkey_file and branch_file.
+    :param params: (dict) Module parameters of the action.
+    :param path: (str) Unix socket path.
+    :param timeout: (int) Seconds to wait for the response.
+    :return: (dict) Arguments for <module.exit_json>.
+    """
+    if not (hasstring(action) and hasdict(connection)):
+        return {'changed': 0, 'unreachable': 1, 'failed': 1, 'result': [],
+                'msg': 'request:1:'}
+
+    if not socket_check(path, True):
+        return {'changed': 0, 'unreachable': 1, 'failed': 1, 'result': [],
+                'msg': 'request:4:Not a private directory: ' +
+                       os.path.dirname(path)}
+
+    client = None
+    spawned = False
+    deadline = time.time() + 10
+
+    while True:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            client.connect(path)
+            break
+
+        except socket.error as error:
+            client.close()
+
+            if error.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+                raise
+
+            if time.time() > deadline:
+                return {'changed': 0, 'unreachable': 1, 'failed': 1,
+                        'result': [], 'msg': 'request:2:' + path}
+
+            if not spawned:
+                spawned = spawn(path)
+
+            time.sleep(0.1)
+
+    try:
+        client.settimeout(timeout)
+        handler = client.makefile('rw')
+        handler.write(json.dumps({'action': action, 'connection': connection,
+                                  'params': params}) + '\n')
+        handler.flush()
+        response = json.loads(handler.readline())
+        handler.close()
+
+    except (socket.error, ValueError):
+        _, message = getexcept(False)
+        response = {'changed': 0, 'unreachable': 1, 'failed': 1, 'result': [],
+                    'msg': 'request:3:' + message}
+
+    finally:
+        client.close()
+
+    return response
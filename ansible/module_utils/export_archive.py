@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Archive of exports with per section hashes.
+<ansible.module_utils.remote_management.yama.export_archive>
+
+Every host keeps its latest export and a state file with the sha256 of each
+section. A new export is streamed to disk while it is hashed, so an unchanged
+configuration costs no comparison of text. Comments, like the date line of
+the export, are not hashed.
+
+    <directory>/<host>.rsc                Latest export.
+    <directory>/<host>.json               Hashes of its sections.
+    <directory>/<host>/<time>.json        Diff of the changed sections.
+
+Example:
+    archive = ExportArchive('/data/export')
+    result = device.export_archive(archive)
+"""
+
+import os
+import time
+import difflib
+import hashlib
+import collections
+from ansible.module_utils.remote_management.yama.object_error import \
+    ErrorObject
+from ansible.module_utils.remote_management.yama.exception import getexcept
+from ansible.module_utils.remote_management.yama.valid import hasstring, \
+    isdir, isfile
+from ansible.module_utils.remote_management.yama.strings import readjson, \
+    writejson
+from ansible.module_utils.remote_management.yama.export_parser import \
+    lines_join, record_parse
+
+
+def sections_iter(lines):
+    """Assigns the complete lines of an export to their sections. Comments
+    and headers are skipped.
+
+    :param lines: (iterable) Lines of an export.
+    :return: (generator) (branch, line) tuples.
+    """
+    branch = ''
+
+    for line in lines_join(lines):
+        line = line.strip()
+
+        if not line or line[0] == '#':
+            continue
+
+        branch, record = record_parse(line, branch)
+
+        if record is not None or line[0] != '/':
+            yield branch or '', line
+
+
+def sections_read(lines, branches=None):
+    """Collects the lines of the sections of an export.
+
+    :param lines: (iterable) Lines of an export.
+    :param branches: (set) Sections to collect, all when None.
+    :return: (dict) branch - list of lines.
+    """
+    results = {}
+
+    for branch, line in sections_iter(lines):
+        if branches is None or branch in branches:
+            results.setdefault(branch, []).append(line)
+
+    return results
+
+
+def lines_diff(old, new):
+    """Compares the lines of a section, keeping their order.
+
+    :param old: (list) Previous lines.
+    :param new: (list) Current lines.
+    :return: (dict) 'added' and 'removed' lines.
+    """
+    results = {'added': [], 'removed': []}
+    matcher = difflib.SequenceMatcher(None, old or [], new or [],
+                                      autojunk=False)
+
+    for tag, old0, old1, new0, new1 in matcher.get_opcodes():
+        if tag in ('replace', 'delete'):
+            results['removed'] += old[old0:old1]
+        if tag in ('replace', 'insert'):
+            results['added'] += new[new0:new1]
+
+    return results
+
+
+class ExportArchive(ErrorObject):
+    """Stores the exports of many hosts and detects their changes.
+    """
+    directory = '/data/export'
+    keep = 0  # Diffs kept per host, all when 0.
+
+    def __init__(self, directory='/data/export', keep=0):
+        """Initializes an ExportArchive object.
+
+        :param directory: (str) Directory of the archive.
+        :param keep: (int) Diffs kept per host, all when 0.
+        """
+        super(ExportArchive, self).__init__()
+
+        self.directory = directory
+        self.keep = keep
+
+    def paths(self, host):
+        """Returns the files of a host.
+
+        :param host: (str) Host.
+        :return: (tuple) Export, state, staged export and diff directory.
+        """
+        name = host.replace('/', '_')
+        export = os.path.join(self.directory, name + '.rsc')
+
+        return (export, os.path.join(self.directory, name + '.json'),
+                export + '.tmp', os.path.join(self.directory, name))
+
+    def stage(self, host, lines):
+        """Writes a new export of host next to the archived one, hashing its
+        sections on the way.
+
+        :param host: (str) Host.
+        :param lines: (iterable) Lines of the export, e.g. from
+            <Router.command_iter>.
+        :return: (dict) branch - sha256 of the section. None on error.
+        """
+        if not hasstring(host) or not isdir(self.directory, True):
+            self.err(1, self.directory)
+            return None
+
+        staged = self.paths(host)[2]
+        digests = collections.OrderedDict()
+
+        def tee(handler):
+            """Writes the lines as they pass.
+            """
+            for line in lines:
+                handler.write(line.rstrip('\r\n') + '\n')
+                yield line
+
+        try:
+            with open(staged, 'w') as handler:
+                for branch, line in sections_iter(tee(handler)):
+                    if branch not in digests:
+                        digests[branch] = hashlib.sha256()
+                    digests[branch].update(line + '\n')
+
+        except IOError:
+            _, message = getexcept()
+            self.err(2, message)
+            self.discard(host)
+            return None
+
+        return collections.OrderedDict(
+            (branch, digest.hexdigest()) for branch, digest in
+            digests.items())
+
+    def discard(self, host):
+        """Drops the staged export of host.
+
+        :param host: (str) Host.
+        :return: (bool) True
+        """
+        staged = self.paths(host)[2]
+
+        if isfile(staged):
+            os.remove(staged)
+
+        return True
+
+    def commit(self, host, hashes):
+        """Compares the staged export of host with the archived one. When
+        any section changed, the export replaces the archived one and the
+        diff of the changed sections is written. The staged export is
+        dropped on error. Without the archived export, e.g. when it was
+        removed by hand, there is nothing to diff against and the staged
+        export is archived as a first one.
+
+        :param host: (str) Host.
+        :param hashes: (dict) Hashes that <self.stage> returned.
+        :return: (dict) 'changed', number of 'sections', the 'added',
+            'removed' and 'modified' sections and the 'diff' file. None on
+            error.
+        """
+        export, state, staged, diffs = self.paths(host)
+        previous = (readjson(state) or {}).get('sections')
+        now = time.time()
+
+        if not isfile(export):
+            previous = None
+
+        results = {'changed': False, 'sections': len(hashes), 'added': [],
+                   'removed': [], 'modified': [], 'diff': None}
+
+        if previous is not None:
+            for branch in hashes:
+                if branch not in previous:
+                    results['added'].append(branch)
+                elif previous[branch] != hashes[branch]:
+                    results['modified'].append(branch)
+
+            results['removed'] = [branch for branch in previous
+                                  if branch not in hashes]
+
+        results['changed'] = previous is None or bool(
+            results['added'] or results['removed'] or results['modified'])
+
+        try:
+            if results['changed'] and previous is not None:
+                branches = set(results['added'] + results['removed'] +
+                               results['modified'])
+                with open(export) as handler:
+                    old = sections_read(handler, branches)
+                with open(staged) as handler:
+                    new = sections_read(handler, branches)
+
+                diff = {'host': host, 'time': now, 'sections': {}}
+                for branch in sorted(branches):
+                    diff['sections'][branch] = lines_diff(old.get(branch),
+                                                          new.get(branch))
+
+                results['diff'] = os.path.join(
+                    diffs, time.strftime('%Y%m%d%H%M%S', time.gmtime(now)) +
+                    '.json')
+                if not writejson(results['diff'], diff):
+                    self.err(1, results['diff'])
+                    self.discard(host)
+                    return None
+                self.prune(diffs)
+
+            if results['changed']:
+                os.rename(staged, export)
+            else:
+                os.remove(staged)
+
+        except (IOError, OSError):
+            _, message = getexcept()
+            self.err(2, message)
+            self.discard(host)
+            return None
+
+        if not writejson(state, {'time': now, 'sections': hashes}):
+            self.err(3, state)
+            return None
+
+        return results
+
+    def prune(self, diffs):
+        """Removes the oldest diffs, beyond <self.keep>.
+
+        :param diffs: (str) Diff directory of a host.
+        :return: (bool) True
+        """
+        if self.keep > 0:
+            for name in sorted(os.listdir(diffs))[:-self.keep]:
+                os.remove(os.path.join(diffs, name))
+
+        return True
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Streaming parser of RouterOS /export output.
+<ansible.module_utils.remote_management.yama.export_parser>
+
+Lines are consumed one at a time, so an export of any size is parsed with
+constant memory. Every command becomes a Record:
+
+    /ip firewall address-list
+    add address=192.0.2.1 comment="a \\"b\\"" list=ntp
+
+    Record(branch='/ip firewall address-list', action='add', find={},
+           propvals={'address': '192.0.2.1', 'comment': 'a "b"',
+                     'list': 'ntp'})
+
+Example:
+    with open('router.rsc') as handler:
+        index = ExportIndex(parse(handler), registry)
+"""
+
+import collections
+from ansible.module_utils.remote_management.yama.valid import hasstring, \
+    haskey
+from ansible.module_utils.remote_management.yama.mikrotik_helpers import \
+    branchfix, lines_join
+
+# Commands of the export that follow the branch.
+ACTIONS = ('add', 'set', 'remove', 'enable', 'disable', 'unset')
+
+# Escape sequences of quoted values.
+ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', 'a': '\a', 'b': '\b', 'f': '\f',
+           'v': '\v', '_': ' '}
+
+
+class Record(collections.namedtuple('Record', 'branch action find propvals')):
+    """One command of an export.
+    """
+    __slots__ = ()
+
+    def entry(self):
+        """Merges the find and the properties, to the values of the entry.
+
+        :return: (dict) Properties and values.
+        """
+        results = dict(self.find)
+        results.update(self.propvals)
+        return results
+
+
+def tokenize(data):
+    """Splits a command to tokens. Quotes and escapes are resolved and a
+    [ ... ] group is one token, including its brackets.
+
+    :param data: (str) Command.
+    :return: (list) Tokens.
+    """
+    results = []
+    token = []
+    quoted = False
+    depth = 0
+    index = 0
+    length = len(data)
+
+    while index < length:
+        char = data[index]
+
+        if depth:
+            # Kept verbatim, the group is tokenized on its own
+            if quoted and char == '\\' and index + 1 < length:
+                token.append(data[index:index + 2])
+                index += 1
+            else:
+                if char == '"':
+                    quoted = not quoted
+                elif char == '[' and not quoted:
+                    depth += 1
+                elif char == ']' and not quoted:
+                    depth -= 1
+                token.append(char)
+
+        elif quoted:
+            if char == '\\' and index + 1 < length:
+                index += 1
+                char = data[index]
+                hexa = data[index:index + 2]
+
+                if char in ESCAPES:
+                    token.append(ESCAPES[char])
+                elif len(hexa) == 2 and \
+                        all(c in '0123456789ABCDEF' for c in hexa):
+                    token.append(chr(int(hexa, 16)))
+                    index += 1
+                else:
+                    token.append(char)
+
+            elif char == '"':
+                quoted = False
+            else:
+                token.append(char)
+
+        elif char == '"':
+            quoted = True
+
+        elif char == '[':
+            depth += 1
+            token.append(char)
+
+        elif char in ' \t':
+            if token:
+                results.append(''.join(token))
+                token = []
+
+        else:
+            token.append(char)
+
+        index += 1
+
+    if token:
+        results.append(''.join(token))
+
+    return results
+
+
+def propvals_parse(tokens):
+    """Converts tokens to properties and values. A token without = is a
+    property with empty value.
+
+    :param tokens: (str / list) Command or its tokens.
+    :return: (dict) Properties and values.
+    """
+    if hasstring(tokens):
+        tokens = tokenize(tokens)
+
+    results = {}
+
+    for token in tokens or []:
+        eql = token.find('=')
+
+        if eql > 0:
+            results[token[:eql]] = token[eql + 1:]
+        else:
+            results[token] = ''
+
+    return results
+
+
+def record_parse(line, branch=None):
+    """Parses one complete line of an export.
+
+    :param line: (str) Line.
+    :param branch: (str) Branch of the previous section header.
+    :return: (tuple) The branch that applies to the next lines, and the
+        Record or None when the line holds no command.
+    """
+    line = line.strip()
+
+    if not line or line[0] == '#':
+        return branch, None
+
+    tokens = tokenize(line)
+
+    if line[0] == '/':
+        # A header, or a header followed by a command on the same line
+        for index, token in enumerate(tokens):
+            if token in ACTIONS:
+                branch = branchfix(' '.join(tokens[:index]))
+                tokens = tokens[index:]
+                break
+        else:
+            return branchfix(' '.join(tokens)), None
+
+    if branch is None or tokens[0] not in ACTIONS:
+        return branch, None
+
+    action = tokens[0]
+    find = {}
+    tokens = tokens[1:]
+
+    if tokens and tokens[0][:1] == '[' and tokens[0][-1:] == ']':
+        selector = tokenize(tokens[0][1:-1])
+        if selector[:1] == ['find']:
+            selector = selector[1:]
+        find = propvals_parse(selector)
+        tokens = tokens[1:]
+
+    elif tokens and tokens[0].replace(',', '').isdigit():
+        find = {'numbers': tokens[0]}
+        tokens = tokens[1:]
+
+    return branch, Record(branch, action, find, propvals_parse(tokens))
+
+
+def parse(lines):
+    """Parses an export.
+
+    :param lines: (iterable) Lines of an export, e.g. an open file or the
+        output of <Router.command_iter>.
+    :return: (generator) Records.
+    """
+    branch = None
+
+    for line in lines_join(lines):
+        branch, record = record_parse(line, branch)
+
+        if record is not None:
+            yield record
+
+
+class ExportIndex(object):
+    """Records of an export, indexed by branch and by the id properties of
+    the branch registry.
+    """
+    branches = None   # branch - list of Records.
+    ids = None        # branch - {tuple of id values: Record}.
+
+    def __init__(self, records, registry=None):
+        """Initializes an ExportIndex object.
+
+        :param records: (iterable) Records, as <parse> yields them.
+        :param registry: (dict) Branch registry, for the id properties.
+        """
+        self.branches = {}
+        self.ids = {}
+
+        for record in records:
+            self.branches.setdefault(record.branch, []).append(record)
+
+            if not haskey(registry, record.branch, dict):
+                continue
+
+            idkeys = registry[record.branch].get('id')
+            if not idkeys or record.action not in ('add', 'set'):
+                continue
+
+            values = record.entry()
+            if all(prop in values for prop in idkeys):
+                self.ids.setdefault(record.branch, {})[
+                    tuple(values[prop] for prop in idkeys)] = record
+
+    def records(self, branch):
+        """Returns the records of a branch.
+
+        :param branch: (str) Branch of commands.
+        :return: (list) Records.
+        """
+        return self.branches.get(branchfix(branch), [])
+
+    def lookup(self, branch, *values):
+        """Finds the record of a branch by the values of its id properties.
+
+        :param branch: (str) Branch of commands.
+        :param values: (str) Values of the id properties, in registry order.
+        :return: (obj) Record or None.
+        """
+        return self.ids.get(branchfix(branch), {}).get(tuple(values))
@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Runs Router operations across a fleet of hosts.
+<ansible.module_utils.remote_management.yama.fleet>
+
+A bounded pool of worker threads runs paramiko's blocking calls, with a
+global concurrency limit and a per-host limit. <Fleet.sweep> shards the
+inventory across one process per core and merges the results into a JSON
+Lines file, which is also the checkpoint of an interrupted sweep.
+
+Example:
+    python -m ansible.module_utils.remote_management.yama.fleet \\
+        --inventory hosts.txt --username admin --pkey-file ~/.ssh/id_rsa \\
+        --job getvalues --args '["/ip dns", "servers"]' \\
+        --output /data/output/dns.jsonl
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import multiprocessing
+import Queue
+from ansible.module_utils.remote_management.yama.object_error import \
+    ErrorObject
+from ansible.module_utils.remote_management.yama.exception import getexcept
+from ansible.module_utils.remote_management.yama.valid import hasstring, \
+    haslist, hasdict, isdir, isfile
+from ansible.module_utils.remote_management.yama.strings import readfile, \
+    readyaml
+from ansible.module_utils.remote_management.yama.mikrotik import Router
+from ansible.module_utils.remote_management.yama.table import Table
+from ansible.module_utils.remote_management.yama.breaker import Breaker
+from ansible.module_utils.remote_management.yama.prescan import scan
+
+BRANCH_FILE = '/etc/ansible/config/yama/mikrotik_branch.json'
+
+# Router methods that can be used as a job.
+JOBS = [
+    'command',
+    'commands',
+    'getvalues',
+    'getvalues_batch',
+    'getvalues_chunked',
+    'setvalues',
+    'addentry',
+    'removeentry',
+    'reconcile',
+    'getinfo_model',
+    'getinfo_identity',
+    'getinfo_serialnumber',
+    'getinfo_license',
+    'getinfo_interfaces',
+    'getinfo_facts'
+]
+
+# Jobs that return True, or a dictionary with a true 'changed', when they
+# changed the configuration.
+JOBS_CHANGING = ['setvalues', 'addentry', 'removeentry', 'reconcile']
+
+
+class Fleet(ErrorObject):
+    """Executes one job on every host of an inventory.
+    """
+    concurrency = 50  # Hosts processed at the same time.
+    per_host = 1      # Sessions per host at the same time.
+    timeout = 30      # Connection timeout.
+    prescan = 0       # Seconds of the TCP prescan, 0 disables it.
+
+    def __init__(self, concurrency=50, per_host=1, timeout=30, defaults=None,
+                 prescan=0):
+        """Initializes a Fleet object.
+
+        :param concurrency: (int) Global limit of concurrent sessions.
+        :param per_host: (int) Limit of concurrent sessions per host.
+        :param timeout: (int) Connection timeout.
+        :param defaults: (dict) Connection parameters for hosts that do not
+            set them: port, username, password, pkey_string, pkey_file,
+            branch_file and breaker_file.
+        :param prescan: (float) Seconds of the TCP reachability scan that
+            runs before any SSH connection. 0 disables it.
+        """
+        super(Fleet, self).__init__()
+
+        self.concurrency = max(int(concurrency), 1)
+        self.per_host = max(int(per_host), 1)
+        self.timeout = timeout
+        self.defaults = defaults if hasdict(defaults) else {}
+        self.prescan = prescan
+        self.states = None
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def connection(self, entry):
+        """Merges an inventory entry with the defaults.
+
+        :param entry: (str / dict) Host or dictionary with a 'host' key.
+        :return: (dict) Connection parameters, None on invalid entry.
+        """
+        if hasstring(entry):
+            entry = {'host': entry}
+
+        if not (hasdict(entry) and hasstring(entry.get('host'))):
+            return None
+
+        results = dict(self.defaults)
+        results.update(entry)
+        return results
+
+    def semaphore(self, host):
+        """Returns the semaphore that limits the sessions of <host>.
+
+        :param host: (str) Remote host.
+        :return: (obj) threading.BoundedSemaphore.
+        """
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(
+                    self.per_host)
+            return self.semaphores[host]
+
+    def execute(self, connection, job, args, kwargs):
+        """Executes <job> on a single host.
+
+        :param connection: (dict) Connection parameters.
+        :param job: (str / callable) Router method name, or a function that
+            receives the connected Router as first argument.
+        :param args: (list) Positional arguments of the job.
+        :param kwargs: (dict) Keyword arguments of the job.
+        :return: (dict) host, port, result, changed, unreachable, failed and
+            msg.
+        """
+        results = {'host': connection['host'],
+                   'port': connection.get('port') or 22,
+                   'result': None, 'changed': 0, 'unreachable': 1,
+                   'failed': 0, 'msg': ''}
+
+        with self.semaphore(connection['host']):
+            device = None
+
+            try:
+                device = Router(connection['host'],
+                                port=connection.get('port') or 22,
+                                username=connection.get('username', 'admin'),
+                                password=connection.get('password', ''),
+                                pkey_string=connection.get('pkey_string', ''),
+                                pkey_file=connection.get('pkey_file', ''),
+                                branch_file=connection.get(
+                                    'branch_file',
+                                    'config/mikrotik_branch.json'))
+
+                if connection.get('breaker_file'):
+                    device.breaker = Breaker(connection['breaker_file'])
+
+                device.prescan = self.states
+
+                if device.connect(self.timeout):
+                    results['unreachable'] = 0
+
+                    if callable(job):
+                        result = job(device, *args, **kwargs)
+                    else:
+                        result = getattr(device, job)(*args, **kwargs)
+
+                    results['result'] = resultfix(result)
+                    if job in JOBS_CHANGING and (result is True or (
+                            isinstance(result, dict) and result['changed'])):
+                        results['changed'] = 1
+
+                if device.errc():
+                    results['failed'] = 1
+                results['msg'] = device.errors()
+
+            except Exception:
+                _, message = getexcept(False)
+                results['failed'] = 1
+                results['msg'] = message
+
+            finally:
+                if device is not None:
+                    device.disconnect()
+
+        return results
+
+    def run(self, inventory, job, args=None, kwargs=None, callback=None):
+        """Executes <job> on every host of <inventory>.
+
+        :param inventory: (list) Hosts, or dictionaries with a 'host' key and
+            optionally any connection parameter.
+        :param job: (str / callable) One of JOBS, or a function that receives
+            the connected Router as first argument.
+        :param args: (list) Positional arguments of the job.
+        :param kwargs: (dict) Keyword arguments of the job.
+        :param callback: (callable) Called with each host result, as soon as
+            it is ready.
+        :return: (list) Host results, in inventory order. None on error.
+        """
+        if not haslist(inventory):
+            self.err(1)
+            return None
+
+        if not (callable(job) or job in JOBS):
+            self.err(2, job)
+            return None
+
+        args = args if haslist(args) else []
+        kwargs = kwargs if hasdict(kwargs) else {}
+
+        results = [None] * len(inventory)
+        tasks = Queue.Queue()
+
+        for index, entry in enumerate(inventory):
+            connection = self.connection(entry)
+
+            if connection is None:
+                self.err(3, entry)
+                results[index] = {'host': entry, 'result': None,
+                                  'changed': 0, 'unreachable': 1,
+                                  'failed': 1, 'msg': 'Invalid entry'}
+                continue
+
+            tasks.put((index, connection))
+
+        if self.prescan:
+            self.states = scan([connection for _, connection in
+                                list(tasks.queue)], timeout=self.prescan)
+
+        def worker():
+            """Consumes tasks until the queue is empty.
+            """
+            while True:
+                try:
+                    index, connection = tasks.get_nowait()
+                except Queue.Empty:
+                    return
+
+                results[index] = self.execute(connection, job, args, kwargs)
+
+                if callback:
+                    callback(results[index])
+
+        threads = []
+
+        for _ in range(min(self.concurrency, tasks.qsize())):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def sweep(self, inventory, job, args=None, kwargs=None, output='',
+              processes=0, resume=True):
+        """Executes <job> on every host of <inventory>, sharded across a pool
+        of processes that run <self.run> each. Host results are appended to
+        <output> as JSON Lines as soon as they are ready. With <resume>, hosts
+        that already succeeded in <output> are skipped, the others are run
+        again. A shard whose process dies is reported as an error, its
+        remaining hosts are left for the next resume.
+
+        :param inventory: (list) Hosts, or dictionaries with a 'host' key.
+        :param job: (str) One of JOBS.
+        :param args: (list) Positional arguments of the job.
+        :param kwargs: (dict) Keyword arguments of the job.
+        :param output: (str) JSON Lines file.
+        :param processes: (int) Number of processes, 0 for one per core.
+        :param resume: (bool) Skips hosts that already succeeded in
+            <output>.
+        :return: (dict) Counters hosts, skipped, done, changed, unreachable
+            and failed. None on error.
+        """
+        if not haslist(inventory):
+            self.err(1)
+            return None
+
+        if job not in JOBS:
+            self.err(2, job)
+            return None
+
+        if not (hasstring(output) and
+                isdir(os.path.dirname(os.path.abspath(output)), True)):
+            self.err(3, output)
+            return None
+
+        finished = set()
+        if resume:
+            finished = sweep_finished(output)
+        else:
+            open(output, 'w').close()
+
+        pending = []
+        for entry in inventory:
+            connection = self.connection(entry)
+            if connection is None:
+                self.err(4, entry)
+            elif sweep_key(connection) not in finished:
+                pending.append(connection)
+
+        counters = {'hosts': len(inventory),
+                    'skipped': len(inventory) - len(pending),
+                    'done': 0, 'changed': 0, 'unreachable': 0, 'failed': 0}
+
+        if not pending:
+            return counters
+
+        processes = processes or multiprocessing.cpu_count()
+        shards = [pending[index::processes] for index in range(processes)]
+        shards = [shard for shard in shards if shard]
+        queue = multiprocessing.Queue(1024)
+        workers = []
+
+        for shard in shards:
+            worker = multiprocessing.Process(
+                target=sweep_worker,
+                args=(shard, job, args, kwargs, queue,
+                      (self.concurrency, self.per_host, self.timeout,
+                       self.defaults, self.prescan)))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        running = len(workers)
+
+        with open(output, 'a') as handler:
+            while running:
+                try:
+                    line = queue.get(timeout=1)
+                except Queue.Empty:
+                    if any(worker.is_alive() for worker in workers):
+                        continue
+                    self.err(5, '{} of {} shards exited without finishing'
+                             .format(running, len(workers)))
+                    break
+
+                if line is None:
+                    running -= 1
+                    continue
+
+                handler.write(line + '\n')
+                handler.flush()
+
+                result = json.loads(line)
+                counters['done'] += 1
+                counters['changed'] += result['changed']
+                counters['unreachable'] += result['unreachable']
+                counters['failed'] += result['failed']
+
+        for worker in workers:
+            worker.join()
+
+        return counters
+
+
+def resultfix(result):
+    """Converts the columnar results of a job, see <Table.todict>, so every
+    result can be serialized to JSON.
+
+    :param result: (obj) Result of a job.
+    :return: (obj) Result without Table objects.
+    """
+    if isinstance(result, Table):
+        return result.todict()
+
+    if isinstance(result, list):
+        return [resultfix(item) for item in result]
+
+    return result
+
+
+def sweep_key(result):
+    """Identifies a host in the checkpoint of a sweep.
+
+    :param result: (dict) Connection parameters or host result.
+    :return: (str) host:port
+    """
+    return '{}:{}'.format(result['host'], result.get('port') or 22)
+
+
+def sweep_finished(output):
+    """Reads the hosts that already succeeded in a sweep output. The lines of
+    unreachable or failed hosts, which are run again, and a line cut by an
+    interrupted sweep are dropped from the file.
+
+    :param output: (str) JSON Lines file.
+    :return: (set) Keys of <sweep_key>.
+    """
+    results = set()
+    lines = []
+    rewrite = False
+
+    if not isfile(output):
+        return results
+
+    with open(output) as handler:
+        for line in handler:
+            try:
+                result = json.loads(line)
+                if result['unreachable'] or result['failed']:
+                    rewrite = True
+                    continue
+                results.add(sweep_key(result))
+                lines.append(line)
+            except (ValueError, KeyError, TypeError):
+                rewrite = True
+
+    if rewrite:
+        with open(output, 'w') as handler:
+            handler.writelines(lines)
+
+    return results
+
+
+def sweep_worker(shard, job, args, kwargs, queue, settings):
+    """Process entry point of <Fleet.sweep>. Streams every host result to
+    <queue> as a JSON line and None when the shard is finished.
+
+    :param shard: (list) Connection parameters.
+    :param job: (str) One of JOBS.
+    :param args: (list) Positional arguments of the job.
+    :param kwargs: (dict) Keyword arguments of the job.
+    :param queue: (obj) multiprocessing.Queue.
+    :param settings: (tuple) concurrency, per_host, timeout, defaults and
+        prescan.
+    """
+    try:
+        fleet = Fleet(*settings)
+        fleet.run(shard, job, args, kwargs,
+                  lambda result: queue.put(json.dumps(result)))
+    finally:
+        queue.put(None)
+
+
+def inventory_load(filename):
+    """Loads an inventory file. YAML/JSON lists are used as they are, other
+    files are read as one host per line.
+
+    :param filename: (str) Inventory file.
+    :return: (list) Inventory, None on failure.
+    """
+    if not isfile(filename):
+        return None
+
+    if filename.endswith(('.yml', '.yaml', '.json')):
+        results = readyaml(filename)
+        if haslist(results):
+            return results
+        return None
+
+    results = []
+
+    for line in readfile(filename).split('\n'):
+        line = line.strip()
+        if line and line[0] != '#':
+            results.append(line)
+
+    return results
+
+
+def parser_common(description):
+    """Argument parser with the options that every fleet runner uses.
+
+    :param description: (str) Description of the command.
+    :return: (obj) argparse.ArgumentParser.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--inventory', required=True)
+    parser.add_argument('--job', required=True, choices=JOBS)
+    parser.add_argument('--args', default='[]', help='JSON list')
+    parser.add_argument('--kwargs', default='{}', help='JSON dictionary')
+    parser.add_argument('--port', type=int, default=22)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--pkey-file', default='')
+    parser.add_argument('--branch-file', default=BRANCH_FILE)
+    parser.add_argument('--breaker-file', default='')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--per-host', type=int, default=1)
+    parser.add_argument('--timeout', type=int, default=30)
+    parser.add_argument('--prescan', type=float, default=0)
+    return parser
+
+
+def main():
+    """Command line entry point. Prints one JSON document with every host
+    result, or with <--output> sweeps the fleet with one process per core
+    and prints the counters.
+    """
+    parser = parser_common('Yama fleet runner')
+    parser.add_argument('--output', default='', help='JSON Lines file')
+    parser.add_argument('--processes', type=int, default=0)
+    parser.add_argument('--no-resume', action='store_true')
+    args = parser.parse_args()
+
+    inventory = inventory_load(args.inventory)
+    if inventory is None:
+        sys.exit('Unable to load inventory: {}'.format(args.inventory))
+
+    fleet = Fleet(args.concurrency, args.per_host, args.timeout,
+                  {'port': args.port, 'username': args.username,
+                   'password': args.password, 'pkey_file': args.pkey_file,
+                   'branch_file': args.branch_file,
+                   'breaker_file': args.breaker_file}, args.prescan)
+
+    # <getexcept> prints to stdout, which is reserved for the results.
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        if args.output:
+            results = fleet.sweep(inventory, args.job, json.loads(args.args),
+                                  json.loads(args.kwargs), args.output,
+                                  args.processes, not args.no_resume)
+        else:
+            results = fleet.run(inventory, args.job, json.loads(args.args),
+                                json.loads(args.kwargs))
+    finally:
+        sys.stdout = stdout
+
+    if results is None:
+        sys.exit(fleet.errors())
+
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,15 +6,28 @@
 """Yama: Module for Mikrotik connections.
 <ansible.module_utils.remote_management.yama.mikrotik>"""
 
+import os
 import re
-import ipaddress
+import csv
+import gzip
+import json
+import hashlib
+import threading
+import Queue
 from ansible.module_utils.remote_management.yama.ssh_client import SSHClient
+from ansible.module_utils.remote_management.yama.exception import getexcept
 from ansible.module_utils.remote_management.yama.valid import hasstring, \
-    haslist, hasdict, haskey
-from ansible.module_utils.remote_management.yama.strings import readjson
+    haslist, hasdict, haskey, isdir, isfile
+from ansible.module_utils.remote_management.yama.strings import readjson, \
+    writejson, wtrim
+from ansible.module_utils.remote_management.yama.snapshot import Snapshot
+from ansible.module_utils.remote_management.yama.table import Table
 from ansible.module_utils.remote_management.yama.mikrotik_helpers import \
     branchfix, properties_to_list, propvals_to_dict, propvals_diff_getvalues, \
-    csv_to_listdict
+    csv_to_listdict, csv_iter, sections_script, sections_split, \
+    counters_split, propvals_render, reconcile_plan, ids_split, \
+    addresses_group, values_script, unit_rows, unit_lines, unit_decode, \
+    rows_to_csv, COUNTERS, CHUNK
 
 
 class Router(SSHClient):
@@ -22,6 +35,9 @@ class Router(SSHClient):
     """
     branch = None
     routerboard = None
+    snapshot = None  # Snapshot that answers getvalues, see <snapshot_open>.
+    wireformat = 'csv'  # Output of getvalues scripts, see <values_script>.
+    # The 'unit' format is read raw, as filtering the lines alters values.
 
     # List of Mikrotik errors.
     #
@@ -68,13 +84,14 @@ class Router(SSHClient):
             commands.
         :return: (obj) Router.
         """
+        super(Router, self).__init__(host, port, username, password,
+                                     pkey_string, pkey_file)
+
         self.branch = readjson(branch_file)
         if not self.branch:
+            self.status = -1
             self.err(5, branch_file)
 
-        super(Router, self).__init__(host, port, username, password,
-                                     pkey_string, pkey_file)
-
     def checkline(self, data=''):
         """Checks the input against a list of common errors.
 
@@ -144,7 +161,31 @@ class Router(SSHClient):
 
         return results
 
-    def commands(self, commands, raw=False, connect=True):
+    def command_iter(self, command, raw=False, connect=True):
+        """Executes the <command> on the remote host and yields the output
+        lines as they arrive. Every line is checked against the Mikrotik
+        errors and the channel is closed at the first error.
+
+        :param command: (str) The command that has to be executed.
+        :param raw: (bool) Yields all lines without filtering lines that start
+            with #.
+        :param connect: (bool) Connects to host, if it is not connected already.
+        :return: (generator) Output lines.
+        """
+        lines = super(Router, self).command_iter(command, raw, connect)
+
+        try:
+            for line in lines:
+                if not self.checkline(line):
+                    self.err(6, command)
+                    return
+                yield line
+
+        finally:
+            lines.close()
+
+    def commands(self, commands, raw=False, connect=True, shell=False,
+                 parallel=0):
         """Executes a list of command on the remote host using the
         self.command() method.
 
@@ -152,8 +193,18 @@ class Router(SSHClient):
         :param raw: (bool) Returns all results without filtering lines that
             start with #.
         :param connect: (bool) Connects to host, if it is not connected already.
+        :param shell: (bool) Streams the commands over one interactive console
+            instead of one channel per command.
+        :param parallel: (int) If more than 1, executes independent commands
+            on that many channels at once. See <self.commands_parallel>.
         :return: (list) The execution result.
         """
+        if self.snapshot is not None:
+            self.snapshot.invalidate()  # Any of them may change anything
+
+        if parallel > 1 and not shell:
+            return self.commands_parallel(commands, raw, connect, parallel)
+
         status = 0
 
         if hasstring(commands):
@@ -173,6 +224,12 @@ class Router(SSHClient):
 
         results = []
 
+        if shell and not self.shell:
+            if not self.shell_open(False):
+                return None
+        else:
+            shell = False
+
         for index, command in enumerate(commands):
             if not command:
                 continue
@@ -181,14 +238,112 @@ class Router(SSHClient):
             results.append(result)
 
             if self.errc():
-                return self.err(2, 'commands[{}]: {}'.format(index, command))
+                results = self.err(2, 'commands[{}]: {}'.format(index,
+                                                                command))
+                break
+
+        if shell:
+            self.shell_close()
 
         if status == 1:
             self.disconnect()
 
         return results
 
-    def getvalues(self, branch, properties, find='', csvout=False, iid=False):
+    def commands_parallel(self, commands, raw=False, connect=True, limit=4):
+        """Executes a list of independent commands at the same time, each on
+        its own channel of the current transport. Meant for read commands,
+        the execution order is not guaranteed but the results keep the input
+        order.
+
+        :param commands: (list) The list of commands to be executed.
+        :param raw: (bool) Returns all results without filtering lines that
+            start with #.
+        :param connect: (bool) Connects to host, if it is not connected already.
+        :param limit: (int) Channels open at the same time. Keep it below the
+            sessions that RouterOS allows per user.
+        :return: (list) The execution result.
+        """
+        status = 0
+
+        if hasstring(commands):
+            commands = [commands]
+        elif not haslist(commands):
+            self.err(1)
+            return None
+
+        commands = [command for command in commands if command]
+
+        if self.status < 1 and connect:
+            if self.connect():
+                status = 1
+
+        if self.status < 1:
+            self.err(2, self.status)
+            return None
+
+        outputs = [None] * len(commands)
+        tasks = Queue.Queue()
+
+        for index, command in enumerate(commands):
+            self.history.append(command)
+            tasks.put(index)
+
+        def worker():
+            """Executes commands until the queue is empty.
+            """
+            while True:
+                try:
+                    index = tasks.get_nowait()
+                except Queue.Empty:
+                    return
+
+                try:
+                    outputs[index] = (self.exec_lines(commands[index]), None)
+                except Exception:
+                    outputs[index] = (None, getexcept(False)[1])
+
+        threads = []
+
+        for _ in range(min(max(int(limit), 1), len(commands))):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        results = []
+        failed = False
+
+        for index, command in enumerate(commands):
+            lines, message = outputs[index]
+            result = self.filterlines(lines or [], raw)
+            results.append(result)
+
+            if message:
+                self.err(3, message)
+            elif not haslist(result):
+                self.err(5, command)
+            elif not self.checkline(result[0]):
+                self.err(6, command)
+            else:
+                continue
+
+            self.err(2, 'commands[{}]: {}'.format(index, command))
+            failed = True
+
+        if status == 1:
+            self.disconnect()
+
+        if failed:
+            return False
+
+        return results
+
+    def getvalues(self, branch, properties, find='', csvout=False, iid=False,
+                  columnar=False):
         """Retrieves requested values from remote host.
 
         :param branch: (str) Branch of commands.
@@ -197,6 +352,8 @@ class Router(SSHClient):
         :param find: (str) Mikrotik CLI filter.
         :param csvout: (bool) Output in CSV File.
         :param iid: (bool) Adds $id to output.
+        :param columnar: (bool) Returns a <Table> instead of the list of
+            dictionaries, for large results. <Table.tolistdict> converts it.
         :return: (list) CSV formatted output.
             Example output if <csvout=True>:
                 Return of <self.command>:
@@ -220,6 +377,315 @@ class Router(SSHClient):
         """
         results = []
 
+        query = self.getvalues_compile(branch, properties, find, iid)
+
+        if query is None:
+            return None
+
+        if self.snapshot is not None and not csvout:
+            results = self.snapshot_getvalues(query['branch'],
+                                              query['properties'], find,
+                                              query['iid'])
+            if results is not None and columnar:
+                return Table.from_listdict(
+                    (['.id'] if query['iid'] else []) + query['properties'],
+                    results)
+            if results is not None:
+                return results
+
+        lines = self.command(query['command'], self.wireformat == 'unit')
+
+        if not lines or self.errc():
+            self.err(5, query['command'])
+            return None
+
+        return self.getvalues_decode(query, lines, csvout, columnar)
+
+    def getvalues_decode(self, query, lines, csvout=False, columnar=False):
+        """Decodes the output of a getvalues script, in <self.wireformat>.
+
+        :param query: (dict) Query, as <self.getvalues_compile> returns it.
+        :param lines: (list) Output lines.
+        :param csvout: (bool) Output in CSV File. The 'unit' format is
+            encoded to CSV, quoted where needed.
+        :param columnar: (bool) Returns a <Table>.
+        :return: (list) Results in the format of <self.getvalues>.
+        """
+        if self.wireformat != 'unit':
+            if csvout:
+                return lines
+            if columnar:
+                return Table.from_csv(query['properties'], lines,
+                                      query['iid'])
+            return csv_to_listdict(query['properties'], lines,
+                                   self.branch[query['branch']],
+                                   query['iid']) or []
+
+        lines = unit_lines(lines)
+
+        if csvout:
+            return rows_to_csv(unit_rows(lines))
+        if columnar:
+            return Table.from_unit(query['properties'], lines, query['iid'])
+        return unit_decode(lines, (['.id'] if query['iid'] else []) +
+                           query['properties'])
+
+    def getvalues_iter(self, branch, properties, find='', iid=False):
+        """Retrieves requested values from remote host, parsing the output
+        as it arrives. The snapshot is not consulted.
+
+        :param branch: (str) Branch of commands.
+        :param properties: (str / list) List or Comma / Space separated
+            properties.
+        :param find: (str) Mikrotik CLI filter.
+        :param iid: (bool) Adds $id to output.
+        :return: (generator) Variables-Values dictionaries, as
+            <self.getvalues> returns them. Errors are reported by <self.errc>
+            when it is exhausted.
+        """
+        query = self.getvalues_compile(branch, properties, find, iid)
+
+        if query is None:
+            return
+
+        lines = self.command_iter(query['command'], self.wireformat == 'unit')
+
+        if self.wireformat == 'unit':
+            results = unit_rows(lines, (['.id'] if query['iid'] else []) +
+                                query['properties'])
+        else:
+            results = csv_iter(query['properties'], lines, query['iid'])
+
+        for result in results:
+            yield result
+
+    def getvalues_tofile(self, branch, properties, filename, find='',
+                         iid=False, fmt='csv'):
+        """Writes the requested values of remote host to a file, one row at
+        a time, so memory stays flat whatever the size of the table. The
+        file is written under a temporary name and renamed when complete.
+
+        :param branch: (str) Branch of commands.
+        :param properties: (str / list) List or Comma / Space separated
+            properties.
+        :param filename: (str) File to write. A name ending in .gz is
+            compressed with gzip.
+        :param find: (str) Mikrotik CLI filter.
+        :param iid: (bool) Adds $id to output.
+        :param fmt: (str) 'csv', with a header line, or 'jsonl', one JSON
+            object per line.
+        :return: (dict) Number of 'rows' and the 'path' of the file. None on
+            error.
+        """
+        if fmt not in ('csv', 'jsonl'):
+            self.err(1, fmt)
+            return None
+
+        if not hasstring(filename) or \
+                not isdir(os.path.dirname(filename) or '.', True):
+            self.err(2, filename)
+            return None
+
+        properties = properties_to_list(properties)
+        if not haslist(properties):
+            self.err(3)
+            return None
+
+        errc = self.errc()
+        columns = (['.id'] if iid else []) + properties
+        rows = 0
+        temp = filename + '.tmp'
+
+        try:
+            if filename.endswith('.gz'):
+                handler = gzip.open(temp, 'wb')
+            else:
+                handler = open(temp, 'wb')
+
+            with handler:
+                if fmt == 'csv':
+                    writer = csv.writer(handler, lineterminator='\n')
+                    writer.writerow(columns)
+
+                for result in self.getvalues_iter(branch, properties, find,
+                                                  iid):
+                    if fmt == 'csv':
+                        writer.writerow([result.get(column, '')
+                                         for column in columns])
+                    else:
+                        handler.write(json.dumps(result) + '\n')
+                    rows += 1
+
+            if self.errc() > errc:
+                os.remove(temp)
+                return None
+
+            os.rename(temp, filename)
+
+        except (IOError, OSError):
+            _, message = getexcept()
+            self.err(4, message)
+            if isfile(temp):
+                os.remove(temp)
+            return None
+
+        return {'rows': rows, 'path': filename}
+
+    def getvalues_chunked(self, branch, properties, find='', iid=False,
+                          size=10000, parallel=4, checkpoint=None,
+                          csvout=False, columnar=False):
+        """Retrieves requested values of a large list branch in slices of
+        <size> entries, so no single :foreach has to walk the whole table.
+        The slices are fetched over <parallel> channels and joined in order.
+
+        RouterOS has no cursor or offset over a list, every find walks the
+        whole table. So the table is searched once, for the $id of the
+        entries, and every slice reads only its own $id. A slice fails when
+        one of its entries is removed during the extraction.
+
+        With <checkpoint>, every completed slice is saved in that directory
+        and a failed extraction resumes from the slices that are missing.
+        The checkpoint is discarded when the query or the $id of the entries
+        differ, since the slices would not match, and it is removed after a
+        successful extraction.
+
+        :param branch: (str) Branch of commands.
+        :param properties: (str / list) List or Comma / Space separated
+            properties.
+        :param find: (str) Mikrotik CLI filter of property=value pairs.
+        :param iid: (bool) Adds $id to output.
+        :param size: (int) Entries per slice. The $id of a slice are part of
+            its command, which grows by about 6 bytes per entry.
+        :param parallel: (int) Channels open at the same time.
+        :param checkpoint: (str) Directory of the completed slices.
+        :param csvout: (bool) Output in CSV File.
+        :param columnar: (bool) Returns a <Table>, see <self.getvalues>.
+        :return: (list) Results in the format of <self.getvalues>. None on
+            error.
+        """
+        query = self.getvalues_compile(branch, properties, find, iid)
+
+        if query is None:
+            return None
+
+        if not query['command'].startswith(':foreach'):
+            self.err(1, query['branch'])
+            return None
+
+        if not hasstring(find):
+            find = ''
+
+        size = max(int(size), 1)
+        lines = self.command(':local e [{} find {}]; :put [:len $e]; '
+                             ':put $e'.format(query['branch'], find))
+        ids = [item for line in (lines or [])[1:] for item in line.split(';')
+               if item]
+
+        if not lines or not lines[0].isdigit() or int(lines[0]) != len(ids):
+            self.err(2, lines)
+            return None
+
+        windows = [(start, min(start + size, len(ids)))
+                   for start in range(0, len(ids), size)]
+        commands = [self.getvalues_compile(branch, properties, find, iid,
+                                           ids=ids[start:end])['command'] +
+                    '; :put "{}:{}"'.format(CHUNK, start)
+                    for start, end in windows]
+        chunks = {}
+
+        if checkpoint:
+            state = os.path.join(checkpoint, 'checkpoint.json')
+            current = {'command': query['command'], 'size': size,
+                       'ids': hashlib.md5(','.join(ids)).hexdigest()}
+
+            if not isdir(checkpoint, True):
+                self.err(3, checkpoint)
+                return None
+
+            if readjson(state) != current:
+                self.checkpoint_clear(checkpoint)
+                if not writejson(state, current):
+                    self.err(3, state)
+                    return None
+
+            for start, _ in windows:
+                filename = os.path.join(checkpoint, '{}.csv'.format(start))
+                if isfile(filename):
+                    with open(filename) as handler:
+                        chunks[start] = handler.read().splitlines()
+
+        pending = [index for index, window in enumerate(windows)
+                   if window[0] not in chunks]
+        parallel = max(int(parallel), 1)
+
+        for offset in range(0, len(pending), parallel):
+            indexes = pending[offset:offset + parallel]
+            results = self.commands_parallel(
+                [commands[index] for index in indexes],
+                self.wireformat == 'unit', limit=parallel)
+
+            if not results:
+                self.err(4, offset)
+                return None
+
+            for index, lines in zip(indexes, results):
+                start = windows[index][0]
+                lines = unit_lines(lines)
+
+                if lines[-1:] != ['{}:{}'.format(CHUNK, start)]:
+                    self.err(5, commands[index])
+                    return None
+
+                chunks[start] = lines[:-1]
+
+                if checkpoint:
+                    filename = os.path.join(checkpoint,
+                                            '{}.csv'.format(start))
+                    try:
+                        with open(filename, 'w') as handler:
+                            handler.writelines(line + '\n' for line in
+                                               chunks[start])
+                    except IOError:
+                        _, message = getexcept()
+                        self.err(6, message)
+                        return None
+
+        lines = [line for start, _ in windows for line in chunks[start]]
+
+        if checkpoint:
+            self.checkpoint_clear(checkpoint)
+
+        return self.getvalues_decode(query, lines, csvout, columnar)
+
+    @staticmethod
+    def checkpoint_clear(checkpoint):
+        """Removes the files of <self.getvalues_chunked> from a checkpoint
+        directory, other files are kept.
+
+        :param checkpoint: (str) Directory of the completed slices.
+        :return: (bool) True
+        """
+        for name in os.listdir(checkpoint):
+            if name == 'checkpoint.json' or re.match(r'^[0-9]+\.csv$', name):
+                os.remove(os.path.join(checkpoint, name))
+
+        return True
+
+    def getvalues_compile(self, branch, properties, find='', iid=False,
+                          ids=None):
+        """Builds the RouterOS script that <self.getvalues> executes.
+
+        :param branch: (str) Branch of commands.
+        :param properties: (str / list) List or Comma / Space separated
+            properties.
+        :param find: (str) Mikrotik CLI filter.
+        :param iid: (bool) Adds $id to output.
+        :param ids: (list) $id of the entries of a list branch, used instead
+            of <find>.
+        :return: (dict) 'command', the fixed 'branch', the 'properties' list
+            and 'iid', False when the script cannot output the $id. None on
+            error.
+        """
         if not hasstring(branch):
             self.err(1)
             return None
@@ -236,6 +702,9 @@ class Router(SSHClient):
             self.err(3)
             return None
 
+        if not hasstring(find):
+            find = ''
+
         command = ''
         commands = []
 
@@ -245,7 +714,8 @@ class Router(SSHClient):
             for prop in properties:
                 commands.append('[{} get {} {}]'.format(branch, find, prop))
 
-            command = ':put ({})'.format('.",".'.join(commands))
+            command = values_script(commands, self.wireformat)
+            iid = False
 
         elif self.branch[branch]['class'] == 'list':
             if iid:
@@ -254,31 +724,182 @@ class Router(SSHClient):
             for prop in properties:
                 commands.append('[{} get $i {}]'.format(branch, prop))
 
-            command = (':foreach i in=[' + branch + ' find ' + find + '] '
-                       'do={:put (' + '.",".'.join(commands) + ')}')
+            entries = '[' + branch + ' find ' + find + ']'
+            if haslist(ids):
+                entries = '[:toarray "' + ','.join(ids) + '"]'
+
+            command = (':foreach i in=' + entries + ' '
+                       'do={' + values_script(commands, self.wireformat) +
+                       '}')
 
         else:
             self.err(4, branch)
             return None
 
-        lines = self.command(command)
+        return {'command': command, 'branch': branch,
+                'properties': properties, 'iid': bool(iid)}
+
+    def snapshot_open(self, ttl=60):
+        """Enables the snapshot of the configuration. Settings branches and
+        static list branches are served by <self.getvalues> from one
+        /export verbose, until <ttl> expires or the branch is changed.
+
+        :param ttl: (int) Lifetime of the export in seconds.
+        :return: (bool) True
+        """
+        self.snapshot = Snapshot(ttl)
+        return True
+
+    def snapshot_load(self):
+        """Exports the configuration to the snapshot.
+
+        :return: (bool) True on success, False on failure.
+        """
+        if self.snapshot is None:
+            return self.err(1)
+
+        lines = self.command('/export verbose')
 
         if not lines or self.errc():
-            self.err(5, command)
+            self.snapshot.invalidate()
+            return self.err(2)
+
+        if not self.snapshot.load(lines):
+            self.messages.extend(self.snapshot.messages)
+            return self.err(3)
+
+        return True
+
+    def snapshot_getvalues(self, branch, properties, find='', iid=False):
+        """Answers <self.getvalues> from the snapshot, exporting again when
+        the branch has expired.
+
+        :param branch: (str) Branch of commands, already fixed.
+        :param properties: (list) Properties.
+        :param find: (str) Mikrotik CLI filter.
+        :param iid: (bool) Adds $id to output.
+        :return: (list) Variables-Values dictionaries. None when the router
+            has to be asked.
+        """
+        definition = self.branch[branch]
+
+        if self.snapshot is None or iid or \
+                definition['class'] == 'list' and definition['dynamic']:
             return None
 
-        if csvout:
-            results = lines
-        else:
-            results = csv_to_listdict(properties, lines, self.branch[branch],
-                                      iid)
+        if not self.snapshot.fresh():
+            if not self.snapshot_load():
+                return None
+
+        return self.snapshot.getvalues(branch, definition, properties, find,
+                                       iid)
+
+    def snapshot_invalidate(self, branch):
+        """Stops serving a changed branch from the snapshot.
+
+        :param branch: (str) Branch of commands.
+        :return: (bool) True
+        """
+        if self.snapshot is not None:
+            self.snapshot.invalidate(branch)
+
+        return True
+
+    def export_archive(self, archive, command='/export'):
+        """Streams the export of the router into an ExportArchive.
+
+        :param archive: (obj) ExportArchive.
+        :param command: (str) Export command, e.g. '/export verbose'.
+        :return: (dict) Result of <ExportArchive.commit>. None on error.
+        """
+        errc = self.errc()
+        hashes = archive.stage(self.host, self.command_iter(command, True))
+
+        if hashes is None or self.errc() > errc:
+            archive.discard(self.host)
+            self.messages.extend(archive.messages)
+            self.err(1, command)
+            return None
+
+        result = archive.commit(self.host, hashes)
+
+        if result is None:
+            self.messages.extend(archive.messages)
+            self.err(2, self.host)
+
+        return result
+
+    def getvalues_batch(self, specs, csvout=False, columnar=False,
+                        optional=None):
+        """Retrieves the values of several branches with a single script. Each
+        query runs in its own section, so a failing query does not abort the
+        others.
+
+        :param specs: (list) Queries as dictionaries with the keys 'branch',
+            'properties' and optionally 'find', 'iid' and 'ids', or as tuples
+            in that order.
+        :param csvout: (bool) Output in CSV File.
+        :param columnar: (bool) Results as <Table>, see <self.getvalues>.
+        :param optional: (list) Indexes of the specs that may fail, e.g. on
+            some models or versions, without an error.
+        :return: (list) One result per spec, in the format of
+            <self.getvalues>. Failed queries are None. None on error.
+        """
+        if not haslist(specs):
+            self.err(1)
+            return None
+
+        queries = []
+
+        for spec in specs:
+            if isinstance(spec, dict):
+                query = self.getvalues_compile(spec.get('branch'),
+                                               spec.get('properties'),
+                                               spec.get('find', ''),
+                                               spec.get('iid', False),
+                                               spec.get('ids'))
+            else:
+                query = self.getvalues_compile(*spec)
+
+            if query is None:
+                self.err(2, spec)
+                return None
+
+            queries.append(query)
+
+        command = sections_script([query['command'] for query in queries])
+        lines = self.command(command, self.wireformat == 'unit')
+
+        if lines is None:
+            self.err(3, command)
+            return None
+
+        sections = sections_split(lines, len(queries))
+        results = []
+
+        for index, query in enumerate(queries):
+            lines = sections[index]
+
+            if lines is None:
+                if index not in (optional or []):
+                    self.err(4, query['command'])
+                results.append(None)
+            else:
+                results.append(self.getvalues_decode(query, lines, csvout,
+                                                     columnar))
 
         return results
 
     def setvalues(self, branch, propvals='', find=''):
         """Sets requested values to remote host. That method compares the
         configuration before and after command execution to detect changes and
-        form the bool result.
+        form the bool result. The update and the second read run in one
+        script, which is skipped when the values already match.
+
+        A change takes two round trips, the first read and then the script.
+        The comparison is not done on the router with an :if guard, because
+        it would need every value in the text that get returns for it, e.g.
+        arrays, booleans and quoting, for every entry that <find> matches.
 
         :param branch: (str) Branch of commands.
         :param propvals: (dict) Dictionary of Variables=Values.
@@ -296,6 +917,8 @@ class Router(SSHClient):
         if not haskey(self.branch, branch, dict):
             return self.err(2, branch)
 
+        self.snapshot_invalidate(branch)
+
         if self.branch[branch]['readonly']:
             return False
 
@@ -321,26 +944,35 @@ class Router(SSHClient):
                     iid = False
                     find_command = find + ' '
 
-        # Get values before updates
-        getvalues0 = self.getvalues(branch, properties, find, False, iid)
-        if not getvalues0:
+        query = self.getvalues_compile(branch, properties, find, iid)
+        if query is None:
             return self.err(5)
 
+        # Get values before update
+        lines = self.command(query['command'], self.wireformat == 'unit')
+        if not lines or self.errc():
+            return self.err(5, query['command'])
+        getvalues0 = self.getvalues_decode(query, lines)
+
         # Exit if Get is same as update
         if not propvals_diff_getvalues(propvals_d, getvalues0):
             return False   # There are no changes to apply
 
-        # Update command
+        # Update and read again in a single script
         command = '{} set {}{}'.format(branch, find_command, propvals)
-        results = self.command(command, hasstdout=False)
-        if results:
+        lines = self.command(sections_script([command, query['command']]),
+                             self.wireformat == 'unit')
+        sections = sections_split(lines, 2)
+
+        # Update command
+        if sections[0] is None or sections[0]:
             self.err(6, command)
-            return self.err(7, results)
+            return self.err(7, sections[0] or lines)
 
         # Get values after update
-        getvalues1 = self.getvalues(branch, properties, find, False, iid)
-        if not getvalues1:
+        if not sections[1]:
             return self.err(8)
+        getvalues1 = self.getvalues_decode(query, sections[1])
 
         # Compare Before and After update command
         if getvalues0 != getvalues1:
@@ -350,7 +982,8 @@ class Router(SSHClient):
     def addentry(self, branch, propvals=''):
         """Adds new entries to remote host. That method compares the
         configuration before and after command execution to detect changes and
-        form the bool result.
+        form the bool result. Counting, the existence check and the add run in
+        one script.
 
         :param branch: (str) Branch of commands
         :param propvals: (str) Space seperated pairs of Variable=Value
@@ -367,6 +1000,8 @@ class Router(SSHClient):
         if not haskey(self.branch, branch, dict):
             return self.err(2, branch)
 
+        self.snapshot_invalidate(branch)
+
         if self.branch[branch]['class'] != 'list':
             return False
 
@@ -376,43 +1011,44 @@ class Router(SSHClient):
         if not hasstring(propvals):
             return self.err(3)
 
-        # Count entries before add command
-        command = ':put [:len [{} find]]'.format(branch)
-        entries_c0 = self.command(command)
-        if not entries_c0:
-            return self.err(4)
-
-        # Check if such an entry exists
-        if self.branch[branch]['id']:
+        # Count, check and add in a single script
+        exists = '0'
+        if self.branch[branch].get('id'):
             propvals_d = propvals_to_dict(propvals)
             prop = self.branch[branch]['id'][0]
 
             if haskey(propvals_d, prop):
-                command = ':put [:len [{} find {}={}]]'.format(branch, prop,
-                                                               propvals_d[prop])
-                result = self.command(command)
+                exists = '[:len [{} find {}={}]]'.format(branch, prop,
+                                                         propvals_d[prop])
 
-                if result[0] != '0':
-                    return False
-
-        # Add Command
         command = '{} add {}'.format(branch, propvals)
-        results = self.command(command, hasstdout=False)
-        if results:
-            if self.checkline_falsepos(results[0]):
+        script = (':local c0 [:len [{0} find]]; :local e {1}; '
+                  ':if ($e = 0) do={{{2}}}; '
+                  ':put ("{3}:" . $c0 . "," . $e . "," . [:len [{0} find]])'
+                  ).format(branch, exists, command, COUNTERS)
+        counters, results = counters_split(self.command(script))
+
+        # Add Command, it aborts the script on failure
+        if counters is None:
+            if results and self.checkline_falsepos(results[0]):
                 self.err0()
                 return False  # Not changed != Failed
             self.err(5, command)
             return self.err(6, results)
 
-        # Count entries after add command
-        command = ':put [:len [{} find]]'.format(branch)
-        entries_c1 = self.command(command)
-        if not entries_c1:
-            return self.err(7)
+        if results:
+            self.err(5, command)
+            return self.err(6, results)
+
+        if len(counters) != 3:
+            return self.err(7, counters)
+
+        # Such an entry exists
+        if counters[1] != '0':
+            return False
 
         # Compare Before and After add command
-        if entries_c0 != entries_c1:
+        if counters[0] != counters[2]:
             return True  # Changed
         return False  # Not changed != Failed
 
@@ -420,7 +1056,8 @@ class Router(SSHClient):
         """Removes entries from remote host based onto <find>. If <find> is
         note set, it will remove everything under that <branch>. That method
         compares the configuration before and after command execution to detect
-        changes and form the bool result.
+        changes and form the bool result. Counting and the remove run in one
+        script.
 
         :param branch: (str) Branch of commands.
         :param find: (str) Mikrotik CLI filter.
@@ -437,6 +1074,8 @@ class Router(SSHClient):
         if not haskey(self.branch, branch, dict):
             return self.err(2, branch)
 
+        self.snapshot_invalidate(branch)
+
         if self.branch[branch]['class'] != 'list':
             return False
 
@@ -446,32 +1085,149 @@ class Router(SSHClient):
         if not hasstring(find):
             find = ''
 
-        # Count entries before remove command
-        command = ':put [:len [{} find]]'.format(branch)
-        entries_c0 = self.command(command)
-        if not entries_c0:
-            return self.err(3)
-
-        # Remove command
+        # Count and remove in a single script
         command = '{} remove [find {}]'.format(branch, find)
-        results = self.command(command, hasstdout=False)
-        if results:
+        script = (':local c0 [:len [{0} find]]; {1}; '
+                  ':put ("{2}:" . $c0 . "," . [:len [{0} find]])'
+                  ).format(branch, command, COUNTERS)
+        counters, results = counters_split(self.command(script))
+
+        # Remove command, it aborts the script on failure
+        if counters is None or results:
+            self.err(3, command)
             return self.err(4, results)
 
-        # Count entries after remove command
-        command = ':put [:len [{} find]]'.format(branch)
-        entries_c1 = self.command(command)
-        if not entries_c1:
-            return self.err(5)
+        if len(counters) != 2:
+            return self.err(5, counters)
 
         # Compare Before and After remove command
-        if entries_c0 != entries_c1:
+        if counters[0] != counters[1]:
             return True  # Changed
         return False  # Not changed != Failed
 
+    def reconcile(self, branch, entries, purge=False, chunk=100, find=''):
+        """Makes the entries of a list branch match <entries>. The current
+        table is read once, the add / set / remove plan is computed locally,
+        keyed by the id properties of the branch, and applied in batched
+        scripts of <chunk> commands.
+
+        :param branch: (str) Branch of commands.
+        :param entries: (list) Desired entries as dictionaries of properties
+            and values.
+        :param purge: (bool) Removes the static entries that are not desired.
+        :param chunk: (int) Commands per script.
+        :param find: (str) Mikrotik CLI filter. Limits the current entries,
+            and so the scope of <purge>.
+        :return: (dict) 'add', 'set' and 'remove' counters of the applied
+            commands and 'changed'. None on error.
+        """
+        if not hasstring(branch):
+            self.err(1)
+            return None
+
+        branch = branchfix(branch)
+
+        if not haskey(self.branch, branch, dict):
+            self.err(2, branch)
+            return None
+
+        self.snapshot_invalidate(branch)
+
+        if self.branch[branch]['class'] != 'list' or \
+                self.branch[branch]['readonly'] or \
+                not self.branch[branch].get('id'):
+            self.err(3, branch)
+            return None
+
+        if not isinstance(entries, list):
+            self.err(4)
+            return None
+
+        idkeys = self.branch[branch]['id']
+        properties = list(idkeys)
+        for entry in entries:
+            if not hasdict(entry):
+                self.err(5, entry)
+                return None
+
+            for prop in sorted(entry):
+                if prop not in properties:
+                    properties.append(prop)
+
+        # Current entries, dynamic ones are never touched
+        if not hasstring(find):
+            find = ''
+        elif find.find('=') < 1:
+            self.err(6, find)  # The find must match by properties
+            return None
+        if self.branch[branch]['dynamic']:
+            find = wtrim('dynamic=no ' + find)
+        current = self.getvalues_batch([(branch, properties, find, True)])
+        if current is None or current[0] is None:
+            self.err(7, branch)
+            return None
+
+        plan = reconcile_plan(current[0], entries, idkeys, purge)
+
+        commands = []
+        if plan['remove']:
+            for index in range(0, len(plan['remove']), chunk):
+                commands.append(('remove', '{} remove {}'.format(
+                    branch, ','.join(plan['remove'][index:index + chunk]))))
+
+        for iid, changes in plan['set']:
+            commands.append(('set', '{} set {} {}'.format(
+                branch, iid, propvals_render(changes))))
+
+        for entry in plan['add']:
+            commands.append(('add', '{} add {}'.format(
+                branch, propvals_render(entry, properties))))
+
+        results = {'add': 0, 'set': 0, 'remove': 0, 'changed': False}
+
+        for index in range(0, len(commands), chunk):
+            batch = commands[index:index + chunk]
+            lines = self.command(sections_script([command[1] for command in
+                                                  batch]))
+            sections = sections_split(lines, len(batch))
+
+            for (action, command), section in zip(batch, sections):
+                if section is None or section:
+                    self.err(8, command)
+                    continue
+
+                if action == 'remove':
+                    results[action] += command.count(',') + 1
+                else:
+                    results[action] += 1
+
+                results['changed'] = True
+
+        return results
+
     def getinfo_model(self):
         """Meta method. Retrieves information from Router.
         """
+        # Formal Name: Board name
+        branch = '/system resource'
+        properties = 'board-name'
+        result1 = self.getvalues(branch, properties)
+
+        # Code: Routerboard + Model
+        branch = '/system routerboard'
+        properties = ['routerboard', 'model']
+        result2 = self.getvalues(branch, properties)
+
+        return self.getinfo_model_parse(result1, result2)
+
+    def getinfo_model_parse(self, result1, result2):
+        """Forms the model information out of the values of /system resource
+        and /system routerboard.
+
+        :param result1: (list) board-name of /system resource.
+        :param result2: (list) routerboard and model of /system routerboard.
+        :return: (dict) name, code and code-alt.
+        """
         name = ''
         code = 'generic'
         code_alt = ''
@@ -480,19 +1236,9 @@ class Router(SSHClient):
                         ('-in', ''), ('-rm', ''), ('-', ''), ('+', ''),
                         (' ', '')]
 
-        # Formal Name: Board name
-        branch = '/system resource'
-        properties = 'board-name'
-        result1 = self.getvalues(branch, properties)
-
         if result1:
             name = result1[0]['board-name']
 
-        # Code: Routerboard + Model
-        branch = '/system routerboard'
-        properties = ['routerboard', 'model']
-        result2 = self.getvalues(branch, properties)
-
         if result2 and result2[0]['routerboard'] == 'true':
             self.routerboard = True
             code = result2[0]['model']
@@ -552,54 +1298,182 @@ class Router(SSHClient):
 
         return None
 
-    def getinfo_interfaces(self, interface=None):
+    # Queries of <self.getinfo_interfaces>, in the order of its results.
+    interfaces_specs = [
+        ('/interface', ['name', 'type', 'mac-address'], 'dynamic!=yes', True),
+        ('/ip address', ['address', 'interface', 'network'], '', True),
+        ('/ipv6 address', ['address', 'interface'], 'dynamic!=yes', True)
+    ]
+
+    def getinfo_interfaces(self, interface=None, previous=None):
         """Meta method. Retrieves information from Router.
+
+        With <previous>, only the $id of the entries are listed first and
+        only the entries that were added since are retrieved. Entries that
+        were removed are dropped. Changes of existing entries, e.g. a renamed
+        interface, are not detected, so a full refresh is still due from time
+        to time.
+
+        :param interface: (str) Name of an interface, all when None.
+        :param previous: (dict) A previous result of this method.
+        :return: (dict) Interfaces by name. None on error.
         """
-        branch = '/interface'
-        properties = ['name', 'type', 'mac-address']
-        results1 = self.getvalues(branch, properties, find='dynamic!=yes',
-                                  iid=True)
+        specs = self.interfaces_specs
+
+        if previous:
+            commands = [':put [{} find {}]'.format(spec[0], spec[2])
+                        for spec in specs]
+            lines = self.command(sections_script(commands))
+
+            if lines is None:
+                self.err(1)
+                return None
+
+            sections = sections_split(lines, len(specs))
+            if sections[0] is None or sections[1] is None:
+                self.err(2, lines)
+                return None
+
+            previous = self.getinfo_interfaces_keep(
+                previous, [ids_split(section) for section in sections])
+            specs = [spec[:4] + (sorted(ids),) for spec, ids in
+                     zip(specs, previous['ids']) if ids]
+
+        results = [[], [], []]
+        if specs:
+            # /ipv6 address fails when the ipv6 package is disabled
+            optional = [index for index, spec in enumerate(specs)
+                        if spec[0] == '/ipv6 address']
+            results = self.getvalues_batch(specs, optional=optional)
+
+            if results is None:
+                return None
+
+        if previous:
+            results = [results.pop(0) if ids else [] for ids in
+                       previous['ids']]
+
+        if results[0] is None or results[1] is None:
+            self.err(3)
+            return None
 
-        branch = '/ip address'
-        properties = ['address', 'interface']
-        results2 = self.getvalues(branch, properties)
+        results = self.getinfo_interfaces_parse(
+            results[0], results[1], results[2],
+            previous['interfaces'] if previous else None)
 
-        results = {}
+        if interface is not None:
+            return {interface: results[interface]} \
+                if interface in results else {}
 
-        if results1:
-            for result1 in results1:
-                name = None
-                if haskey(result1, 'name'):
-                    name = result1['name']
-                if not hasstring(name):
-                    continue
+        return results
+
+    @staticmethod
+    def getinfo_interfaces_keep(previous, ids):
+        """Keeps the entries of a previous <getinfo_interfaces> result that
+        still exist.
+
+        :param previous: (dict) Interfaces by name.
+        :param ids: (list) Sets of the current $id of /interface, /ip address
+            and /ipv6 address.
+        :return: (dict) The kept 'interfaces' and the 'ids' of every branch
+            that are new.
+        """
+        known = [set(), set(), set()]
+        interfaces = {}
+
+        for name, values in previous.items():
+            known[0].add(values['.id'])
+            if values['.id'] not in ids[0]:
+                continue
+
+            interfaces[name] = dict(values)
+
+            for index, key in ((1, 'ip_address'), (2, 'ipv6_address')):
+                addresses = values.get(key) or []
+                known[index].update(address.get('.id') for address in
+                                    addresses)
+                interfaces[name][key] = [address for address in addresses
+                                         if address.get('.id') in ids[index]]
+
+        return {'interfaces': interfaces,
+                'ids': [current - old for current, old in zip(ids, known)]}
+
+    def getinfo_interfaces_parse(self, results1, results2, results3=None,
+                                 previous=None):
+        """Forms the interface information out of the values of /interface,
+        /ip address and /ipv6 address. Addresses are grouped by interface in
+        one pass.
+
+        :param results1: (list) .id, name, type and mac-address of /interface.
+        :param results2: (list) .id, address, interface and network of
+            /ip address.
+        :param results3: (list) .id, address and interface of /ipv6 address.
+        :param previous: (dict) Interfaces to extend, by name.
+        :return: (dict) Interfaces by name.
+        """
+        results = previous or {}
+        masks = {}
+
+        for result1 in results1 or []:
+            name = None
+            if haskey(result1, 'name'):
+                name = result1['name']
+            if not hasstring(name):
+                continue
+
+            results[name] = {
+                '.id': result1['.id'],
+                'type': result1['type'],
+                'mac_address': result1['mac-address'],
+                'ip_address': [],
+                'ipv6_address': []
+            }
 
-                results[name] = {
-                    '.id': result1['.id'],
-                    'type': result1['type'],
-                    'mac_address': result1['mac-address'],
-                    'ip_address': []
-                }
-
-                # Bug: PPPoE intrfaces from ISP will have irregular network
-                #      address
-                if results2:
-                    for result2 in results2:
-                        if result2['interface'] == name:
-                            address = result2['address'].split('/')
-                            network = ipaddress.IPv4Network(result2[
-                                'address'].decode('utf-8'), False)
-                            ip_address = {
-                                'address': address[0],
-                                'nbits': address[1],
-                                'netmask': str(
-                                    network.netmask).encode('utf-8'),
-                                'network': str(
-                                    network.network_address).encode('utf-8'),
-                                'broadcast': str(
-                                    network.broadcast_address).encode('utf-8')
-                            }
-
-                            results[name]['ip_address'].append(ip_address)
+        for key, rows in (('ip_address', results2),
+                          ('ipv6_address', results3)):
+            for name, addresses in addresses_group(rows, masks).items():
+                if name in results:
+                    results[name].setdefault(key, []).extend(addresses)
 
         return results
+
+    def getinfo_facts(self):
+        """Meta method. Retrieves the information of every getinfo_* method
+        with a single script.
+
+        :return: (dict) model, identity, serialnumber, license and
+            interfaces. None on error.
+        """
+        # Sections that fail on some devices: the model and serial-number
+        # of a CHR, software-id of RouterOS 7, system-id of RouterOS 6 and
+        # the IPv6 addresses without the ipv6 package.
+        results = self.getvalues_batch([
+            ('/system resource', 'board-name'),
+            ('/system routerboard', ['routerboard', 'model']),
+            ('/system routerboard', 'serial-number'),
+            ('/system identity', 'name'),
+            ('/system license', 'software-id'),
+            ('/system license', 'system-id')
+        ] + self.interfaces_specs, optional=[1, 2, 4, 5, 8])
+
+        if results is None:
+            return None
+
+        software_id = None
+        for result in results[4:6]:
+            if result:
+                software_id = result[0].values()[0]
+                break
+
+        serialnumber = software_id
+        model = self.getinfo_model_parse(results[0], results[1])
+        if self.routerboard and results[2]:
+            serialnumber = results[2][0]['serial-number']
+
+        return {
+            'model': model,
+            'identity': results[3][0]['name'] if results[3] else None,
+            'serialnumber': serialnumber,
+            'license': software_id,
+            'interfaces': self.getinfo_interfaces_parse(*results[6:9])
+        }
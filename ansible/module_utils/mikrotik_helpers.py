@@ -8,10 +8,30 @@
 
 import re
 import csv
+import ipaddress
+import StringIO
+from itertools import izip, imap, repeat
+from operator import itemgetter, methodcaller
 from ansible.module_utils.remote_management.yama.valid import hasstring, \
     haslist, hasdict, haskey
 from ansible.module_utils.remote_management.yama.strings import wtrim
 
+# Marker that separates the output of the queries of a single script.
+SECTION = 'yama-section'
+
+# Marker of the counters line that addentry and removeentry scripts print.
+COUNTERS = 'yama-counters'
+
+# Marker of the entries of a bulk load script that failed.
+RSC_ERROR = 'yama-error'
+
+# Marker that closes each slice of a chunked getvalues.
+CHUNK = 'yama-chunk'
+
+# Field separator of the 'unit' wire format of getvalues, ASCII unit
+# separator.
+UNIT = '\x1f'
+
 
 def branchfix(data):
     """Applies some fixes to branch part of the command.
@@ -35,18 +55,33 @@ def exportfix(data):
     if not haslist(data):
         return []
 
-    results = []
-    buf = ''
+    return list(lines_join(data))
 
-    for line in data:
-        if line[-2] == '\\':
-            buf += line[:-2]
 
-        else:
-            results.append(buf + line)
-            buf = ''
+def lines_join(lines):
+    """Joins the lines that are continued with a backslash.
 
-    return results
+    :param lines: (iterable) Lines of an export, with or without newlines.
+    :return: (generator) Complete lines.
+    """
+    buf = None
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+
+        if buf is not None:
+            line = buf + line.lstrip()
+
+        # An odd number of backslashes ends with the continuation one
+        if (len(line) - len(line.rstrip('\\'))) % 2:
+            buf = line[:-1]
+            continue
+
+        buf = None
+        yield line
+
+    if buf is not None:
+        yield buf
 
 
 def properties_to_list(data):
@@ -195,3 +230,499 @@ def csv_to_listdict(properties, lines, branch, iid=False):
             results.append(result)
 
     return results
+
+
+def csv_iter(properties, lines, iid=False):
+    """Converts Mikrotik's CSV output to dictionaries, one line at a time.
+
+    :param properties: (list) Practically the CSV header.
+    :param lines: (iterable) Comma delimeted lines, e.g. the output of
+        <Router.command_iter>.
+    :param iid: (bool) The first value of every line is the $id.
+    :return: (generator) Variables-Values dictionaries, as
+        <csv_to_listdict> returns them.
+    """
+    columns = (['.id'] if iid else []) + list(properties)
+
+    for values in csv.reader(lines, delimiter=',', quotechar='"'):
+        yield dict(zip(columns, [value.replace(';', ',')
+                                 for value in values]))
+
+
+def values_script(values, wireformat='csv'):
+    """Renders the :put that prints one row of getvalues.
+
+    In the 'csv' wire format the values are joined with commas. In the
+    'unit' format the row starts with the first letter of the type of every
+    value, followed by the values, each one closed by <UNIT>:
+
+        sa<US>192.0.2.1<US>a;b<US>
+
+    So a value may contain commas, quotes, semicolons or new lines, and only
+    the ';' of arrays ('a') is converted back to ','.
+
+    :param values: (list) RouterOS expressions of the values.
+    :param wireformat: (str) 'csv' or 'unit'.
+    :return: (str) RouterOS script.
+    """
+    if wireformat != 'unit':
+        return ':put ({})'.format('.",".'.join(values))
+
+    names = ['$v{}'.format(index) for index in range(0, len(values))]
+    script = [':local v{} {}'.format(index, value)
+              for index, value in enumerate(values)]
+    tags = '.'.join('[:pick [:typeof {}] 0 1]'.format(name)
+                    for name in names)
+    fields = ''.join('."\\1F".[:tostr {}]'.format(name) for name in names)
+
+    return '; '.join(script + [':put ({}{}."\\1F")'.format(tags, fields)])
+
+
+def unit_rows(lines, columns=None):
+    """Decodes the 'unit' wire format of <values_script>. A value with new
+    lines spans several output lines, which are joined again.
+
+    :param lines: (iterable) Output lines.
+    :param columns: (list) Properties, .id first when present. Yields
+        Variables-Values dictionaries when set.
+    :return: (generator) Lists of values, or dictionaries.
+    """
+    buf = None
+
+    for line in lines:
+        if buf is not None:
+            line = buf + '\n' + line
+
+        values = line.split(UNIT)
+        tags = values[0]
+
+        if len(values) < len(tags) + 2:
+            buf = line  # Continued on the next line
+            continue
+
+        buf = None
+        values = values[1:-1]
+
+        if 'a' in tags:
+            for index, tag in enumerate(tags):
+                if tag == 'a':
+                    values[index] = values[index].replace(';', ',')
+
+        yield dict(izip(columns, values)) if columns else values
+
+
+def unit_lines(lines):
+    """Drops the empty lines after the last row of the 'unit' wire format.
+    Its output is read raw, as stripping or dropping lines would change the
+    values, so the new line that ends the output leaves an empty line.
+
+    :param lines: (list) Raw output lines.
+    :return: (list) Lines.
+    """
+    end = len(lines or [])
+
+    while end and not lines[end - 1]:
+        end -= 1
+
+    return (lines or [])[:end]
+
+
+def unit_split(lines, width):
+    """Splits a complete output of the 'unit' wire format, without a loop
+    per line in Python. Only the usual output qualifies, where no value is
+    an array or holds a new line.
+
+    :param lines: (list) Output lines.
+    :param width: (int) Values per row.
+    :return: (list) Lists of the fields of each line, the types first and
+        an empty field last. None when <unit_rows> has to decode the output.
+    """
+    rows = map(methodcaller('split', UNIT), lines)
+
+    if set(map(len, rows)) != set([width + 2]):
+        return None
+
+    if any('a' in tags for tags in set(imap(itemgetter(0), rows))):
+        return None
+
+    return rows
+
+
+def unit_decode(lines, columns):
+    """Decodes a complete output of the 'unit' wire format.
+
+    :param lines: (list) Output lines.
+    :param columns: (list) Properties, .id first when present.
+    :return: (list) Variables-Values dictionaries.
+    """
+    rows = unit_split(lines, len(columns))
+
+    if rows is None:
+        return list(unit_rows(lines, columns))
+
+    return map(dict, imap(izip, repeat(columns),
+                          imap(itemgetter(slice(1, -1)), rows)))
+
+
+def rows_to_csv(rows):
+    """Encodes lists of values to CSV lines, quoting where needed.
+
+    :param rows: (iterable) Lists of values.
+    :return: (list) Lines.
+    """
+    results = []
+    handler = StringIO.StringIO()
+    writer = csv.writer(handler, lineterminator='\n')
+
+    for values in rows:
+        writer.writerow(values)
+        results.append(handler.getvalue()[:-1])
+        handler.seek(0)
+        handler.truncate()
+
+    return results
+
+
+def sections_script(commands):
+    """Joins several RouterOS commands into one script. Each command prints a
+    marker before its output and runs inside :do, so an error only marks its
+    own section as failed.
+
+    :param commands: (list) RouterOS commands.
+    :return: (str) Script.
+    """
+    results = []
+
+    for index, command in enumerate(commands):
+        results.append(':put "{0}:{1}"; :do {{{2}}} on-error={{:put "{0}:{1}:'
+                       'error"}}'.format(SECTION, index, command))
+
+    return '; '.join(results)
+
+
+def sections_split(lines, count):
+    """Splits the output of <sections_script> back into sections.
+
+    :param lines: (list) Output lines.
+    :param count: (int) Number of commands of the script.
+    :return: (list) Output lines per command. None for commands that failed
+        or never ran.
+    """
+    results = [None] * count
+    index = None
+
+    for line in lines or []:
+        if line.startswith(SECTION + ':'):
+            parts = line.split(':')
+
+            try:
+                index = int(parts[1])
+            except ValueError:
+                index = None
+                continue
+
+            if index < 0 or index >= count:
+                index = None
+            elif len(parts) > 2:
+                results[index] = None
+                index = None
+            else:
+                results[index] = []
+
+        elif index is not None:
+            results[index].append(line)
+
+    return results
+
+
+def counters_split(lines):
+    """Finds the counters line among the output of a script.
+
+    :param lines: (list) Output lines.
+    :return: (tuple) The list of counters, or None when the line is missing,
+        and the rest of the lines.
+    """
+    counters = None
+    others = []
+
+    for line in lines or []:
+        if line.startswith(COUNTERS + ':'):
+            counters = line[len(COUNTERS) + 1:].split(',')
+        elif line:
+            others.append(line)
+
+    return counters, others
+
+
+def value_quote(value):
+    """Quotes a value for the Mikrotik CLI when it is needed.
+
+    :param value: (str) Value.
+    :return: (str) Value as it can be written after property=.
+    """
+    if value is True:
+        return 'yes'
+
+    if value is False:
+        return 'no'
+
+    value = '{}'.format(value)
+
+    if re.match(r'^[\w.,:/*+@-]+$', value):
+        return value
+
+    return '"{}"'.format(re.sub(r'(["\\$])', r'\\\1', value)
+                         .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def propvals_render(propvals, properties=None):
+    """Converts a dictionary of properties and values to CLI pairs.
+
+    :param propvals: (dict) Properties and values.
+    :param properties: (list) Order of the properties, all when None.
+    :return: (str) Space separated pairs of Variable=Value.
+    """
+    if properties is None:
+        properties = sorted(propvals)
+
+    return ' '.join('{}={}'.format(prop, value_quote(propvals[prop]))
+                    for prop in properties if prop in propvals)
+
+
+def value_text(value):
+    """Converts a value to the text that Mikrotik's get returns for it, so
+    desired and current values can be compared.
+
+    :param value: (str / bool / int) Value.
+    :return: (str) Value.
+    """
+    if value is True or value == 'yes':
+        return 'true'
+
+    if value is False or value == 'no':
+        return 'false'
+
+    return '{}'.format(value)
+
+
+def reconcile_plan(current, desired, idkeys, purge=False):
+    """Computes the changes that turn the current entries of a list branch
+    into the desired ones. Entries are matched by the values of <idkeys> and
+    only the properties of the desired entries are compared.
+
+    :param current: (list) Entries with '.id', as <csv_to_listdict> returns
+        them.
+    :param desired: (list) Entries as dictionaries of properties and values.
+    :param idkeys: (list) Properties that identify an entry.
+    :param purge: (bool) Removes the current entries that are not desired.
+    :return: (dict) 'add': list of entries, 'set': list of (.id, changed
+        properties) tuples and 'remove': list of .id.
+    """
+    results = {'add': [], 'set': [], 'remove': []}
+    entries = {}
+    matched = set()
+
+    for entry in current or []:
+        key = tuple(value_text(entry.get(prop)) for prop in idkeys)
+
+        if key not in entries:
+            entries[key] = entry
+        elif purge:
+            results['remove'].append(entry['.id'])
+
+    for entry in desired or []:
+        key = tuple(value_text(entry.get(prop)) for prop in idkeys)
+
+        if key not in entries:
+            results['add'].append(entry)
+            continue
+
+        found = entries[key]
+
+        if found['.id'] in matched:
+            continue  # Duplicate desired entry
+
+        matched.add(found['.id'])
+        changes = {}
+
+        for prop in entry:
+            if value_text(entry[prop]) != value_text(found.get(prop, '')):
+                changes[prop] = entry[prop]
+
+        if changes:
+            results['set'].append((found['.id'], changes))
+
+    if purge:
+        for entry in current or []:
+            key = tuple(value_text(entry.get(prop)) for prop in idkeys)
+
+            if entries[key] is entry and entry['.id'] not in matched:
+                results['remove'].append(entry['.id'])
+
+    return results
+
+
+def rsc_render(branch, entries, start=0, tolerant=True):
+    """Renders entries to the lines of a .rsc script that adds them.
+
+    :param branch: (str) Branch of commands.
+    :param entries: (list) Entries as dictionaries of properties and values.
+    :param start: (int) Index of the first entry, used in the error markers.
+    :param tolerant: (bool) Runs every add in :do, so a failing entry is
+        reported and does not abort the import.
+    :return: (list) Lines.
+    """
+    results = []
+
+    for index, entry in enumerate(entries or [], start):
+        command = '{} add {}'.format(branch, propvals_render(entry))
+
+        if tolerant:
+            command = ':do {{{}}} on-error={{:put "{}:{}"}}'.format(
+                command, RSC_ERROR, index)
+
+        results.append(command)
+
+    return results
+
+
+def rsc_chunks(lines, size=65536):
+    """Groups script lines to chunks of up to <size> bytes. A line longer than
+    <size> makes a chunk of its own.
+
+    :param lines: (list) Script lines.
+    :param size: (int) Maximum size of a chunk.
+    :return: (generator) (script, number of lines) tuples.
+    """
+    chunk = []
+    length = 0
+
+    for line in lines or []:
+        if chunk and length + len(line) + 1 > size:
+            yield '\n'.join(chunk) + '\n', len(chunk)
+            chunk = []
+            length = 0
+
+        chunk.append(line)
+        length += len(line) + 1
+
+    if chunk:
+        yield '\n'.join(chunk) + '\n', len(chunk)
+
+
+def rsc_errors(lines):
+    """Collects the indexes of the entries that failed during an import.
+
+    :param lines: (list) Output lines of /import.
+    :return: (tuple) List of indexes of the failed entries and the rest of
+        the lines.
+    """
+    indexes = []
+    others = []
+
+    for line in lines or []:
+        if line.startswith(RSC_ERROR + ':'):
+            try:
+                indexes.append(int(line[len(RSC_ERROR) + 1:]))
+            except ValueError:
+                others.append(line)
+        elif line:
+            others.append(line)
+
+    return indexes, others
+
+
+def ids_split(lines):
+    """Converts the output of :put [<branch> find] to a set of $id.
+
+    :param lines: (list) Output lines.
+    :return: (set) $id.
+    """
+    return set(item for line in lines or [] for item in line.split(';')
+               if item)
+
+
+def address_parse(address, peer=None, masks=None):
+    """Computes the netmask, network and broadcast of an IPv4 or IPv6
+    address. The masks of each prefix length are computed once, in <masks>,
+    so a batch of addresses costs one parse per address.
+
+    A PPPoE or other point-to-point address is a /32 with the remote end as
+    its network, e.g. address=100.64.0.2/32 network=10.0.0.1. Then <peer> is
+    reported as the network and there is no broadcast.
+
+    :param address: (str) Address with or without /prefix.
+    :param peer: (str) network property of /ip address.
+    :param masks: (dict) Cache of the masks, shared by a batch.
+    :return: (dict) address, nbits, netmask, network and broadcast. None if
+        <address> is invalid.
+    """
+    if masks is None:
+        masks = {}
+
+    host, _, nbits = address.partition('/')
+
+    try:
+        host = ipaddress.ip_address(u'{}'.format(host))
+        key = (host.version, nbits)
+
+        if key not in masks:
+            mask = ipaddress.ip_network(u'{}/{}'.format(
+                '0.0.0.0' if host.version == 4 else '::', nbits or
+                host.max_prefixlen))
+            masks[key] = (mask.prefixlen, int(mask.netmask),
+                          int(mask.hostmask))
+
+    except ValueError:
+        return None
+
+    prefixlen, netmask, hostmask = masks[key]
+    network = int(host) & netmask
+    results = {
+        'address': str(host),
+        'nbits': str(prefixlen),
+        'netmask': str(host.__class__(netmask)),
+        'network': str(host.__class__(network)),
+        'broadcast': None
+    }
+
+    if host.version == 4:
+        results['broadcast'] = str(host.__class__(network | hostmask))
+
+        if peer and prefixlen == 32 and peer != results['network']:
+            results['network'] = peer
+            results['broadcast'] = None
+
+    return results
+
+
+def addresses_group(results, masks=None):
+    """Groups the entries of /ip address or /ipv6 address by interface, in
+    one pass.
+
+    :param results: (list) address, interface and optionally .id and
+        network, as <csv_to_listdict> returns them.
+    :param masks: (dict) Cache of the masks, see <address_parse>.
+    :return: (dict) interface - list of addresses as <address_parse> returns
+        them, with the .id of the entry when it is known.
+    """
+    if masks is None:
+        masks = {}
+
+    groups = {}
+
+    for result in results or []:
+        if not haskey(result, 'address') or not haskey(result, 'interface'):
+            continue
+
+        address = address_parse(result['address'], result.get('network'),
+                                masks)
+        if address is None:
+            continue
+
+        if '.id' in result:
+            address['.id'] = result['.id']
+
+        groups.setdefault(result['interface'], []).append(address)
+
+    return groups
@@ -16,9 +16,9 @@ class ErrorObject(object):
     reseterrors = False # Reset errors before every command call.
 
     def __init__(self):
-        """Init - Does nothing at the moment.
+        """Init - Every object collects its own errors.
         """
-        pass
+        self.messages = []
 
     def err(self, code=0, message=''):
         """The function that receives the errors.
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Parallel TCP reachability scan.
+<ansible.module_utils.remote_management.yama.prescan>
+
+Non-blocking connects to the SSH port of every host at once, so dead hosts
+are known in a couple of seconds instead of one paramiko timeout each.
+
+Example:
+    results = scan(['192.0.2.1', ('192.0.2.2', 2222)])
+    device.prescan = results  # connect() fails fast if it is not reachable.
+"""
+
+import time
+import errno
+import select
+import socket
+import resource
+from ansible.module_utils.remote_management.yama.valid import hasstring
+
+REACHABLE = 'reachable'
+REFUSED = 'refused'
+FILTERED = 'filtered'
+UNREACHABLE = 'unreachable'
+
+# States that make connect() fail without calling paramiko.
+FAILED = (REFUSED, FILTERED, UNREACHABLE)
+
+# errno of a connect that failed on this side, e.g. out of file descriptors,
+# buffers or local ports. They say nothing about the target.
+LOCAL = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM,
+         errno.EADDRNOTAVAIL)
+
+
+def scan_key(host, port=22):
+    """Builds the result key of a target.
+
+    :param host: (str) Remote host.
+    :param port: (int) TCP Port.
+    :return: (str) host:port
+    """
+    return '{}:{}'.format(host, port)
+
+
+def scan_state(code):
+    """Classifies the outcome of a connect.
+
+    :param code: (int) errno of the connect, 0 on success.
+    :return: (str) One of REACHABLE, REFUSED, FILTERED and UNREACHABLE.
+    """
+    if code == 0:
+        return REACHABLE
+    if code == errno.ECONNREFUSED:
+        return REFUSED
+    if code in (errno.ETIMEDOUT, errno.EAGAIN):
+        return FILTERED
+    return UNREACHABLE
+
+
+def scan_limit(limit):
+    """Caps the sockets of a batch to half of the soft limit of open files,
+    the other half is left to the rest of the process.
+
+    :param limit: (int) Requested sockets open at the same time.
+    :return: (int) Sockets open at the same time.
+    """
+    soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+    if soft == resource.RLIM_INFINITY:
+        return limit
+
+    return max(min(limit, soft // 2), 1)
+
+
+def scan(targets, port=22, timeout=2.0, limit=1000):
+    """Connects to every target in parallel and classifies it. Targets that
+    hit a local error, see LOCAL, are retried in the next batch, and left out
+    of the results if they still fail, so connect() tries them as usual.
+
+    :param targets: (list) Hosts, (host, port) tuples or dictionaries with
+        'host' and optionally 'port'.
+    :param port: (int) Default TCP Port.
+    :param timeout: (float) Seconds to wait for a batch of connects.
+    :param limit: (int) Sockets open at the same time, at most half of the
+        soft limit of open files.
+    :return: (dict) host:port - state.
+    """
+    results = {}
+    keys = set()
+    pending = []
+
+    for target in targets or []:
+        if hasstring(target):
+            target = (target, port)
+        elif isinstance(target, dict):
+            target = (target.get('host'), target.get('port') or port)
+
+        if not (isinstance(target, tuple) and hasstring(target[0])):
+            continue
+
+        key = scan_key(target[0], int(target[1]))
+        if key not in keys:
+            keys.add(key)
+            pending.append((key, target[0], int(target[1])))
+
+    limit = scan_limit(limit)
+    retried = set()
+
+    while pending:
+        batch, pending = pending[:limit], pending[limit:]
+        states, deferred = scan_batch(batch, timeout)
+        results.update(states)
+
+        # A target is retried once, after the sockets of its batch closed
+        deferred = [target for target in deferred if target[0] not in retried]
+        retried.update(target[0] for target in deferred)
+        pending += deferred
+
+    return results
+
+
+def scan_batch(targets, timeout):
+    """Connects to a batch of targets in parallel.
+
+    :param targets: (list) (key, host, port) tuples.
+    :param timeout: (float) Seconds to wait for the batch.
+    :return: (tuple) host:port - state, and the targets that hit a local
+        error.
+    """
+    results = {}
+    deferred = []
+    sockets = {}
+
+    for target in targets:
+        key, host, port = target
+        sock = None
+
+        try:
+            family, kind, proto, _, address = socket.getaddrinfo(
+                host, port, 0, socket.SOCK_STREAM)[0]
+            sock = socket.socket(family, kind, proto)
+            sock.setblocking(0)
+            code = sock.connect_ex(address)
+
+        except socket.gaierror:
+            results[key] = UNREACHABLE
+            continue
+
+        except socket.error as error:
+            if sock is not None:
+                sock.close()
+            if error.errno in LOCAL:
+                deferred.append(target)
+            else:
+                results[key] = UNREACHABLE
+            continue
+
+        if code in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            sockets[sock.fileno()] = (key, sock)
+        elif code in LOCAL:
+            deferred.append(target)
+            sock.close()
+        else:
+            results[key] = scan_state(code)
+            sock.close()
+
+    deadline = time.time() + timeout
+
+    if hasattr(select, 'poll'):
+        poller = select.poll()
+        for fileno in sockets:
+            poller.register(fileno, select.POLLOUT)
+
+    while sockets:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+
+        if hasattr(select, 'poll'):
+            ready = [event[0] for event in poller.poll(remaining * 1000)]
+        else:
+            ready = select.select([], list(sockets)[:500], [], remaining)[1]
+
+        for fileno in ready:
+            key, sock = sockets.pop(fileno)
+            results[key] = scan_state(
+                sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR))
+            if hasattr(select, 'poll'):
+                poller.unregister(fileno)
+            sock.close()
+
+    for key, sock in sockets.values():
+        results[key] = FILTERED
+        sock.close()
+
+    return results, deferred
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Router commands and SFTP transfers over one SSH transport.
+<ansible.module_utils.remote_management.yama.session>"""
+
+import os
+import time
+import threading
+import Queue
+from ansible.module_utils.remote_management.yama.mikrotik import Router
+from ansible.module_utils.remote_management.yama.sftp_client import SFTPClient
+from ansible.module_utils.remote_management.yama.valid import hasstring, \
+    haskey
+from ansible.module_utils.remote_management.yama.mikrotik_helpers import \
+    branchfix, rsc_render, rsc_chunks, rsc_errors
+
+
+class Session(Router):
+    """A Router that opens the SFTP subsystem on its own transport, so
+    commands and transfers share one key exchange and authentication.
+    """
+    sftp = None
+    shared = False  # The transport belongs to another object.
+
+    def __init__(self, host, port=22, username='admin', password='',
+                 pkey_string='', pkey_file='',
+                 branch_file='config/mikrotik_branch.json'):
+        """Initializes a Session object. Parameters are the same as Router.
+        """
+        self.sftp = None
+        self.shared = False
+
+        super(Session, self).__init__(host, port, username, password,
+                                      pkey_string, pkey_file, branch_file)
+
+    @classmethod
+    def fromclient(cls, client, branch_file='config/mikrotik_branch.json'):
+        """Creates a Session on the transport of a connected SSHClient or
+        SFTPClient. The transport stays owned by <client>.
+
+        :param client: (obj) Connected SSHCommon object.
+        :param branch_file: (file) Path of branch.json.
+        :return: (obj) Session.
+        """
+        session = cls(client.host, client.port, client.username,
+                      client.password, client.pkey_string, client.pkey_file,
+                      branch_file)
+        session.ssh_auth = client.ssh_auth
+
+        if client.status == 1 and session.attach(client.gettransport()):
+            session.shared = True
+        else:
+            session.err(1, client.host)
+
+        return session
+
+    def sftp_open(self, connect=True):
+        """Opens the SFTP subsystem on the transport of the session.
+
+        :param connect: (bool) Connects to host, if it is not connected already.
+        :return: (bool) True on success, False on failure.
+        """
+        if self.sftp and self.sftp.status == 1:
+            return True
+
+        if self.status < 1 and connect:
+            self.connect()
+
+        if self.status < 1:
+            return self.err(1, self.status)
+
+        self.sftp = SFTPClient(self.host, self.port, self.username,
+                               self.password, self.pkey_string, self.pkey_file)
+        self.sftp.err0()
+
+        if not self.sftp.attach(self.gettransport()):
+            self.messages.extend(self.sftp.messages)
+            self.sftp = None
+            return self.err(2, self.host)
+
+        return True
+
+    def sftp_close(self):
+        """Closes the SFTP subsystem, but leaves the transport open.
+
+        :return: (bool) True on success, False on failure.
+        """
+        if self.sftp is None:
+            return True
+
+        self.sftp.detach()
+        self.sftp = None
+        return True
+
+    def transfer(self, method, source, destination):
+        """Runs an SFTPClient transfer method and collects its errors.
+
+        :param method: (str) Name of the SFTPClient method.
+        :param source: (str) Source path.
+        :param destination: (str) Destination path.
+        :return: (bool) True on success, False on failure.
+        """
+        if not self.sftp_open():
+            return False
+
+        self.sftp.err0()
+        result = getattr(self.sftp, method)(source, destination)
+        self.messages.extend(self.sftp.messages)
+
+        return result
+
+    def upload(self, local, remote):
+        """Uploads local files or directories to remote host.
+
+        :param local: (str) Local path.
+        :param remote: (str) Remote path.
+        :return: (bool) True on success, False on failure.
+        """
+        return self.transfer('upload', local, remote)
+
+    def upload_file(self, local, remote):
+        """Uploads local files to remote host.
+
+        :param local: (str) Local path.
+        :param remote: (str) Remote path.
+        :return: (bool) True on success, False on failure.
+        """
+        return self.transfer('upload_file', local, remote)
+
+    def download(self, remote, local):
+        """Downloads remote files or directories to local path.
+
+        :param remote: (str) Remote path.
+        :param local: (str) Local path.
+        :return: (bool) True on success, False on failure.
+        """
+        return self.transfer('download', remote, local)
+
+    def download_file(self, remote, local):
+        """Downloads remote files to local path.
+
+        :param remote: (str) Remote path.
+        :param local: (str) Local path.
+        :return: (bool) True on success, False on failure.
+        """
+        return self.transfer('download_file', remote, local)
+
+    def bulkload(self, branch, entries, directory='', size=65536,
+                 tolerant=True):
+        """Adds many entries to a list branch. The entries are rendered to .rsc
+        chunks of up to <size> bytes, which are uploaded and run with /import.
+        The next chunk is uploaded while the previous one imports, and all of
+        them are removed at the end.
+
+        :param branch: (str) Branch of commands.
+        :param entries: (list) Entries as dictionaries of properties and values.
+        :param directory: (str) Remote directory of the chunks, e.g. a RAM disk.
+        :param size: (int) Maximum size of a chunk in bytes.
+        :param tolerant: (bool) A failing entry is reported, instead of
+            aborting its chunk.
+        :return: (dict) 'chunks', 'entries', 'loaded', the indexes of the
+            'failed' entries and 'complete', False when the load stopped
+            before the last chunk. The chunks that were imported stay on the
+            router, so a partial load is returned too, along with the errors.
+            None on error before the first upload.
+        """
+        if not hasstring(branch):
+            self.err(1)
+            return None
+
+        branch = branchfix(branch)
+
+        if not haskey(self.branch, branch, dict) or \
+                self.branch[branch]['class'] != 'list' or \
+                self.branch[branch]['readonly']:
+            self.err(2, branch)
+            return None
+
+        self.snapshot_invalidate(branch)
+
+        if not isinstance(entries, list):
+            self.err(3)
+            return None
+
+        if not self.sftp_open():
+            return None
+
+        self.sftp.err0()
+        prefix = 'yama-bulk-{}-{}'.format(os.getpid(), int(time.time()))
+        directory = (directory or '').strip('/')
+        uploaded = Queue.Queue(1)
+        stop = threading.Event()
+        names = []
+
+        def uploader():
+            """Uploads the chunks one by one, ahead of the imports.
+            """
+            start = 0
+            lines = rsc_render(branch, entries, 0, tolerant)
+
+            for index, (script, count) in enumerate(rsc_chunks(lines, size)):
+                if stop.is_set():
+                    break
+
+                name = '{}-{}.rsc'.format(prefix, index)
+                if directory:
+                    name = '{}/{}'.format(directory, name)
+
+                if not self.sftp.upload_string(script, name):
+                    break
+
+                names.append(name)
+                uploaded.put((name, start, count))
+                start += count
+
+            uploaded.put(None)
+
+        thread = threading.Thread(target=uploader)
+        thread.daemon = True
+        thread.start()
+
+        results = {'chunks': 0, 'entries': len(entries), 'loaded': 0,
+                   'failed': [], 'complete': True}
+
+        while True:
+            chunk = uploaded.get()
+            if chunk is None:
+                break
+
+            if stop.is_set():
+                continue  # Drains the queue, so the uploader can finish.
+
+            name, start, count = chunk
+            command = '/import file-name={} verbose=yes'.format(name)
+            failed, lines = rsc_errors(self.command(command, hasstdout=False))
+
+            if not [line for line in lines
+                    if line.find('executed successfully') >= 0]:
+                self.err(4, command)
+                self.err(5, lines[-5:])
+                stop.set()
+                continue
+
+            results['chunks'] += 1
+            results['loaded'] += count - len(failed)
+            results['failed'] += failed
+
+        thread.join()
+
+        for name in names:
+            self.sftp.remove_remote(name)
+
+        self.messages.extend(self.sftp.messages)
+
+        if len(self.sftp.messages) or stop.is_set():
+            results['complete'] = False
+
+        return results
+
+    def detach(self):
+        """Closes the SFTP subsystem and drops the connection, but leaves its
+        transport open.
+
+        :return: (obj) paramiko.Transport or None.
+        """
+        self.sftp_close()
+        self.shared = False
+        return super(Session, self).detach()
+
+    def disconnect(self):
+        """Closes the SFTP subsystem and disconnects from current host. A
+        shared transport is left to its owner.
+
+        :return: (bool) True on success, False on failure.
+        """
+        if self.shared:
+            self.detach()
+            return True
+
+        self.sftp_close()
+        return super(Session, self).disconnect()
@@ -38,6 +38,9 @@ class SFTPClient(SSHCommon):
             if self.checkconnection():
                 return True
 
+        if not self.precheck():
+            return False
+
         # Check this approach (timeout is not being used):
         # https://stackoverflow.com/questions/9758432/timeout-in-paramiko-python
         _ = timeout
@@ -67,6 +70,7 @@ class SFTPClient(SSHCommon):
             self.connection = paramiko.SFTPClient.from_transport(
                 self.transport)
             self.status = 1
+            self.postcheck()
             return True
 
         except socket.error:
@@ -89,8 +93,72 @@ class SFTPClient(SSHCommon):
             _, message = getexcept()
             err_code = 6
 
+        self.postcheck(err_code, message)
         return self.err(err_code, message)
 
+    def gettransport(self):
+        """Returns the authenticated transport of the connection.
+
+        :return: (obj) paramiko.Transport or None.
+        """
+        return self.transport
+
+    def attach(self, transport):
+        """Opens the SFTP subsystem on an already authenticated transport.
+
+        :param transport: (obj) paramiko.Transport.
+        :return: (bool) Connection status.
+        """
+        if self.status < 0:
+            return self.err(1, self.status)
+
+        try:
+            self.transport = transport
+            self.connection = paramiko.SFTPClient.from_transport(transport)
+            self.status = 1
+            return True
+
+        except Exception:
+            _, message = getexcept()
+            self.transport = None
+            return self.err(2, message)
+
+    def detach(self):
+        """Closes the SFTP subsystem, but leaves its transport open.
+
+        :return: (obj) paramiko.Transport or None.
+        """
+        transport = self.transport
+
+        try:
+            if self.connection is not None:
+                self.connection.close()
+        except Exception:
+            getexcept()
+
+        self.connection = None
+        self.transport = None
+        if self.status > 0:
+            self.status = 0
+        return transport
+
+    def disconnect(self):
+        """Disconnects from current host and closes the transport, unless it
+        is already disconnected.
+
+        :return: (bool) True on success, False on failure.
+        """
+        result = super(SFTPClient, self).disconnect()
+
+        if self.transport is not None:
+            try:
+                self.transport.close()
+            except Exception:
+                getexcept()
+            self.transport = None
+
+        return result
+
     def mkdir_remote(self, data):
         """Creates remote directories.
 
@@ -285,6 +353,41 @@ class SFTPClient(SSHCommon):
             _, message = getexcept()
             return self.err(4, message)
 
+    def upload_string(self, data, remote):
+        """Uploads a string to a remote file, without a local file.
+
+        :param data: (str) Content of the file.
+        :param remote: (str) Remote path.
+        :return: (bool) True on success, False on failure.
+        """
+        if not hasstring(remote) or remote[-1] == '/':
+            return self.err(1, remote)
+
+        try:
+            self.connection.putfo(StringIO.StringIO(data), remote)
+            return True
+
+        except Exception:
+            _, message = getexcept()
+            return self.err(2, message)
+
+    def remove_remote(self, data):
+        """Removes a remote file.
+
+        :param data: (str) Path.
+        :return: (bool) True on success, False on failure.
+        """
+        if not self.isfile_remote(data):
+            return self.err(1, data)
+
+        try:
+            self.connection.remove(data)
+            return True
+
+        except IOError:
+            _, message = getexcept()
+            return self.err(2, message)
+
     def download(self, remote, local):
         """Downloads remote files or directories to local path.
 
@@ -347,16 +450,36 @@ class SFTPClient(SSHCommon):
 
         return True
 
-    def download_file(self, remote, local):
+    def download_file(self, remote, local, store=None):
         """Downloads remote files to local path.
 
         :param remote: (str) Remote path.
-        :param local: (str) Local path.
-        :return: (bool) True on success, False on failure.
+        :param local: (str) Local path. With <store>, the name of the file in
+            the store.
+        :param store: (obj) ChunkStore. The file is streamed into it, under
+            the host, instead of a local file.
+        :return: (bool) True on success, False on failure. With <store>, the
+            manifest of the stored file.
         """
         if not self.isfile_remote(remote):
             return self.err(1, remote)
 
+        if store is not None:
+            try:
+                with self.connection.open(remote, 'rb') as handler:
+                    handler.prefetch()
+                    manifest = store.put(self.host, handler, local or remote)
+
+            except IOError:
+                _, message = getexcept()
+                return self.err(5, message)
+
+            if manifest is None:
+                self.messages.extend(store.messages)
+                return self.err(6, remote)
+
+            return manifest
+
         if not hasstring(local):
             return self.err(2, local)
 
@@ -364,7 +487,7 @@ class SFTPClient(SSHCommon):
             local += '/'
 
         if local[-1] == '/':
-            local += remote.split('/')[:-1]
+            local += remote.split('/')[-1]
 
         if not isdir('/'.join(local.split('/')[:-1]), True):
             return self.err(3, local)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: In-memory model of a router's configuration.
+<ansible.module_utils.remote_management.yama.snapshot>
+
+It is built from one /export verbose and answers getvalues for the branches
+it can represent faithfully: settings branches, and static list branches
+queried without $id and with a find of property=value pairs. Everything else
+is left to the router.
+
+Example:
+    device.snapshot_open(ttl=60)
+    device.getvalues('/ip dns', 'servers')  # No command is executed.
+"""
+
+import time
+from ansible.module_utils.remote_management.yama.object_error import \
+    ErrorObject
+from ansible.module_utils.remote_management.yama.valid import hasstring, \
+    haskey
+from ansible.module_utils.remote_management.yama.mikrotik_helpers import \
+    branchfix, value_text
+from ansible.module_utils.remote_management.yama.export_parser import \
+    parse, propvals_parse
+
+
+class Snapshot(ErrorObject):
+    """Branches of an exported configuration.
+    """
+    ttl = 60           # Lifetime of the export in seconds.
+    time = 0           # Time of the export.
+    branches = None    # branch - list of entries.
+    invalid = None     # Branches changed since the export.
+
+    def __init__(self, ttl=60):
+        """Initializes a Snapshot object.
+
+        :param ttl: (int) Seconds the branches are served after the export.
+        """
+        super(Snapshot, self).__init__()
+
+        self.ttl = ttl
+        self.time = 0
+        self.branches = {}
+        self.invalid = set()
+
+    def load(self, lines):
+        """Replaces the model with an exported configuration.
+
+        :param lines: (list) Lines of /export verbose, comments dropped.
+        :return: (bool) True on success, False on failure.
+        """
+        branches = {}
+
+        for record in parse(lines or []):
+            entries = branches.setdefault(record.branch, [])
+
+            if record.action in ('add', 'set'):
+                entries.append(record.entry())
+
+        self.branches = branches
+        self.invalid = set()
+        self.time = time.time()
+        return True
+
+    def fresh(self):
+        """Checks if the export is still within <self.ttl>.
+
+        :return: (bool) True if it can be served.
+        """
+        return bool(self.time) and time.time() - self.time <= self.ttl
+
+    def invalidate(self, branch=None):
+        """Stops serving a branch until the next export.
+
+        :param branch: (str) Branch of commands. All branches when None.
+        :return: (bool) True
+        """
+        if branch is None:
+            self.time = 0
+        else:
+            self.invalid.add(branchfix(branch))
+
+        return True
+
+    def getvalues(self, branch, definition, properties, find='', iid=False):
+        """Answers a getvalues query from memory.
+
+        :param branch: (str) Branch of commands, already fixed.
+        :param definition: (dict) Registry entry of the branch.
+        :param properties: (list) Properties.
+        :param find: (str) Mikrotik CLI filter.
+        :param iid: (bool) Adds $id to output.
+        :return: (list) Variables-Values dictionaries, as <getvalues> returns
+            them. None when the query has to be sent to the router, also when
+            nothing matches, so the router reports it.
+        """
+        if branch in self.invalid or not haskey(self.branches, branch):
+            return None
+
+        entries = self.branches[branch]
+        results = []
+
+        if definition['class'] == 'settings':
+            if find or len(entries) != 1:
+                return None
+
+        elif definition['class'] == 'list':
+            if iid or definition['dynamic']:
+                return None
+
+            filters = {}
+            if hasstring(find):
+                filters = propvals_parse(find)
+                if len(filters) != len(find.split()):
+                    return None  # Not a find of property=value pairs only
+
+            entries = [entry for entry in entries
+                       if all(prop in entry and
+                              value_text(entry[prop]) == value_text(value)
+                              for prop, value in filters.items())]
+
+        else:
+            return None
+
+        for entry in entries:
+            result = {}
+
+            for prop in properties:
+                if prop not in entry:
+                    return None  # The export does not hold it
+                result[prop] = value_text(entry[prop])
+
+            results.append(result)
+
+        return results or None
@@ -7,12 +7,15 @@
 <ansible.module_utils.remote_management.yama.ssh_client>"""
 
 import StringIO
+import re
+import os
 import socket
+import binascii
 import paramiko
 from ansible.module_utils.remote_management.yama.ssh_common import SSHCommon
 from ansible.module_utils.remote_management.yama.exception import getexcept
 from ansible.module_utils.remote_management.yama.valid import hasstring, \
-    haslist
+    haslist, isdir
 
 
 class SSHClient(SSHCommon):
@@ -20,6 +23,18 @@ class SSHClient(SSHCommon):
     """
 
     history = []
+    transport = None  # Attached transport, see <self.attach>.
+    shell = None
+    shell_prompt = None
+    shell_buffer = ''
+    shell_lines = []
+    shell_timeout = 30
+    shell_height = 100000  # RouterOS pages long output at the console height
+    shell_token = None
+    shell_count = 0
+
+    # Terminal escape sequences that RouterOS sends on an interactive console.
+    shell_escapes = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]|\x1b[=>]')
 
     def __init__(self, host, port=22, username='root', password='',
                  pkey_string='', pkey_file=''):
@@ -46,6 +61,9 @@ class SSHClient(SSHCommon):
             if self.checkconnection():
                 return True
 
+        if not self.precheck():
+            return False
+
         try:
             if self.pkey_string:
                 handler = StringIO.StringIO(self.pkey_string)
@@ -77,6 +95,7 @@ class SSHClient(SSHCommon):
                                         look_for_keys=False)
 
             self.status = 1
+            self.postcheck()
             return True
 
         except socket.error:
@@ -99,8 +118,66 @@ class SSHClient(SSHCommon):
             _, message = getexcept()
             err_code = 6
 
+        self.postcheck(err_code, message)
         return self.err(err_code, message)
 
+    def gettransport(self):
+        """Returns the authenticated transport of the connection.
+
+        :return: (obj) paramiko.Transport or None.
+        """
+        if self.transport is not None:
+            return self.transport
+        return super(SSHClient, self).gettransport()
+
+    def attach(self, transport):
+        """Builds the connection on an already authenticated transport. Every
+        channel is opened on the transport itself, so no paramiko.SSHClient
+        is needed.
+
+        :param transport: (obj) paramiko.Transport.
+        :return: (bool) Connection status.
+        """
+        if self.status < 0:
+            return self.err(1, self.status)
+
+        self.connection = None
+        self.transport = transport
+        self.status = 1
+        return True
+
+    def detach(self):
+        """Closes the interactive console and drops the connection, but leaves
+        its transport open.
+
+        :return: (obj) paramiko.Transport or None.
+        """
+        self.shell_close()
+        transport = super(SSHClient, self).detach()
+        self.transport = None
+        return transport
+
+    def disconnect(self):
+        """Closes the interactive console and disconnects from current host.
+        An attached transport that is not pooled is closed.
+
+        :return: (bool) True on success, False on failure.
+        """
+        self.shell_close()
+
+        if self.pool is None and self.transport is not None:
+            transport = self.detach()
+
+            try:
+                transport.close()
+                return True
+
+            except Exception:
+                _, message = getexcept()
+                return self.err(1, message)
+
+        return super(SSHClient, self).disconnect()
+
     def command(self, command, raw=False, connect=True, hasstdout=True):
         """Executes the <command> on the remote host and returns the results.
 
@@ -133,13 +210,10 @@ class SSHClient(SSHCommon):
         lines = []
 
         try:
-            # stdin, stdout, stderr = ...
-            _, stdout, stderr = self.connection.exec_command(command)
-            lines = stdout.read().replace('\r', '').split('\n')
-
-            # Mikrotik CLI is not producing stderr. Linux does.
-            if not (hasstring(lines) or haslist(lines)):
-                lines = stderr.read().replace('\r', '').split('\n')
+            if self.shell:
+                lines = self.shell_command(command)
+            else:
+                lines = self.exec_lines(command)
 
         except Exception:
             _, message = getexcept()
@@ -150,6 +224,44 @@ class SSHClient(SSHCommon):
                 self.disconnect()
         ##### fix the logic ^^^ \/\/\/\ of get/except/disconnect
 
+        results = self.filterlines(lines, raw)
+
+        if not haslist(results) and hasstdout:
+            self.err(4, command)
+
+        return results
+
+    def exec_lines(self, command):
+        """Executes the <command> on a new channel. It does not collect
+        errors, so it can run from several threads on the same transport.
+
+        :param command: (str) The command that has to be executed.
+        :return: (list) Output lines. Raises on failure.
+        """
+        channel = self.gettransport().open_session()
+
+        try:
+            channel.exec_command(command)
+            lines = channel.makefile('rb').read().replace('\r', '').split('\n')
+
+            # Mikrotik CLI is not producing stderr. Linux does.
+            if not (hasstring(lines) or haslist(lines)):
+                lines = channel.makefile_stderr('rb').read() \
+                    .replace('\r', '').split('\n')
+
+        finally:
+            channel.close()
+
+        return lines
+
+    @staticmethod
+    def filterlines(lines, raw=False):
+        """Strips the output lines and drops the empty and the # ones.
+
+        :param lines: (list) Output lines.
+        :param raw: (bool) Returns all lines without filtering.
+        :return: (list) Lines.
+        """
         results = []
 
         if raw:
@@ -162,7 +274,254 @@ class SSHClient(SSHCommon):
                     if line[0] != '#':
                         results.append(line.strip())
 
-        if not haslist(results) and hasstdout:
-            self.err(4, command)
-
         return results
+
+    def command_iter(self, command, raw=False, connect=True):
+        """Executes the <command> on the remote host and yields the output
+        lines as they arrive, without buffering the whole output. Closing the
+        generator closes the channel.
+
+        :param command: (str) The command that has to be executed.
+        :param raw: (bool) Yields all lines without filtering lines that start
+            with #.
+        :param connect: (bool) Connects to host, if it is not connected already.
+        :return: (generator) Output lines.
+        """
+        self.history.append(command)
+
+        if not hasstring(command):
+            self.err(1)
+            return
+
+        if self.status < 1 and connect:
+            self.connect()
+
+        if self.status < 1:
+            self.err(2, self.status)
+            return
+
+        if self.reseterrors:
+            self.err0()
+
+        channel = None
+
+        try:
+            channel = self.gettransport().open_session()
+            channel.exec_command(command)
+            buf = ''
+
+            while True:
+                data = channel.recv(65536)
+                if not data:
+                    break
+
+                lines = (buf + data).split('\n')
+                buf = lines.pop()
+
+                for line in lines:
+                    line = line.replace('\r', '')
+                    if raw:
+                        yield line
+                    elif line and line[0] != '#':
+                        yield line.strip()
+
+            buf = buf.replace('\r', '')
+            if raw:
+                yield buf
+            elif buf and buf[0] != '#':
+                yield buf.strip()
+
+        except Exception:
+            _, message = getexcept()
+            self.err(3, message)
+
+        finally:
+            if channel is not None:
+                channel.close()
+
+    def command_tofile(self, command, filename, raw=False, connect=True):
+        """Executes the <command> on the remote host and writes the output
+        straight to <filename>, with constant memory.
+
+        :param command: (str) The command that has to be executed.
+        :param filename: (str) File to write.
+        :param raw: (bool) Writes all lines without filtering lines that start
+            with #.
+        :param connect: (bool) Connects to host, if it is not connected already.
+        :return: (int) Number of lines written, None on failure.
+        """
+        if not (hasstring(filename) and
+                isdir(os.path.dirname(os.path.abspath(filename)), True)):
+            self.err(1, filename)
+            return None
+
+        count = 0
+        errc = self.errc()
+
+        try:
+            with open(filename, 'w') as handler:
+                for line in self.command_iter(command, raw, connect):
+                    handler.write(line + '\n')
+                    count += 1
+
+        except IOError:
+            _, message = getexcept()
+            self.err(2, message)
+            return None
+
+        if self.errc() > errc:
+            return None
+
+        return count
+
+    def command_tostore(self, command, store, name='', raw=False,
+                        connect=True):
+        """Executes the <command> on the remote host and streams the output
+        into a ChunkStore, under the host.
+
+        :param command: (str) The command that has to be executed.
+        :param store: (obj) ChunkStore.
+        :param name: (str) Name of the file in the store.
+        :param raw: (bool) Stores all lines without filtering lines that start
+            with #.
+        :param connect: (bool) Connects to host, if it is not connected already.
+        :return: (dict) Manifest of the stored file, None on failure.
+        """
+        errc = self.errc()
+        manifest = store.put(self.host,
+                             (line + '\n' for line in
+                              self.command_iter(command, raw, connect)),
+                             name or command,
+                             lambda: self.errc() > errc)
+
+        if self.errc() > errc:
+            return None  # The output was incomplete, nothing was stored
+
+        if manifest is None:
+            self.messages.extend(store.messages)
+            self.err(1, command)
+            return None
+
+        return manifest
+
+    def shell_open(self, connect=True):
+        """Opens one interactive console. While it is open, <self.command>
+        streams every command over it instead of opening a channel per
+        command.
+
+        :param connect: (bool) Connects to host, if it is not connected already.
+        :return: (bool) True on success, False on failure.
+        """
+        status = 0
+
+        if self.shell:
+            return True
+
+        if self.status < 1 and connect:
+            if self.connect():
+                status = 1
+
+        if self.status < 1:
+            return self.err(1, self.status)
+
+        try:
+            self.shell = self.gettransport().open_session()
+            self.shell.get_pty(term='dumb', width=4096,
+                               height=self.shell_height)
+            self.shell.invoke_shell()
+            self.shell.settimeout(self.shell_timeout)
+            self.shell_token = binascii.hexlify(os.urandom(4))
+            self.shell_count = 0
+            self.shell_buffer = ''
+            self.shell_lines = []
+
+            # Skips the banner and learns the prompt from the echoed sentinel.
+            marker = self.shell_marker()
+            for line in self.shell_read(marker):
+                index = line.find(':put "{}"'.format(marker))
+                if index > 0:
+                    self.shell_prompt = line[:index].split('>')[0].strip()
+                    self.shell_prompt = self.shell_prompt.split(' ')[0]
+            return True
+
+        except Exception:
+            _, message = getexcept()
+            self.shell_close()
+            if status == 1:
+                self.disconnect()
+            return self.err(2, message)
+
+    def shell_close(self):
+        """Closes the interactive console, unless it is already closed.
+
+        :return: (bool) True on success, False on failure.
+        """
+        if not self.shell:
+            return True
+
+        try:
+            self.shell.close()
+            return True
+
+        except Exception:
+            _, message = getexcept()
+            return self.err(1, message)
+
+        finally:
+            self.shell = None
+            self.shell_prompt = None
+
+    def shell_marker(self):
+        """Sends a unique sentinel to the console.
+
+        :return: (str) The sentinel that the console will print.
+        """
+        self.shell_count += 1
+        marker = 'yama-{}-{}'.format(self.shell_token, self.shell_count)
+        self.shell.sendall(':put "{}"\r\n'.format(marker))
+        return marker
+
+    def shell_read(self, marker):
+        """Reads the console until <marker> is printed on its own line.
+
+        :param marker: (str) Sentinel returned by <self.shell_marker>.
+        :return: (list) Lines before the sentinel, without escape sequences.
+        """
+        lines = []
+
+        while True:
+            while self.shell_lines:
+                line = self.shell_escapes.sub('', self.shell_lines.pop(0))
+                if line.strip() == marker:
+                    return lines
+                lines.append(line)
+
+            data = self.shell.recv(65536)
+            if not data:
+                raise EOFError('Console closed before {}'.format(marker))
+
+            self.shell_lines = (self.shell_buffer +
+                                data.replace('\r', '')).split('\n')
+            self.shell_buffer = self.shell_lines.pop()
+
+    def shell_command(self, command):
+        """Executes <command> on the open console. The output is delimited by
+        two sentinels and the echoed prompt lines are dropped, so the result
+        matches the output of <exec_command>.
+
+        :param command: (str) The command that has to be executed.
+        :return: (list) Output lines.
+        """
+        begin = self.shell_marker()
+        self.shell.sendall(command + '\r\n')
+        end = self.shell_marker()
+
+        self.shell_read(begin)
+        lines = []
+
+        for line in self.shell_read(end):
+            if self.shell_prompt and line.startswith(self.shell_prompt):
+                continue
+            lines.append(line)
+
+        return lines
@@ -11,12 +11,17 @@ from ansible.module_utils.remote_management.yama.object_error import \
 from ansible.module_utils.remote_management.yama.exception import getexcept
 from ansible.module_utils.remote_management.yama.valid import hasstring, \
     isfile, isport, ishost, ispkey
+from ansible.module_utils.remote_management.yama.prescan import scan_key, \
+    FAILED
 
 
 class SSHCommon(ErrorObject):
     """A class that will handle all SSH operations.
     """
     connection = None
+    pool = None
+    breaker = None
+    prescan = None  # Results of <prescan.scan>
     pkey = None
     ssh_auth = 0 # 0 - Unknown, 1 - Password, 2 - Private Key
     status = -1 # -1 - Not ready, 0 - Disconnected/Ready, 1 - Connected
@@ -78,13 +83,44 @@ class SSHCommon(ErrorObject):
         """
         self.disconnect()
 
+    def gettransport(self):
+        """Returns the authenticated transport of the connection.
+
+        :return: (obj) paramiko.Transport or None.
+        """
+        if self.connection is None:
+            return None
+        return self.connection.get_transport()
+
+    def attach(self, transport):
+        """An empty method that returns False and should be overriden. It
+        builds the connection on an already authenticated transport.
+
+        :param transport: (obj) paramiko.Transport.
+        :return: (bool) Connection status.
+        """
+        _ = transport
+        return False
+
+    def detach(self):
+        """Drops the connection but leaves its transport open, so it can be
+        attached to another object.
+
+        :return: (obj) paramiko.Transport or None.
+        """
+        transport = self.gettransport()
+        self.connection = None
+        if self.status > 0:
+            self.status = 0
+        return transport
+
     def checkconnection(self):
         """Sends a single null command to check the connectivity.
 
         :return: (bool) True on success, False on failure.
         """
         try:
-            transport = self.connection.get_transport()
+            transport = self.gettransport()
             transport.send_ignore()
             self.status = 1
             return True
@@ -97,6 +133,47 @@ class SSHCommon(ErrorObject):
             _, message = getexcept()
             return self.err(1, message)
 
+    def precheck(self):
+        """Checks if a connection to the host may be attempted at all. It
+        fails fast if the prescan found the host unreachable or while the
+        circuit breaker of the host is open.
+
+        :return: (bool) True if connect() may proceed.
+        """
+        if self.prescan is not None:
+            state = self.prescan.get(scan_key(self.host, self.port))
+            if state in FAILED:
+                self.postcheck(2, state)
+                return self.err(2, 'Prescan found {}:{} {}'.format(
+                    self.host, self.port, state))
+
+        if self.breaker is not None:
+            if not self.breaker.allow(self.host, self.port):
+                return self.err(1, 'Circuit breaker is open for {}:{}'.format(
+                    self.host, self.port))
+
+        return True
+
+    def postcheck(self, code=0, message=''):
+        """Reports the outcome of connect() to the circuit breaker. Only
+        network failures count against the health of the host, any other
+        failure just releases the half-open probe.
+
+        :param code: (int) Error code of connect(), 0 on success.
+        :param message: (str) Error message.
+        :return: (bool) True on success, False on failure.
+        """
+        if self.breaker is None:
+            return True
+
+        if code == 0:
+            return self.breaker.success(self.host, self.port)
+
+        if code in (2, 5):  # socket.error, paramiko.SSHException
+            return self.breaker.failure(self.host, self.port, code, message)
+
+        return self.breaker.release(self.host, self.port)
+
     def connect(self, timeout=30):
         """An empty method that returns False and should be overriden.
 
@@ -109,9 +186,13 @@ class SSHCommon(ErrorObject):
 
     def disconnect(self):
         """Disconnects from current host, unless it is already disconnected.
+        Pooled connections are returned to their pool instead.
 
         :return: (bool) True on success, False on failure.
         """
+        if self.pool is not None:
+            return self.pool.release(self)
+
         if not self.checkconnection():
             return True
 
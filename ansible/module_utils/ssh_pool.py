@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: In-process pool of authenticated SSH transports.
+<ansible.module_utils.remote_management.yama.ssh_pool>
+
+Example:
+    pool = SSHPool()
+    device = Router('192.0.2.1', password='secret')
+    if pool.connect(device):
+        device.getinfo_identity()
+        device.disconnect()  # The transport goes back to the pool.
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from ansible.module_utils.remote_management.yama.object_error import \
+    ErrorObject
+from ansible.module_utils.remote_management.yama.exception import getexcept
+from ansible.module_utils.remote_management.yama.strings import ifnull
+
+
+class SSHPool(ErrorObject):
+    """Hands out authenticated transports to Router, SSHGeneric and
+    SFTPClient objects. Idle transports are evicted when they are older than
+    <self.ttl> or when more than <self.maxsize> are idle (LRU).
+    """
+    maxsize = 64   # Idle transports kept in total.
+    ttl = 300      # Seconds an idle transport is kept.
+    max_host = 4   # Transports per host, leased and idle together.
+
+    def __init__(self, maxsize=64, ttl=300, max_host=4):
+        """Initializes a SSHPool object.
+
+        :param maxsize: (int) Maximum number of idle transports.
+        :param ttl: (int) Seconds before an idle transport is evicted.
+        :param max_host: (int) Maximum number of transports per host.
+        """
+        super(SSHPool, self).__init__()
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_host = max_host
+        self.idle = OrderedDict()  # key: [{'transport', 'used'}, ...]
+        self.leased = {}           # host: count
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def key(client):
+        """Builds the pool key of a client.
+
+        :param client: (obj) SSHCommon object.
+        :return: (tuple) (host, port, username, auth)
+        """
+        auth = hashlib.sha1('\0'.join([ifnull(client.password, ''),
+                                       ifnull(client.pkey_string, ''),
+                                       ifnull(client.pkey_file, '')]))
+
+        return (client.host, client.port, client.username, auth.hexdigest())
+
+    def hostcount(self, host):
+        """Counts the transports, leased or idle, that belong to <host>.
+
+        :param host: (str) Remote host.
+        :return: (int) Number of transports.
+        """
+        count = self.leased.get(host, 0)
+
+        for key in self.idle:
+            if key[0] == host:
+                count += len(self.idle[key])
+
+        return count
+
+    def connect(self, client, timeout=30):
+        """Connects <client> with a pooled transport, or with a new one if
+        there is none alive.
+
+        :param client: (obj) SSHCommon object.
+        :param timeout: (int) Connection timeout.
+        :return: (bool) Connection status.
+        """
+        if client.pool is self and client.status == 1:
+            return True
+
+        key = self.key(client)
+        self.evict()
+
+        with self.lock:
+            while self.idle.get(key):
+                entry = self.idle[key].pop()
+
+                if entry['transport'].is_active() and \
+                        client.attach(entry['transport']) and \
+                        client.checkconnection():
+                    self.stats['hits'] += 1
+                    self.lease(client, key)
+                    return True
+
+                client.detach()
+                self.close(entry['transport'])
+                self.stats['evictions'] += 1
+
+            if self.hostcount(key[0]) >= self.max_host:
+                self.evict(host=key[0])
+
+            if self.hostcount(key[0]) >= self.max_host:
+                return self.err(1, key[0])
+
+            self.stats['misses'] += 1
+            self.leased[key[0]] = self.leased.get(key[0], 0) + 1
+
+        client.pool = None
+
+        if client.connect(timeout):
+            client.pool = self
+            return True
+
+        with self.lock:
+            self.leased[key[0]] -= 1
+
+        return False
+
+    def lease(self, client, key):
+        """Marks the transport of <client> as leased.
+
+        :param client: (obj) SSHCommon object.
+        :param key: (tuple) Pool key.
+        """
+        if not self.idle.get(key):
+            self.idle.pop(key, None)
+
+        self.leased[key[0]] = self.leased.get(key[0], 0) + 1
+        client.pool = self
+
+    def release(self, client):
+        """Takes back the transport of <client>. It is kept idle, if it is
+        still alive.
+
+        :param client: (obj) SSHCommon object.
+        :return: (bool) True on success, False on failure.
+        """
+        if client.pool is not self:
+            return self.err(1, client.host)
+
+        key = self.key(client)
+        transport = client.detach()
+        client.pool = None
+
+        with self.lock:
+            self.leased[key[0]] = max(self.leased.get(key[0], 0) - 1, 0)
+
+            if transport is not None and transport.is_active():
+                self.idle.setdefault(key, []).append(
+                    {'transport': transport, 'used': time.time()})
+                # Most recently used keys are kept at the end.
+                self.idle[key] = self.idle.pop(key)
+
+        self.evict()
+        return True
+
+    def evict(self, force=False, host=None):
+        """Closes idle transports that are expired, or the least recently used
+        ones while the pool holds more than <self.maxsize>.
+
+        :param force: (bool) Evicts every idle transport.
+        :param host: (str) Evicts every idle transport of <host>.
+        :return: (int) Number of evicted transports.
+        """
+        evicted = []
+        limit = time.time() - self.ttl
+
+        with self.lock:
+            for key in list(self.idle):
+                for entry in list(self.idle[key]):
+                    if force or key[0] == host or entry['used'] < limit:
+                        self.idle[key].remove(entry)
+                        evicted.append(entry['transport'])
+
+                if not self.idle[key]:
+                    del self.idle[key]
+
+            while sum(len(entries) for entries in self.idle.values()) > \
+                    self.maxsize:
+                key = next(iter(self.idle))
+                evicted.append(self.idle[key].pop(0)['transport'])
+
+                if not self.idle[key]:
+                    del self.idle[key]
+
+            self.stats['evictions'] += len(evicted)
+
+        for transport in evicted:
+            self.close(transport)
+
+        return len(evicted)
+
+    def close(self, transport):
+        """Closes a transport.
+
+        :param transport: (obj) paramiko.Transport.
+        :return: (bool) True on success, False on failure.
+        """
+        try:
+            transport.close()
+            return True
+
+        except Exception:
+            _, message = getexcept()
+            return self.err(1, message)
+
+    def getstats(self):
+        """Returns the pool counters.
+
+        :return: (dict) hits, misses, evictions, idle and leased.
+        """
+        with self.lock:
+            results = dict(self.stats)
+            results['idle'] = sum(len(entries) for entries in
+                                  self.idle.values())
+            results['leased'] = sum(self.leased.values())
+
+        return results
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Columnar table of getvalues results.
+<ansible.module_utils.remote_management.yama.table>
+
+Every property is one list of values and repeated values, like the list of
+an address-list or the server of a DHCP lease, are stored once. Rows are
+views to the columns, created when they are accessed.
+
+Example:
+    table = device.getvalues('/ip dhcp-server lease', 'address,server',
+                             columnar=True)
+    servers = set(table.column('server'))
+    results = table.tolistdict()  # The shape of getvalues.
+    results = table.todict()      # JSON, as mt_get returns it.
+"""
+
+import csv
+import collections
+from ansible.module_utils.remote_management.yama.mikrotik_helpers import \
+    unit_split, unit_rows
+
+
+class Row(collections.Mapping):
+    """Read-only view to one row of a Table.
+    """
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        """Initializes a Row object.
+
+        :param table: (obj) Table.
+        :param index: (int) Index of the row.
+        """
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        return self.table.data[key][self.index]
+
+    def __iter__(self):
+        return iter(self.table.columns)
+
+    def __len__(self):
+        return len(self.table.columns)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class Table(object):
+    """Values of a list of entries, stored by property.
+    """
+    columns = None    # Properties, .id first when present.
+    data = None       # property - list of values.
+    interned = None   # property - {value: value}, None for the unique .id.
+    length = 0
+
+    def __init__(self, columns):
+        """Initializes a Table object.
+
+        :param columns: (list) Properties.
+        """
+        self.columns = list(columns)
+        self.data = dict((column, []) for column in self.columns)
+        self.interned = dict((column, None if column == '.id' else {})
+                             for column in self.columns)
+        self.length = 0
+
+    @classmethod
+    def from_rows(cls, properties, rows, iid=False, fix=None):
+        """Builds a Table out of lists of values. Short rows are padded with
+        empty values, like the missing properties of <self.append>.
+
+        :param properties: (list) Properties, in the order of the values.
+        :param rows: (iterable) Lists of values.
+        :param iid: (bool) The first value of every row is the $id.
+        :param fix: (function) Applied once to every distinct value.
+        :return: (obj) Table.
+        """
+        table = cls((['.id'] if iid else []) + list(properties))
+        columns = [(table.data[column], table.interned[column])
+                   for column in table.columns]
+        width = len(columns)
+
+        for values in rows:
+            if len(values) < width:
+                values = list(values) + [''] * (width - len(values))
+
+            for (data, interned), value in zip(columns, values):
+                if interned is None:
+                    data.append(value)
+                    continue
+                if value not in interned:
+                    interned[value] = fix(value) if fix else value
+                data.append(interned[value])
+
+            table.length += 1
+
+        return table
+
+    @classmethod
+    def from_csv(cls, properties, lines, iid=False):
+        """Builds a Table out of Mikrotik's CSV output, like
+        <csv_to_listdict>. The ';' of arrays is converted to ',' once per
+        distinct value.
+
+        :param properties: (list) Practically the CSV header.
+        :param lines: (iterable) Comma delimeted lines.
+        :param iid: (bool) The first value of every line is the $id.
+        :return: (obj) Table.
+        """
+        return cls.from_rows(properties,
+                             csv.reader(lines, delimiter=',', quotechar='"'),
+                             iid, lambda value: value.replace(';', ','))
+
+    @classmethod
+    def from_unit(cls, properties, lines, iid=False):
+        """Builds a Table out of the 'unit' wire format of getvalues. The
+        usual output is transposed to columns without a loop per row in
+        Python.
+
+        :param properties: (list) Properties, in the order of the values.
+        :param lines: (list) Output lines.
+        :param iid: (bool) The first value of every row is the $id.
+        :return: (obj) Table.
+        """
+        table = cls((['.id'] if iid else []) + list(properties))
+        rows = unit_split(lines, len(table.columns))
+
+        if rows is None:
+            return cls.from_rows(properties, unit_rows(lines), iid)
+
+        for column, values in zip(table.columns, zip(*rows)[1:-1]):
+            interned = table.interned[column]
+            if interned is None:
+                table.data[column] = list(values)
+            else:
+                table.data[column] = map(interned.setdefault, values, values)
+
+        table.length = len(rows)
+        return table
+
+    @classmethod
+    def from_listdict(cls, columns, results):
+        """Builds a Table out of a list of dictionaries.
+
+        :param columns: (list) Properties.
+        :param results: (list) Variables-Values dictionaries.
+        :return: (obj) Table.
+        """
+        table = cls(columns)
+
+        for result in results or []:
+            table.append(result)
+
+        return table
+
+    def append(self, result):
+        """Adds a row.
+
+        :param result: (dict) Variables-Values dictionary, missing properties
+            are empty.
+        :return: (bool) True
+        """
+        for column in self.columns:
+            value = result.get(column, '')
+            if self.interned[column] is not None:
+                value = self.interned[column].setdefault(value, value)
+            self.data[column].append(value)
+
+        self.length += 1
+        return True
+
+    def column(self, name):
+        """Returns the values of a property.
+
+        :param name: (str) Property.
+        :return: (list) Values, in row order.
+        """
+        return self.data[name]
+
+    def tolistdict(self):
+        """Converts the table to the format of <csv_to_listdict>.
+
+        :return: (list) Variables-Values dictionaries.
+        """
+        columns = [self.data[column] for column in self.columns]
+        return [dict(zip(self.columns, values)) for values in zip(*columns)]
+
+    def todict(self):
+        """Converts the table to a column oriented dictionary, that can be
+        serialized to JSON.
+
+        :return: (dict) 'columns', the properties, and 'data', the values by
+            property.
+        """
+        return {'columns': list(self.columns),
+                'data': dict((column, list(self.data[column]))
+                             for column in self.columns)}
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        return Row(self, index)
+
+    def __iter__(self):
+        for index in xrange(self.length):
+            yield Row(self, index)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Adds many entries to a list branch with uploaded .rsc scripts.
+<ansible.modules.remote_management.yama.mt_bulkload>"""
+
+import os
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.remote_management.yama.daemon_client import request
+from ansible.module_utils.remote_management.yama.breaker import Breaker
+from ansible.module_utils.remote_management.yama.strings import readjson, \
+    readyaml
+
+PATH = '/etc/ansible/config'
+
+
+def main():
+    """
+    """
+    messages = []
+    result = []
+    changed = 0
+    unreachable = 1
+    failed = 0
+    module = AnsibleModule(
+        argument_spec=dict(
+            host=dict(required=True, type='str'),
+            port=dict(required=False, type='int', default=22),
+            username=dict(required=False, type='str', default='admin'),
+            password=dict(required=False, type='str'),
+            pkey_string=dict(required=False, type='str'),
+            pkey_file=dict(required=False, type='str'),
+            branch=dict(required=True, type='str'),
+            entries=dict(required=False, type='list'),
+            entries_file=dict(required=False, type='str'),
+            directory=dict(required=False, type='str', default=''),
+            size=dict(required=False, type='int', default=65536),
+            tolerant=dict(required=False, type='bool', default=True),
+            branch_file=dict(required=False, type='str',
+                             default='yama/mikrotik_branch.json'),
+            breaker_file=dict(required=False, type='str'),
+            daemon=dict(required=False, type='bool', default=False)
+        ),
+        required_one_of=[['entries', 'entries_file']]
+    )
+
+    host = module.params['host']
+    port = module.params['port']
+    username = module.params['username']
+    password = module.params['password']
+    pkey_string = module.params['pkey_string']
+    pkey_file = module.params['pkey_file']
+    branch_file = os.path.join(PATH, module.params['branch_file'])
+
+    entries = module.params['entries']
+    if module.params['entries_file']:
+        if module.params['entries_file'].endswith('.json'):
+            entries = readjson(module.params['entries_file'])
+        else:
+            entries = readyaml(module.params['entries_file'])
+
+        if not isinstance(entries, list):
+            module.fail_json(msg='Unable to read Entries File.')
+
+    if module.params['daemon']:
+        connection = dict(host=host, port=port, username=username,
+                          password=password, pkey_string=pkey_string,
+                          pkey_file=pkey_file, branch_file=branch_file,
+                          breaker_file=module.params['breaker_file'])
+        params = dict((key, module.params[key]) for key in
+                      ('branch', 'directory', 'size', 'tolerant'))
+        params['entries'] = entries
+        module.exit_json(**request('bulkload', connection, params))
+
+    # paramiko is only loaded without the daemon
+    from ansible.module_utils.remote_management.yama.session import Session
+
+    device = Session(host, port=port, username=username, password=password,
+                     pkey_string=pkey_string, pkey_file=pkey_file,
+                     branch_file=branch_file)
+
+    if module.params['breaker_file']:
+        device.breaker = Breaker(module.params['breaker_file'])
+
+    if device.connect():
+        unreachable = 0
+        result = device.bulkload(module.params['branch'], entries,
+                                 module.params['directory'],
+                                 module.params['size'],
+                                 module.params['tolerant'])
+
+        if result and result['loaded']:
+            changed = 1
+
+        if result and result['failed']:
+            messages.append('{} entries failed.'.format(
+                len(result['failed'])))
+
+        if result and not result['complete']:
+            messages.append('Stopped after {} of {} entries.'.format(
+                result['loaded'], result['entries']))
+
+    if device.errc():
+        failed = 1
+
+    device.disconnect()
+    messages.append(device.errors())
+    module.exit_json(changed=changed, unreachable=unreachable, failed=failed,
+                     result=result, msg=' '.join(messages))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,8 +9,11 @@
 
 import os
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.remote_management.yama.daemon_client import request
+from ansible.module_utils.remote_management.yama.breaker import Breaker
 from ansible.module_utils.remote_management.yama.strings import writefile
-from ansible.module_utils.remote_management.yama.mikrotik import Router
+from ansible.module_utils.remote_management.yama.chunk_store import \
+    ChunkStore
 
 PATH = '/etc/ansible/config'
 
@@ -33,9 +36,15 @@ def main():
             pkey_file=dict(required=False, type='str'),
             commands=dict(required=True, type='list'),
             raw=dict(required=False, type='bool', default=False),
+            shell=dict(required=False, type='bool', default=False),
+            stream=dict(required=False, type='bool', default=False),
+            parallel=dict(required=False, type='int', default=0),
             output=dict(required=False, type='str'),
+            store=dict(required=False, type='str'),
             branch_file=dict(required=False, type='str',
-                             default='yama/mikrotik_branch.json')
+                             default='yama/mikrotik_branch.json'),
+            breaker_file=dict(required=False, type='str'),
+            daemon=dict(required=False, type='bool', default=False)
         )
     )
 
@@ -47,19 +56,69 @@ def main():
     pkey_file = module.params['pkey_file']
     branch_file = os.path.join(PATH, module.params['branch_file'])
 
+    if module.params['daemon']:
+        connection = dict(host=host, port=port, username=username,
+                          password=password, pkey_string=pkey_string,
+                          pkey_file=pkey_file, branch_file=branch_file,
+                          breaker_file=module.params['breaker_file'])
+        params = dict((key, module.params[key]) for key in
+                      ('commands', 'raw', 'shell', 'parallel', 'output',
+                       'stream', 'store'))
+        module.exit_json(**request('commands', connection, params))
+
+    # paramiko is only loaded without the daemon
+    from ansible.module_utils.remote_management.yama.mikrotik import Router
+
     device = Router(host, port=port, username=username, password=password,
                     pkey_string=pkey_string, pkey_file=pkey_file,
                     branch_file=branch_file)
 
+    if module.params['breaker_file']:
+        device.breaker = Breaker(module.params['breaker_file'])
+
     if device.connect():
         unreachable = 0
-        result = device.commands(module.params['commands'],
-                                 module.params['raw'])
+        commands = module.params['commands']
+
+        if module.params['store']:
+            # The output of the first command goes into the chunk store, under
+            # the name <output>, and its manifest is returned.
+            store = ChunkStore(module.params['store'])
+            manifest = device.command_tostore(commands[0], store,
+                                              module.params['output'],
+                                              module.params['raw'])
+            if manifest is not None:
+                result = [store.summary(manifest)]
+                if len(commands) > 1:
+                    result += device.commands(commands[1:],
+                                              module.params['raw'],
+                                              shell=module.params['shell']) \
+                        or []
+
+        elif module.params['output'] and module.params['stream']:
+            # The output of the first command goes straight to the file and
+            # only its line count is returned.
+            count = device.command_tofile(commands[0], module.params['output'],
+                                          module.params['raw'])
+            if count is None:
+                messages.append('Unable to create Output File.')
+            else:
+                result = [count]
+                if len(commands) > 1:
+                    result += device.commands(commands[1:],
+                                              module.params['raw'],
+                                              shell=module.params['shell']) \
+                        or []
+
+        else:
+            result = device.commands(commands, module.params['raw'],
+                                     shell=module.params['shell'],
+                                     parallel=module.params['parallel'])
 
-        if result:
-            if module.params['output']:
-                if not writefile(module.params['output'], result[0]):
-                    messages.append('Unable to create Output File.')
+            if result:
+                if module.params['output']:
+                    if not writefile(module.params['output'], result[0]):
+                        messages.append('Unable to create Output File.')
 
     if device.errc():
         failed = 1
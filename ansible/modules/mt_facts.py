@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Gathers the facts of host with one script, cached with a TTL.
+<ansible.modules.remote_management.yama.mt_facts>"""
+
+import os
+import time
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.remote_management.yama.daemon_client import request
+from ansible.module_utils.remote_management.yama.breaker import Breaker
+from ansible.module_utils.remote_management.yama.strings import readjson, \
+    writejson
+
+PATH = '/etc/ansible/config'
+
+
+def main():
+    """
+    """
+    messages = []
+    result = None
+    changed = 0
+    unreachable = 1
+    failed = 0
+    module = AnsibleModule(
+        argument_spec=dict(
+            host=dict(required=True, type='str'),
+            port=dict(required=False, type='int', default=22),
+            username=dict(required=False, type='str', default='admin'),
+            password=dict(required=False, type='str'),
+            pkey_string=dict(required=False, type='str'),
+            pkey_file=dict(required=False, type='str'),
+            cache_dir=dict(required=False, type='str',
+                           default='/tmp/yama/facts'),
+            ttl=dict(required=False, type='int', default=3600),
+            branch_file=dict(required=False, type='str',
+                             default='yama/mikrotik_branch.json'),
+            breaker_file=dict(required=False, type='str'),
+            daemon=dict(required=False, type='bool', default=False)
+        )
+    )
+
+    host = module.params['host']
+    port = module.params['port']
+    username = module.params['username']
+    password = module.params['password']
+    pkey_string = module.params['pkey_string']
+    pkey_file = module.params['pkey_file']
+    branch_file = os.path.join(PATH, module.params['branch_file'])
+
+    cache_file = None
+    if module.params['cache_dir'] and module.params['ttl'] > 0:
+        cache_file = os.path.join(module.params['cache_dir'],
+                                  '{}_{}.json'.format(host, port))
+        cache = readjson(cache_file)
+
+        if cache and time.time() - cache['time'] < module.params['ttl']:
+            module.exit_json(changed=0, unreachable=0, failed=0,
+                             result=cache['facts'],
+                             ansible_facts=dict(mikrotik=cache['facts']),
+                             msg='Cached facts.')
+
+    if module.params['daemon']:
+        connection = dict(host=host, port=port, username=username,
+                          password=password, pkey_string=pkey_string,
+                          pkey_file=pkey_file, branch_file=branch_file,
+                          breaker_file=module.params['breaker_file'])
+        response = request('facts', connection, {})
+        result = response['result']
+        unreachable = response['unreachable']
+        failed = response['failed']
+        messages.append(response['msg'])
+
+    else:
+        # paramiko is only loaded without the daemon
+        from ansible.module_utils.remote_management.yama.mikrotik import \
+            Router
+
+        device = Router(host, port=port, username=username,
+                        password=password, pkey_string=pkey_string,
+                        pkey_file=pkey_file, branch_file=branch_file)
+
+        if module.params['breaker_file']:
+            device.breaker = Breaker(module.params['breaker_file'])
+
+        if device.connect():
+            unreachable = 0
+            result = device.getinfo_facts()
+
+        if device.errc():
+            failed = 1
+
+        device.disconnect()
+        messages.append(device.errors())
+
+    if not result:
+        module.exit_json(changed=changed, unreachable=unreachable,
+                         failed=failed or 1, result=result,
+                         msg=' '.join(messages))
+
+    # Facts with errors or without the identity and model are not cached.
+    if failed or not (result['identity'] and result['model']['name']):
+        cache_file = None
+
+    if cache_file and not writejson(cache_file, {'time': time.time(),
+                                                 'facts': result}):
+        messages.append('Unable to create Cache File.')
+
+    module.exit_json(changed=changed, unreachable=unreachable, failed=failed,
+                     result=result, ansible_facts=dict(mikrotik=result),
+                     msg=' '.join(messages))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Executes one job on a list of hosts from a single task.
+<ansible.modules.remote_management.yama.mt_fleet>"""
+
+import os
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.remote_management.yama.fleet import Fleet, JOBS
+
+PATH = '/etc/ansible/config'
+
+
+def main():
+    """
+    """
+    messages = []
+    result = []
+    changed = 0
+    failed = 0
+    hosts_unreachable = 0
+    hosts_failed = 0
+    module = AnsibleModule(
+        argument_spec=dict(
+            hosts=dict(required=True, type='list'),
+            port=dict(required=False, type='int', default=22),
+            username=dict(required=False, type='str', default='admin'),
+            password=dict(required=False, type='str', default=''),
+            pkey_string=dict(required=False, type='str', default=''),
+            pkey_file=dict(required=False, type='str', default=''),
+            job=dict(required=True, type='str', choices=JOBS),
+            args=dict(required=False, type='list', default=[]),
+            kwargs=dict(required=False, type='dict', default={}),
+            concurrency=dict(required=False, type='int', default=50),
+            per_host=dict(required=False, type='int', default=1),
+            timeout=dict(required=False, type='int', default=30),
+            prescan=dict(required=False, type='float', default=0),
+            output=dict(required=False, type='str'),
+            processes=dict(required=False, type='int', default=0),
+            resume=dict(required=False, type='bool', default=True),
+            branch_file=dict(required=False, type='str',
+                             default='yama/mikrotik_branch.json'),
+            breaker_file=dict(required=False, type='str')
+        )
+    )
+
+    defaults = dict(port=module.params['port'],
+                    username=module.params['username'],
+                    password=module.params['password'],
+                    pkey_string=module.params['pkey_string'],
+                    pkey_file=module.params['pkey_file'],
+                    branch_file=os.path.join(PATH,
+                                             module.params['branch_file']),
+                    breaker_file=module.params['breaker_file'])
+
+    fleet = Fleet(module.params['concurrency'], module.params['per_host'],
+                  module.params['timeout'], defaults,
+                  module.params['prescan'])
+
+    if module.params['output']:
+        result = fleet.sweep(module.params['hosts'], module.params['job'],
+                             module.params['args'], module.params['kwargs'],
+                             module.params['output'],
+                             module.params['processes'],
+                             module.params['resume'])
+
+        if result is None:
+            failed = 1
+        else:
+            changed = int(result['changed'] > 0)
+            messages.append('{} hosts, {} skipped, {} unreachable, {} '
+                            'failed.'.format(result['hosts'],
+                                             result['skipped'],
+                                             result['unreachable'],
+                                             result['failed']))
+
+        messages.append(fleet.errors())
+        module.exit_json(changed=changed, failed=failed, result=result,
+                         msg=' '.join(messages))
+
+    result = fleet.run(module.params['hosts'], module.params['job'],
+                       module.params['args'], module.params['kwargs'])
+
+    if result is None:
+        failed = 1
+        result = []
+    else:
+        for host in result:
+            changed |= host['changed']
+            hosts_unreachable += host['unreachable']
+            hosts_failed += host['failed']
+
+        messages.append('{} hosts, {} unreachable, {} failed.'.format(
+            len(result), hosts_unreachable, hosts_failed))
+
+    messages.append(fleet.errors())
+    module.exit_json(changed=changed, failed=failed, result=result,
+                     msg=' '.join(messages))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,16 @@
 # Copyright (c) 2018 Michail Topaloudis
 # GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 
-"""Yama: Retrieves values from host. Optionally outputs the results to file.
+"""Yama: Retrieves values from host. Optionally streams the results to a
+CSV or JSON Lines file, gzip compressed when its name ends with .gz. The
+format 'columns' returns the values by property, see <Table.todict>.
 <ansible.modules.remote_management.yama.mt_get>"""
 
 import os
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.remote_management.yama.strings import writefile, \
-    ifnull
-from ansible.module_utils.remote_management.yama.mikrotik import Router
+from ansible.module_utils.remote_management.yama.daemon_client import request
+from ansible.module_utils.remote_management.yama.breaker import Breaker
+from ansible.module_utils.remote_management.yama.strings import ifnull
 
 PATH = '/etc/ansible/config'
 
@@ -36,9 +38,17 @@ def main():
             properties=dict(required=True),
             find=dict(required=False, type='str'),
             output=dict(required=False, type='str'),
-            format=dict(required=False, type='str', default='json'),
+            format=dict(required=False, type='str', default='json',
+                        choices=['json', 'csv', 'columns']),
+            chunk=dict(required=False, type='int', default=0),
+            parallel=dict(required=False, type='int', default=4),
+            checkpoint=dict(required=False, type='str'),
+            wireformat=dict(required=False, type='str', default='csv',
+                            choices=['csv', 'unit']),
             branch_file=dict(required=False, type='str',
-                             default='yama/mikrotik_branch.json')
+                             default='yama/mikrotik_branch.json'),
+            breaker_file=dict(required=False, type='str'),
+            daemon=dict(required=False, type='bool', default=False)
         )
     )
 
@@ -50,22 +60,55 @@ def main():
     pkey_file = module.params['pkey_file']
     branch_file = os.path.join(PATH, module.params['branch_file'])
 
+    if module.params['daemon']:
+        connection = dict(host=host, port=port, username=username,
+                          password=password, pkey_string=pkey_string,
+                          pkey_file=pkey_file, branch_file=branch_file,
+                          breaker_file=module.params['breaker_file'])
+        params = dict((key, module.params[key]) for key in
+                      ('branch', 'properties', 'find', 'output', 'format',
+                       'chunk', 'parallel', 'checkpoint', 'wireformat'))
+        module.exit_json(**request('get', connection, params))
+
+    # paramiko is only loaded without the daemon
+    from ansible.module_utils.remote_management.yama.mikrotik import Router
+
     device = Router(host, port=port, username=username, password=password,
                     pkey_string=pkey_string, pkey_file=pkey_file,
                     branch_file=branch_file)
 
+    if module.params['breaker_file']:
+        device.breaker = Breaker(module.params['breaker_file'])
+
+    device.wireformat = module.params['wireformat']
+
+    columnar = module.params['format'] == 'columns'
+
     if device.connect():
         unreachable = 0
-        csvout = format == 'csv'
-        result = device.getvalues(module.params['branch'],
-                                  module.params['properties'],
-                                  ifnull(module.params['find'], ''),
-                                  csvout=csvout)
-
-        if result:
-            if module.params['output']:
-                if not writefile(module.params['output'], result[0]):
-                    messages.append('Unable to create Output File.')
+
+        if module.params['output']:
+            # Streamed to the file, only the number of rows is returned
+            result = device.getvalues_tofile(
+                module.params['branch'], module.params['properties'],
+                module.params['output'], ifnull(module.params['find'], ''),
+                fmt='csv' if module.params['format'] == 'csv' else 'jsonl')
+        elif module.params['chunk'] > 0:
+            result = device.getvalues_chunked(
+                module.params['branch'], module.params['properties'],
+                ifnull(module.params['find'], ''),
+                size=module.params['chunk'],
+                parallel=module.params['parallel'],
+                checkpoint=module.params['checkpoint'],
+                csvout=module.params['format'] == 'csv', columnar=columnar)
+        else:
+            result = device.getvalues(
+                module.params['branch'], module.params['properties'],
+                ifnull(module.params['find'], ''),
+                csvout=module.params['format'] == 'csv', columnar=columnar)
+
+        if columnar and result is not None:
+            result = result.todict()
 
     if device.errc():
         failed = 1
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Yama: Makes the entries of a list branch match a desired set.
+<ansible.modules.remote_management.yama.mt_reconcile>"""
+
+import os
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.remote_management.yama.daemon_client import request
+from ansible.module_utils.remote_management.yama.breaker import Breaker
+from ansible.module_utils.remote_management.yama.strings import ifnull
+
+PATH = '/etc/ansible/config'
+
+
+def main():
+    """
+    """
+    messages = []
+    result = []
+    changed = 0
+    unreachable = 1
+    failed = 0
+    module = AnsibleModule(
+        argument_spec=dict(
+            host=dict(required=True, type='str'),
+            port=dict(required=False, type='int', default=22),
+            username=dict(required=False, type='str', default='admin'),
+            password=dict(required=False, type='str'),
+            pkey_string=dict(required=False, type='str'),
+            pkey_file=dict(required=False, type='str'),
+            branch=dict(required=True, type='str'),
+            entries=dict(required=True, type='list'),
+            purge=dict(required=False, type='bool', default=False),
+            chunk=dict(required=False, type='int', default=100),
+            find=dict(required=False, type='str'),
+            branch_file=dict(required=False, type='str',
+                             default='yama/mikrotik_branch.json'),
+            breaker_file=dict(required=False, type='str'),
+            daemon=dict(required=False, type='bool', default=False)
+        )
+    )
+
+    host = module.params['host']
+    port = module.params['port']
+    username = module.params['username']
+    password = module.params['password']
+    pkey_string = module.params['pkey_string']
+    pkey_file = module.params['pkey_file']
+    branch_file = os.path.join(PATH, module.params['branch_file'])
+
+    if module.params['daemon']:
+        connection = dict(host=host, port=port, username=username,
+                          password=password, pkey_string=pkey_string,
+                          pkey_file=pkey_file, branch_file=branch_file,
+                          breaker_file=module.params['breaker_file'])
+        params = dict((key, module.params[key]) for key in
+                      ('branch', 'entries', 'purge', 'chunk', 'find'))
+        module.exit_json(**request('reconcile', connection, params))
+
+    # paramiko is only loaded without the daemon
+    from ansible.module_utils.remote_management.yama.mikrotik import Router
+
+    device = Router(host, port=port, username=username, password=password,
+                    pkey_string=pkey_string, pkey_file=pkey_file,
+                    branch_file=branch_file)
+
+    if module.params['breaker_file']:
+        device.breaker = Breaker(module.params['breaker_file'])
+
+    if device.connect():
+        unreachable = 0
+        result = device.reconcile(module.params['branch'],
+                                  module.params['entries'],
+                                  module.params['purge'],
+                                  module.params['chunk'],
+                                  ifnull(module.params['find'], ''))
+
+        if result and result['changed']:
+            changed = 1
+
+    if device.errc():
+        failed = 1
+
+    device.disconnect()
+    messages.append(device.errors())
+    module.exit_json(changed=changed, unreachable=unreachable, failed=failed,
+                     result=result, msg=' '.join(messages))
+
+
+if __name__ == '__main__':
+    main()
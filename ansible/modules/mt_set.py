@@ -5,12 +5,18 @@
 # GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 
 """Yama: Sets values to host.
-<ansible.modules.remote_management.yama.mt_set>"""
+<ansible.modules.remote_management.yama.mt_set>
+
+A 'set' reads the values first and does nothing when they already match.
+Otherwise the update and a second read run in one script, so a change takes
+two round trips to the router. See <Router.setvalues>.
+"""
 
 import os
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.remote_management.yama.daemon_client import request
+from ansible.module_utils.remote_management.yama.breaker import Breaker
 from ansible.module_utils.remote_management.yama.strings import ifnull
-from ansible.module_utils.remote_management.yama.mikrotik import Router
 
 PATH = '/etc/ansible/config'
 
@@ -36,7 +42,9 @@ def main():
             propvals=dict(required=False, type='str'),
             find=dict(required=False, type='str'),
             branch_file=dict(required=False, type='str',
-                             default='yama/mikrotik_branch.json')
+                             default='yama/mikrotik_branch.json'),
+            breaker_file=dict(required=False, type='str'),
+            daemon=dict(required=False, type='bool', default=False)
         )
     )
 
@@ -48,10 +56,25 @@ def main():
     pkey_file = module.params['pkey_file']
     branch_file = os.path.join(PATH, module.params['branch_file'])
 
+    if module.params['daemon']:
+        connection = dict(host=host, port=port, username=username,
+                          password=password, pkey_string=pkey_string,
+                          pkey_file=pkey_file, branch_file=branch_file,
+                          breaker_file=module.params['breaker_file'])
+        params = dict((key, module.params[key]) for key in
+                      ('branch', 'action', 'propvals', 'find'))
+        module.exit_json(**request('set', connection, params))
+
+    # paramiko is only loaded without the daemon
+    from ansible.module_utils.remote_management.yama.mikrotik import Router
+
     device = Router(host, port=port, username=username, password=password,
                     pkey_string=pkey_string, pkey_file=pkey_file,
                     branch_file=branch_file)
 
+    if module.params['breaker_file']:
+        device.breaker = Breaker(module.params['breaker_file'])
+
     if device.connect():
         unreachable = 0
         branch = module.params['branch']
@@ -8,7 +8,10 @@
 <ansible.modules.remote_management.yama.sftp_download>"""
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.remote_management.yama.sftp_client import SFTPClient
+from ansible.module_utils.remote_management.yama.daemon_client import request
+from ansible.module_utils.remote_management.yama.breaker import Breaker
+from ansible.module_utils.remote_management.yama.chunk_store import \
+    ChunkStore
 
 
 def main():
@@ -28,7 +31,10 @@ def main():
             pkey_string=dict(required=False, type='str'),
             pkey_file=dict(required=False, type='str'),
             remote=dict(required=True, type='str'),
-            local=dict(required=True, type='str')
+            local=dict(required=True, type='str'),
+            store=dict(required=False, type='str'),
+            breaker_file=dict(required=False, type='str'),
+            daemon=dict(required=False, type='bool', default=False)
         )
     )
 
@@ -39,13 +45,38 @@ def main():
     pkey_string = module.params['pkey_string']
     pkey_file = module.params['pkey_file']
 
+    if module.params['daemon']:
+        connection = dict(host=host, port=port, username=username,
+                          password=password, pkey_string=pkey_string,
+                          pkey_file=pkey_file,
+                          breaker_file=module.params['breaker_file'])
+        params = dict((key, module.params[key]) for key in
+                      ('remote', 'local', 'store'))
+        module.exit_json(**request('download', connection, params))
+
+    # paramiko is only loaded without the daemon
+    from ansible.module_utils.remote_management.yama.sftp_client import \
+        SFTPClient
+
     device = SFTPClient(host, port=port, username=username, password=password,
                         pkey_string=pkey_string, pkey_file=pkey_file)
 
+    if module.params['breaker_file']:
+        device.breaker = Breaker(module.params['breaker_file'])
+
     if device.connect():
         unreachable = 0
-        result = device.download(module.params['remote'],
-                                 module.params['local'])
+
+        if module.params['store']:
+            # <local> is the name of the file in the chunk store.
+            store = ChunkStore(module.params['store'])
+            manifest = device.download_file(module.params['remote'],
+                                            module.params['local'], store)
+            if manifest:
+                result = store.summary(manifest)
+        else:
+            result = device.download(module.params['remote'],
+                                     module.params['local'])
 
     if device.errc():
         failed = 1
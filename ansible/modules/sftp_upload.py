@@ -4,11 +4,16 @@
 # Copyright (c) 2018 Michail Topaloudis
 # GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 
-"""Yama: Uploads files and directories to remote host using SFTP.
+"""Yama: Uploads files and directories to remote host using SFTP. Optionally
+executes commands afterwards over the same connection.
 <ansible.modules.remote_management.yama.sftp_upload>"""
 
+import os
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.remote_management.yama.sftp_client import SFTPClient
+from ansible.module_utils.remote_management.yama.daemon_client import request
+from ansible.module_utils.remote_management.yama.breaker import Breaker
+
+PATH = '/etc/ansible/config'
 
 
 def main():
@@ -28,7 +33,12 @@ def main():
             pkey_string=dict(required=False, type='str'),
             pkey_file=dict(required=False, type='str'),
             local=dict(required=True, type='str'),
-            remote=dict(required=True, type='str')
+            remote=dict(required=True, type='str'),
+            commands=dict(required=False, type='list'),
+            branch_file=dict(required=False, type='str',
+                             default='yama/mikrotik_branch.json'),
+            breaker_file=dict(required=False, type='str'),
+            daemon=dict(required=False, type='bool', default=False)
         )
     )
 
@@ -38,9 +48,33 @@ def main():
     password = module.params['password']
     pkey_string = module.params['pkey_string']
     pkey_file = module.params['pkey_file']
+    branch_file = os.path.join(PATH, module.params['branch_file'])
+
+    if module.params['daemon']:
+        connection = dict(host=host, port=port, username=username,
+                          password=password, pkey_string=pkey_string,
+                          pkey_file=pkey_file, branch_file=branch_file,
+                          breaker_file=module.params['breaker_file'])
+        params = dict((key, module.params[key]) for key in
+                      ('local', 'remote', 'commands'))
+        module.exit_json(**request('upload', connection, params))
+
+    # paramiko is only loaded without the daemon
+    from ansible.module_utils.remote_management.yama.sftp_client import \
+        SFTPClient
+    from ansible.module_utils.remote_management.yama.session import Session
 
-    device = SFTPClient(host, port=port, username=username, password=password,
-                        pkey_string=pkey_string, pkey_file=pkey_file)
+    if module.params['commands']:
+        device = Session(host, port=port, username=username,
+                         password=password, pkey_string=pkey_string,
+                         pkey_file=pkey_file, branch_file=branch_file)
+    else:
+        device = SFTPClient(host, port=port, username=username,
+                            password=password, pkey_string=pkey_string,
+                            pkey_file=pkey_file)
+
+    if module.params['breaker_file']:
+        device.breaker = Breaker(module.params['breaker_file'])
 
     if device.connect():
         unreachable = 0
@@ -49,6 +83,9 @@ def main():
         # Should check if files got "changed"
         changed = 1
 
+        if result and module.params['commands']:
+            result = device.commands(module.params['commands'])
+
     if device.errc():
         failed = 1
 
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import ansible.module_utils.remote_management.yama.breaker as breaker
+from ansible.module_utils.remote_management.yama.ssh_client import SSHClient
+
+
+class breaker_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    def setUp(self):
+        """Creates a temporary store.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'breaker.json')
+
+    def tearDown(self):
+        """Removes the temporary store.
+        """
+        shutil.rmtree(self.directory)
+
+    def test_open_close(self):
+        """Test that failures open the breaker and a success closes it.
+        """
+        obj = breaker.Breaker(self.filename, threshold=2, backoff=60)
+
+        self.assertTrue(obj.allow('192.0.2.1'))
+        self.assertTrue(obj.failure('192.0.2.1', 22, 2, 'timeout'))
+        self.assertEqual(obj.getstate('192.0.2.1'), 'closed')
+        self.assertTrue(obj.allow('192.0.2.1'))
+
+        self.assertTrue(obj.failure('192.0.2.1', 22, 2, 'timeout'))
+        self.assertEqual(obj.getstate('192.0.2.1'), 'open')
+        self.assertFalse(obj.allow('192.0.2.1'))
+        self.assertTrue(obj.allow('192.0.2.1', 2222))
+        self.assertTrue(obj.allow('192.0.2.2'))
+
+        self.assertTrue(obj.success('192.0.2.1'))
+        self.assertEqual(obj.getstate('192.0.2.1'), 'closed')
+        self.assertTrue(obj.allow('192.0.2.1'))
+
+    def test_half_open(self):
+        """Test that only one probe is allowed once the backoff has passed.
+        """
+        obj = breaker.Breaker(self.filename, threshold=1, backoff=0)
+
+        self.assertTrue(obj.failure('192.0.2.1', 22, 2, 'timeout'))
+        self.assertEqual(obj.getstate('192.0.2.1'), 'half-open')
+        self.assertTrue(obj.allow('192.0.2.1'))
+        self.assertFalse(obj.allow('192.0.2.1'))
+
+        other = breaker.Breaker(self.filename, threshold=1, backoff=0)
+        self.assertFalse(other.allow('192.0.2.1'))
+
+    def test_release(self):
+        """Test that a probe that failed for a non-network reason lets the
+        next caller probe again, without counting a failure.
+        """
+        obj = breaker.Breaker(self.filename, threshold=1, backoff=0)
+
+        self.assertTrue(obj.failure('192.0.2.1', 22, 2, 'timeout'))
+        self.assertTrue(obj.allow('192.0.2.1'))
+        self.assertFalse(obj.allow('192.0.2.1'))
+
+        self.assertTrue(obj.release('192.0.2.1'))
+        self.assertEqual(obj.getstate('192.0.2.1'), 'half-open')
+        self.assertTrue(obj.allow('192.0.2.1'))
+
+        self.assertTrue(obj.release('192.0.2.2'))
+
+        client = SSHClient('192.0.2.1')
+        client.breaker = obj
+        self.assertFalse(client.precheck())
+        self.assertTrue(client.postcheck(3, 'Authentication failed'))
+        self.assertTrue(client.precheck())
+
+    def test_delay(self):
+        """Test the exponential backoff and its upper limit.
+        """
+        obj = breaker.Breaker(self.filename, threshold=1, backoff=10,
+                              backoff_max=100)
+
+        self.assertTrue(5 <= obj.delay(1) <= 10)
+        self.assertTrue(20 <= obj.delay(3) <= 40)
+        self.assertTrue(50 <= obj.delay(30) <= 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
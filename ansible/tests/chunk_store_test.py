@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import os
+import random
+import shutil
+import StringIO
+import tempfile
+import threading
+import unittest
+import ansible.module_utils.remote_management.yama.chunk_store as chunk_store
+
+
+class chunk_store_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    def setUp(self):
+        """Creates a temporary store and some data.
+        """
+        self.directory = tempfile.mkdtemp()
+        generator = random.Random(1)
+        self.data = ''.join(chr(generator.randint(0, 255))
+                            for _ in range(0, 100000))
+
+    def tearDown(self):
+        """Removes the temporary store.
+        """
+        shutil.rmtree(self.directory)
+
+    def test_chunks(self):
+        """Test that an insertion only changes the chunks around it.
+        """
+        chunks0 = list(chunk_store.chunks(StringIO.StringIO(self.data)))
+        chunks1 = list(chunk_store.chunks(['x' + self.data[:50000],
+                                           self.data[50000:]]))
+
+        self.assertEqual(''.join(chunks0), self.data)
+        self.assertTrue(all(2048 <= len(chunk) <= 65536
+                            for chunk in chunks0[:-1]))
+        self.assertEqual(chunks0[1:], chunks1[1:])
+
+    def test_put_get(self):
+        """Test deduplication, restore, retention and garbage collection.
+        """
+        obj = chunk_store.ChunkStore(self.directory)
+
+        manifest0 = obj.put('r1', StringIO.StringIO(self.data), 'backup')
+        manifest1 = obj.put('r2', [self.data], 'backup')
+        self.assertEqual(manifest1['new'], 0)
+        self.assertEqual(manifest0['sha256'], manifest1['sha256'])
+
+        filename = os.path.join(self.directory, 'restore')
+        self.assertTrue(obj.get('r1', manifest0['time'], filename))
+        with open(filename) as handler:
+            self.assertEqual(handler.read(), self.data)
+
+        obj.put('r1', ['other'], 'backup')
+        self.assertEqual(len(obj.list()), 3)
+        self.assertEqual(obj.retention(keep=1), 1)
+        self.assertEqual(obj.gc(), 0)
+
+        self.assertEqual(obj.retention(keep=1, host='r2'), 0)
+        os.remove(obj.manifestpath('r2', manifest1['time']))
+        self.assertEqual(obj.gc(), len(set(manifest0['chunks'])))
+        self.assertEqual([item['host'] for item in obj.list()], ['r1'])
+
+    def test_put_concurrent(self):
+        """Test threads that store the same file at the same time, and an
+        aborted put.
+        """
+        obj = chunk_store.ChunkStore(self.directory)
+        manifests = []
+
+        def put():
+            """Stores the data.
+            """
+            manifests.append(obj.put('r1', [self.data], 'backup'))
+
+        threads = [threading.Thread(target=put) for _ in range(0, 8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(obj.errc(), 0)
+        self.assertEqual(len(set(manifest['time'] for manifest in manifests)),
+                         8)
+        self.assertEqual(len(obj.list('r1')), 8)
+
+        self.assertEqual(obj.put('r1', ['partial'], 'backup',
+                                 lambda: True), None)
+        self.assertEqual(len(obj.list('r1')), 8)
+        self.assertEqual([name for root, _, files in os.walk(self.directory)
+                          for name in files if name.endswith('.tmp')], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
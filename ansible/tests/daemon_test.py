@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import ansible.module_utils.remote_management.yama.daemon as daemon
+from ansible.module_utils.remote_management.yama.daemon_client import \
+    socket_check
+
+BRANCH_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                           'config', 'mikrotik_branch.json')
+
+
+class daemon_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    def request(self, host, port=22):
+        """Builds a get request.
+        """
+        return {'action': 'get',
+                'connection': {'host': host, 'port': port,
+                               'username': 'admin',
+                               'branch_file': BRANCH_FILE},
+                'params': {'branch': '/ip dns', 'properties': 'servers'}}
+
+    def test_errors(self):
+        """Test that the errors of a request do not reach later requests.
+        """
+        cache = daemon.SessionCache()
+
+        response = daemon.execute(cache, self.request('bad host!!'))
+        self.assertIn('bad host!!', response['msg'])
+
+        response = daemon.execute(cache, self.request('127.0.0.1', 1))
+        self.assertEqual(response['unreachable'], 1)
+        self.assertNotIn('bad host!!', response['msg'])
+        self.assertNotIn('connect:1:-1', response['msg'])
+        self.assertEqual(cache.errc(), 0)
+
+    def test_reuse(self):
+        """Test that a cached session is handed out without the history and
+        the errors of the previous request.
+        """
+        cache = daemon.SessionCache()
+        connection = self.request('127.0.0.1')['connection']
+
+        device = cache.acquire('router', connection)
+        device.history.append('/system identity print')
+        device.err(1, 'previous request')
+        self.assertTrue(cache.release(device))
+
+        self.assertIs(cache.acquire('router', connection), device)
+        self.assertEqual(device.history, [])
+        self.assertEqual(device.errc(), 0)
+
+    def test_socket_check(self):
+        """Test that only a private directory is accepted for the socket.
+        """
+        base = tempfile.mkdtemp()
+        path = os.path.join(base, 'yama', 'daemon.sock')
+
+        try:
+            self.assertFalse(socket_check(path))
+            self.assertTrue(socket_check(path, True))
+            self.assertEqual(os.stat(os.path.dirname(path)).st_mode & 0777,
+                             0700)
+
+            os.chmod(os.path.dirname(path), 0755)
+            self.assertFalse(socket_check(path, True))
+
+            os.rmdir(os.path.dirname(path))
+            os.symlink(base, os.path.dirname(path))
+            self.assertFalse(socket_check(path, True))
+        finally:
+            shutil.rmtree(base)
+
+
+if __name__ == '__main__':
+    unittest.main()
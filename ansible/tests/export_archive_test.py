@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import ansible.module_utils.remote_management.yama.export_archive as \
+    export_archive
+
+
+class export_archive_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    def setUp(self):
+        """Creates a temporary archive.
+        """
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Removes the temporary archive.
+        """
+        shutil.rmtree(self.directory)
+
+    def archive(self, obj, lines):
+        """Stages and commits an export.
+        """
+        return obj.commit('r1', obj.stage('r1', lines))
+
+    def test_changes(self):
+        """Test that only configuration changes are reported.
+        """
+        obj = export_archive.ExportArchive(self.directory)
+        lines = ['# jan/01/2018 00:00:00 by RouterOS 6.42',
+                 '/ip dns', 'set servers=192.0.2.1',
+                 '/ip firewall filter', 'add chain=input action=accept',
+                 'add chain=input action=drop']
+
+        result = self.archive(obj, lines)
+        self.assertTrue(result['changed'])
+        self.assertEqual(result['sections'], 2)
+
+        lines[0] = '# jan/02/2018 00:00:00 by RouterOS 6.42'
+        result = self.archive(obj, lines)
+        self.assertFalse(result['changed'])
+        self.assertFalse(os.path.exists(os.path.join(self.directory,
+                                                     'r1.rsc.tmp')))
+
+        lines[4] = 'add chain=input action=accept protocol=icmp'
+        lines += ['/system identity', 'set name=r1']
+        result = self.archive(obj, lines)
+        self.assertTrue(result['changed'])
+        self.assertEqual(result['modified'], ['/ip firewall filter'])
+        self.assertEqual(result['added'], ['/system identity'])
+
+        diff = export_archive.readjson(result['diff'])
+        self.assertEqual(diff['sections']['/ip firewall filter'],
+                         {'added': ['add chain=input action=accept '
+                                    'protocol=icmp'],
+                          'removed': ['add chain=input action=accept']})
+
+    def test_missing_export(self):
+        """Test that no staged export is left behind.
+        """
+        obj = export_archive.ExportArchive(self.directory)
+        staged = os.path.join(self.directory, 'r1.rsc.tmp')
+        self.archive(obj, ['/ip dns', 'set servers=192.0.2.1'])
+
+        os.remove(os.path.join(self.directory, 'r1.rsc'))
+        result = self.archive(obj, ['/ip dns', 'set servers=192.0.2.2'])
+        self.assertTrue(result['changed'])
+        self.assertEqual(result['diff'], None)
+        self.assertFalse(os.path.exists(staged))
+
+        def lines():
+            """Export that breaks off.
+            """
+            yield '/ip dns'
+            raise IOError('Connection lost')
+
+        self.assertEqual(obj.stage('r1', lines()), None)
+        self.assertFalse(os.path.exists(staged))
+
+    def test_lines_diff(self):
+        """Test that moved lines are reported.
+        """
+        self.assertEqual(export_archive.lines_diff(['a', 'b', 'c'],
+                                                   ['b', 'a', 'c']),
+                         {'added': ['b'], 'removed': ['b']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import unittest
+import ansible.module_utils.remote_management.yama.export_parser as \
+    export_parser
+
+
+class export_parser_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    lines = [
+        '# jan/02/1970 00:00:00 by RouterOS 6.42',
+        '#',
+        '/interface ethernet',
+        'set [ find default-name=ether1 ] comment="WAN \\"uplink\\"" \\\n',
+        '    name=wan\n',
+        '/ip firewall address-list',
+        'add address=192.0.2.1 comment="long \\',
+        '    value\\_here" list=ntp',
+        'add address=192.0.2.2 disabled=yes list=ntp',
+        '',
+        '/ip dns set servers=192.0.2.53',
+        '/system note',
+        'set 0 note=x'
+    ]
+
+    def test_tokenize(self):
+        """Test quotes, escapes and find groups.
+        """
+
+        self.assertEqual(export_parser.tokenize(
+            'set [ find name="a b" ] comment="x\\"y\\\\z\\41" c='),
+            ['set', '[ find name="a b" ]', 'comment=x"y\\zA', 'c='])
+
+    def test_lines_join(self):
+        """Test the continued lines, including short ones.
+        """
+
+        self.assertEqual(list(export_parser.lines_join(
+            ['a \\', '  b', '\\', 'c', 'd\\\\', ''])),
+            ['a b', 'c', 'd\\\\', ''])
+
+    def test_parse(self):
+        """Test the records of an export.
+        """
+
+        records = list(export_parser.parse(self.lines))
+
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0], export_parser.Record(
+            '/interface ethernet', 'set', {'default-name': 'ether1'},
+            {'comment': 'WAN "uplink"', 'name': 'wan'}))
+        self.assertEqual(records[1].propvals['comment'], 'long value here')
+        self.assertEqual(records[3], export_parser.Record(
+            '/ip dns', 'set', {}, {'servers': '192.0.2.53'}))
+        self.assertEqual(records[4].find, {'numbers': '0'})
+
+    def test_index(self):
+        """Test the indexes by branch and by id properties.
+        """
+
+        registry = {'/ip firewall address-list': {'id': ['list', 'address']},
+                    '/interface ethernet': {'id': ['default-name']}}
+        index = export_parser.ExportIndex(export_parser.parse(self.lines),
+                                          registry)
+
+        self.assertEqual(len(index.records('/ip firewall address-list')), 2)
+        self.assertEqual(index.lookup('/ip firewall address-list', 'ntp',
+                                      '192.0.2.2').propvals['disabled'],
+                         'yes')
+        self.assertEqual(index.lookup('/interface ethernet',
+                                      'ether1').propvals['name'], 'wan')
+        self.assertEqual(index.lookup('/ip dns'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import ansible.module_utils.remote_management.yama.fleet as fleet
+from ansible.module_utils.remote_management.yama.mikrotik import Router
+from ansible.module_utils.remote_management.yama.table import Table
+
+BRANCH_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                           'config', 'mikrotik_branch.json')
+
+
+class fleet_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    def test_mixed_inventory(self):
+        """Test that a bad entry or host does not fail the others.
+        """
+        obj = fleet.Fleet(concurrency=2, timeout=5,
+                          defaults={'branch_file': BRANCH_FILE})
+        results = obj.run([{}, 'bad host name!!',
+                           {'host': '127.0.0.1', 'port': 1}],
+                          'getinfo_identity')
+
+        self.assertEqual(results[0]['msg'], 'Invalid entry')
+        self.assertIn('bad host name!!', results[1]['msg'])
+        self.assertEqual(results[2]['unreachable'], 1)
+        self.assertNotIn('connect:1:-1', results[2]['msg'])
+        self.assertNotIn('bad host name!!', results[2]['msg'])
+
+        device = Router('127.0.0.1', port=1, branch_file=BRANCH_FILE)
+        self.assertEqual(device.status, 0)
+        self.assertEqual(device.errc(), 0)
+
+    def test_columnar_result(self):
+        """Test that columnar results are stored as JSON serializable data.
+        """
+        class Connected(Router):
+            """Router that connects without a network.
+            """
+            def connect(self, timeout=30):
+                return True
+
+        table = Table.from_rows(['name'], [['R1']])
+        obj = fleet.Fleet(defaults={'branch_file': BRANCH_FILE})
+        fleet.Router = Connected
+
+        try:
+            results = obj.run(['192.0.2.1'], lambda device: table)
+        finally:
+            fleet.Router = Router
+
+        self.assertEqual(results[0]['result'],
+                         {'columns': ['name'], 'data': {'name': ['R1']}})
+        self.assertEqual(json.loads(json.dumps(results)), results)
+        self.assertEqual(fleet.resultfix([table, None]),
+                         [table.todict(), None])
+
+    def test_sweep_finished(self):
+        """Test that only the hosts that succeeded are skipped on resume.
+        """
+        base = tempfile.mkdtemp()
+        output = os.path.join(base, 'sweep.jsonl')
+        lines = [{'host': 'a', 'port': 22, 'unreachable': 0, 'failed': 0},
+                 {'host': 'b', 'port': 22, 'unreachable': 1, 'failed': 0},
+                 {'host': 'c', 'port': 22, 'unreachable': 0, 'failed': 1}]
+
+        try:
+            with open(output, 'w') as handler:
+                for line in lines:
+                    handler.write(json.dumps(line) + '\n')
+                handler.write('{"host": "d", "po')
+
+            self.assertEqual(fleet.sweep_finished(output), set(['a:22']))
+            with open(output) as handler:
+                self.assertEqual([json.loads(line) for line in handler],
+                                 lines[:1])
+        finally:
+            shutil.rmtree(base)
+
+    def test_sweep_worker_died(self):
+        """Test that a sweep returns when a shard process dies.
+        """
+        base = tempfile.mkdtemp()
+        sweep_worker = fleet.sweep_worker
+        fleet.sweep_worker = lambda *args: os._exit(1)
+
+        try:
+            obj = fleet.Fleet()
+            results = obj.sweep(['192.0.2.1'], 'getinfo_identity',
+                                output=os.path.join(base, 'sweep.jsonl'),
+                                processes=1)
+            self.assertEqual(results['done'], 0)
+            self.assertIn('sweep:5:', obj.errors())
+        finally:
+            fleet.sweep_worker = sweep_worker
+            shutil.rmtree(base)
+
+
+if __name__ == '__main__':
+    unittest.main()
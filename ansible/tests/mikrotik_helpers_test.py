@@ -25,6 +25,161 @@ class strings_test(unittest.TestCase):
         self.assertEqual(mikrotik_helpers.properties_to_list(data_in0),
                          data_out0)
 
+    def test_exportfix(self):
+        """Test that continued lines are joined, also short ones, and that an
+        escaped backslash does not continue a line.
+        """
+
+        data_in0 = ['add a=1 \\', '    b=2', '\\', 'c', '']
+        data_out0 = ['add a=1 b=2', 'c', '']
+
+        self.assertEqual(mikrotik_helpers.exportfix(data_in0), data_out0)
+        self.assertEqual(mikrotik_helpers.exportfix(['set c="a\\\\"',
+                                                     'set d=1']),
+                         ['set c="a\\\\"', 'set d=1'])
+
+    def test_sections(self):
+        """Test that the output of a sections script is split per command.
+        """
+
+        script = mikrotik_helpers.sections_script([':put 1', ':put 2'])
+        self.assertEqual(script.count('yama-section:'), 4)
+        self.assertTrue(':do {:put 2} on-error=' in script)
+
+        lines = ['yama-section:0', 'a,b', 'c,d', 'yama-section:1',
+                 'yama-section:1:error', 'yama-section:2']
+        self.assertEqual(mikrotik_helpers.sections_split(lines, 4),
+                         [['a,b', 'c,d'], None, [], None])
+
+    def test_counters_split(self):
+        """Test that the counters line is separated from the rest.
+        """
+
+        lines = ['failure: already have such entry', '']
+        self.assertEqual(mikrotik_helpers.counters_split(lines),
+                         (None, ['failure: already have such entry']))
+
+        lines = ['yama-counters:3,0,4']
+        self.assertEqual(mikrotik_helpers.counters_split(lines),
+                         (['3', '0', '4'], []))
+
+    def test_value_quote(self):
+        """Test that only values with special characters are quoted.
+        """
+
+        self.assertEqual(mikrotik_helpers.value_quote('10.0.0.1/24'),
+                         '10.0.0.1/24')
+        self.assertEqual(mikrotik_helpers.value_quote(True), 'yes')
+        self.assertEqual(mikrotik_helpers.value_quote('a "b" $c'),
+                         '"a \\"b\\" \\$c"')
+        self.assertEqual(mikrotik_helpers.value_quote(''), '""')
+
+    def test_reconcile_plan(self):
+        """Test that the plan holds only the needed changes.
+        """
+
+        current = [{'.id': '*1', 'name': 'a', 'comment': 'x'},
+                   {'.id': '*2', 'name': 'b', 'comment': 'y'},
+                   {'.id': '*3', 'name': 'c', 'comment': ''},
+                   {'.id': '*4', 'name': 'a', 'comment': 'x'}]
+        desired = [{'name': 'a', 'comment': 'x'},
+                   {'name': 'b', 'comment': 'z'},
+                   {'name': 'd'}]
+
+        plan = mikrotik_helpers.reconcile_plan(current, desired, ['name'])
+        self.assertEqual(plan, {'add': [{'name': 'd'}],
+                                'set': [('*2', {'comment': 'z'})],
+                                'remove': []})
+
+        plan = mikrotik_helpers.reconcile_plan(current, desired, ['name'],
+                                               True)
+        self.assertEqual(plan['remove'], ['*4', '*3'])
+
+    def test_rsc(self):
+        """Test the rendering, the chunks and the errors of a bulk load.
+        """
+
+        entries = [{'list': 'a', 'address': '192.0.2.{}'.format(index)}
+                   for index in range(0, 10)]
+        lines = mikrotik_helpers.rsc_render('/ip firewall address-list',
+                                            entries, 0, False)
+        self.assertEqual(lines[1], '/ip firewall address-list add '
+                         'address=192.0.2.1 list=a')
+
+        lines = mikrotik_helpers.rsc_render('/ip firewall address-list',
+                                            entries, 5)
+        self.assertTrue(lines[0].endswith('on-error={:put "yama-error:5"}'))
+
+        chunks = list(mikrotik_helpers.rsc_chunks(lines, len(lines[0]) * 3))
+        self.assertEqual([chunk[1] for chunk in chunks], [2, 2, 2, 2, 2])
+        self.assertEqual(chunks[0][0], '\n'.join(lines[0:2]) + '\n')
+
+        self.assertEqual(mikrotik_helpers.rsc_errors(
+            ['yama-error:7', '', 'Script file loaded and executed '
+             'successfully']),
+            ([7], ['Script file loaded and executed successfully']))
+
+    def test_addresses_group(self):
+        """Test the grouping of addresses and their networks.
+        """
+
+        groups = mikrotik_helpers.addresses_group([
+            {'.id': '*1', 'address': '192.0.2.1/24', 'interface': 'ether1',
+             'network': '192.0.2.0'},
+            {'.id': '*2', 'address': '100.64.0.2/32',
+             'interface': 'pppoe-out1', 'network': '10.0.0.1'},
+            {'address': '2001:db8::1/64', 'interface': 'ether1'},
+            {'address': 'invalid', 'interface': 'ether1'}])
+
+        self.assertEqual(sorted(groups), ['ether1', 'pppoe-out1'])
+        self.assertEqual(groups['ether1'][0], {
+            '.id': '*1', 'address': '192.0.2.1', 'nbits': '24',
+            'netmask': '255.255.255.0', 'network': '192.0.2.0',
+            'broadcast': '192.0.2.255'})
+        self.assertEqual(groups['ether1'][1]['network'], '2001:db8::')
+        self.assertEqual(groups['pppoe-out1'][0]['network'], '10.0.0.1')
+        self.assertIsNone(groups['pppoe-out1'][0]['broadcast'])
+
+        self.assertEqual(mikrotik_helpers.ids_split(['*1;*2', '']),
+                         set(['*1', '*2']))
+
+    def test_csv_iter(self):
+        """Test that the streamed rows match csv_to_listdict.
+        """
+
+        properties = ['address', 'list']
+        lines = ['*1,192.0.2.1,a;b', '*2,"192.0.2.2",c']
+
+        self.assertEqual(list(mikrotik_helpers.csv_iter(properties,
+                                                        iter(lines), True)),
+                         mikrotik_helpers.csv_to_listdict(
+                             properties, lines, {'class': 'list'}, True))
+
+    def test_unit(self):
+        """Test the 'unit' wire format, with delimiters in the values.
+        """
+
+        self.assertEqual(mikrotik_helpers.values_script(['$i', '$j'], 'csv'),
+                         ':put ($i.",".$j)')
+        self.assertTrue(mikrotik_helpers.values_script(['$i'], 'unit')
+                        .endswith('[:tostr $v0]."\\1F")'))
+
+        lines = ['iss\x1f*1\x1fa, "b"; c\x1fx\x1f',
+                 'isa\x1f*2\x1fline1', 'line2\x1fp;q\x1f']
+        columns = ['.id', 'comment', 'list']
+        results = [{'.id': '*1', 'comment': 'a, "b"; c', 'list': 'x'},
+                   {'.id': '*2', 'comment': 'line1\nline2', 'list': 'p,q'}]
+
+        self.assertEqual(list(mikrotik_helpers.unit_rows(lines, columns)),
+                         results)
+        self.assertEqual(mikrotik_helpers.unit_decode(lines, columns),
+                         results)
+        self.assertEqual(mikrotik_helpers.unit_decode(lines[:1], columns),
+                         results[:1])
+        self.assertEqual(mikrotik_helpers.rows_to_csv(
+            mikrotik_helpers.unit_rows(lines[:1])),
+            ['*1,"a, ""b""; c",x'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import os
+import re
+import StringIO
+import unittest
+from ansible.module_utils.remote_management.yama.mikrotik import Router
+
+BRANCH_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                           'config', 'mikrotik_branch.json')
+
+
+class Channel(object):
+    """Channel that answers a command in small pieces.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.output = ''
+
+    def exec_command(self, command):
+        self.transport.commands.append(command)
+        self.output = self.transport.output
+        if callable(self.output):
+            self.output = self.output(command)
+
+    def recv(self, size):
+        data, self.output = self.output[:7], self.output[7:]
+        return data
+
+    def makefile(self, mode):
+        return StringIO.StringIO(self.output)
+
+    def makefile_stderr(self, mode):
+        return StringIO.StringIO('')
+
+    def close(self):
+        pass
+
+
+class Transport(object):
+    """Authenticated paramiko.Transport that returns a fixed output, or the
+    output of a function of the command.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.commands = []
+
+    def open_session(self):
+        return Channel(self)
+
+
+class mikrotik_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    output = ('iss\x1f*1\x1f  padded \x1fx\x1f\r\n'
+              'iss\x1f*2\x1fline1\r\n'
+              '\r\n'
+              '# line3\x1f\x1f\r\n')
+
+    results = [{'.id': '*1', 'comment': '  padded ', 'list': 'x'},
+               {'.id': '*2', 'comment': 'line1\n\n# line3', 'list': ''}]
+
+    def router(self, output):
+        """Builds a connected Router that answers with <output>.
+        """
+        device = Router('192.0.2.1', branch_file=BRANCH_FILE)
+        device.wireformat = 'unit'
+        device.attach(Transport(output))
+        return device
+
+    def test_unit_raw(self):
+        """Test that the 'unit' wire format keeps spaces, empty and # lines.
+        """
+        device = self.router(self.output)
+        self.assertEqual(device.getvalues('/ip firewall address-list',
+                                          'comment,list', iid=True),
+                         self.results)
+        self.assertEqual(device.errc(), 0)
+
+        device = self.router(self.output)
+        self.assertEqual(list(device.getvalues_iter(
+            '/ip firewall address-list', 'comment,list', iid=True)),
+                         self.results)
+        self.assertEqual(device.errc(), 0)
+
+    def test_chunked(self):
+        """Test that the table is searched once and each slice reads only its
+        own entries.
+        """
+        def answer(command):
+            """Answers the $id search and the slices.
+            """
+            if command.startswith(':local e'):
+                return '5\r\n*1;*2;*3;*4;*5\r\n'
+            ids = re.search(r':toarray "([^"]*)"', command).group(1)
+            start = re.search(r'yama-chunk:(\d+)', command).group(1)
+            return ''.join('{0},n{0}\r\n'.format(item)
+                           for item in ids.split(',')) + \
+                'yama-chunk:{}\r\n'.format(start)
+
+        device = self.router(answer)
+        device.wireformat = 'csv'
+        results = device.getvalues_chunked('/ip firewall address-list',
+                                           'comment', iid=True, size=2)
+
+        self.assertEqual([result['comment'] for result in results],
+                         ['n*1', 'n*2', 'n*3', 'n*4', 'n*5'])
+        self.assertEqual(len(device.transport.commands), 4)
+        self.assertEqual(len([command for command in
+                              device.transport.commands
+                              if ' find ' in command]), 1)
+
+    def test_batch_optional(self):
+        """Test that optional sections fail without an error.
+        """
+        output = ('yama-section:0\r\nR1\r\n'
+                  'yama-section:1\r\nyama-section:1:error\r\n')
+        specs = [('/system identity', 'name'),
+                 ('/system routerboard', 'serial-number')]
+
+        device = self.router(output)
+        device.wireformat = 'csv'
+        self.assertEqual(device.getvalues_batch(specs, optional=[1]),
+                         [[{'name': 'R1'}], None])
+        self.assertEqual(device.errc(), 0)
+
+        device = self.router(output)
+        device.wireformat = 'csv'
+        device.getvalues_batch(specs)
+        self.assertEqual(device.errc(), 1)
+
+    def test_interfaces_optional(self):
+        """Test that only the /ipv6 address section may fail.
+        """
+        output = ('yama-section:0\r\n*1,ether1,ether,00:00:00:00:00:01\r\n'
+                  'yama-section:1\r\n*2,10.0.0.1/24,ether1,10.0.0.0\r\n'
+                  'yama-section:2\r\nyama-section:2:error\r\n')
+
+        device = self.router(output)
+        device.wireformat = 'csv'
+        results = device.getinfo_interfaces()
+        self.assertIn('ether1', results)
+        self.assertEqual(device.errc(), 0)
+
+        output = ('yama-section:0\r\n*1,ether1,ether,00:00:00:00:00:01\r\n'
+                  'yama-section:1\r\nyama-section:1:error\r\n'
+                  'yama-section:2\r\nyama-section:2:error\r\n')
+
+        device = self.router(output)
+        device.wireformat = 'csv'
+        self.assertEqual(device.getinfo_interfaces(), None)
+        self.assertEqual(device.errc(), 2)
+
+    def test_setvalues(self):
+        """Test that the set only runs when the values differ.
+        """
+        device = self.router('8.8.8.8\r\n')
+        device.wireformat = 'csv'
+        self.assertFalse(device.setvalues('/ip dns', 'servers=8.8.8.8'))
+        self.assertEqual(len(device.transport.commands), 1)
+
+        def answer(command):
+            """Answers the read before and the set with the read after.
+            """
+            if ' set ' not in command:
+                return '1.1.1.1\r\n'
+            return ('yama-section:0\r\nyama-section:1\r\n'
+                    '8.8.8.8\r\n')
+
+        device = self.router(answer)
+        device.wireformat = 'csv'
+        self.assertTrue(device.setvalues('/ip dns', 'servers=8.8.8.8'))
+        self.assertEqual(len(device.transport.commands), 2)
+        self.assertEqual(device.errc(), 0)
+
+    def test_branch_without_id(self):
+        """Test a list branch that has no id properties in the registry.
+        """
+        device = self.router('')
+        device.branch['/ip test'] = {'class': 'list', 'readonly': False}
+
+        self.assertEqual(device.reconcile('/ip test', [{'name': 'a'}]), None)
+        self.assertIn('reconcile:3:/ip test', device.errors())
+
+    def test_branch_missing(self):
+        """Test that a missing branch file leaves the Router not ready.
+        """
+        device = Router('192.0.2.1', branch_file='/nonexistent.json')
+
+        self.assertEqual(device.errc(), 1)
+        self.assertIn('__init__:5:/nonexistent.json', device.errors())
+        self.assertEqual(device.status, -1)
+        self.assertEqual(Router('192.0.2.1', branch_file=BRANCH_FILE).errc(),
+                         0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import errno
+import socket
+import unittest
+from ansible.module_utils.remote_management.yama import prescan
+
+
+class Socket(object):
+    """Non-blocking socket whose connect returns the next errno of <codes>.
+    """
+
+    def __init__(self, codes):
+        self.codes = codes
+
+    def setblocking(self, flag):
+        pass
+
+    def connect_ex(self, address):
+        return self.codes.pop(0)
+
+    def close(self):
+        pass
+
+
+class prescan_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    def setUp(self):
+        self.socket = socket.socket
+
+    def tearDown(self):
+        socket.socket = self.socket
+
+    def test_scan_state(self):
+        """Test the classification of connect errnos.
+        """
+        self.assertEqual(prescan.scan_state(0), prescan.REACHABLE)
+        self.assertEqual(prescan.scan_state(errno.ECONNREFUSED),
+                         prescan.REFUSED)
+        self.assertEqual(prescan.scan_state(errno.ETIMEDOUT),
+                         prescan.FILTERED)
+        self.assertEqual(prescan.scan_state(errno.EHOSTUNREACH),
+                         prescan.UNREACHABLE)
+
+    def test_scan_local(self):
+        """Test that local errors are retried once and then left out.
+        """
+        codes = [errno.EMFILE, errno.ECONNREFUSED, errno.ENOBUFS]
+        socket.socket = lambda *args: Socket(codes)
+
+        results = prescan.scan(['127.0.0.1', ('127.0.0.1', 2222),
+                                '127.0.0.1'], limit=1)
+
+        self.assertEqual(results, {'127.0.0.1:2222': prescan.REFUSED})
+        self.assertEqual(codes, [])
+
+    def test_scan_limit(self):
+        """Test that a batch stays below the limit of open files.
+        """
+        self.assertEqual(prescan.scan_limit(1), 1)
+        self.assertTrue(prescan.scan_limit(10 ** 9) < 10 ** 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
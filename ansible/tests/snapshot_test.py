@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import unittest
+import ansible.module_utils.remote_management.yama.snapshot as snapshot
+
+
+class snapshot_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    lines = [
+        '/ip dns',
+        'set allow-remote-requests=yes cache-size=2048KiB \\',
+        '    servers=192.0.2.1,192.0.2.2',
+        '/ip firewall address-list',
+        'add address=192.0.2.1 comment="a \\"b\\"" list=ntp',
+        'add address=192.0.2.2 list=dns',
+        '/user group',
+        'set [ find name=full ] policy=local,ssh'
+    ]
+
+    settings = {'class': 'settings', 'dynamic': False}
+    static = {'class': 'list', 'dynamic': False}
+
+    def test_getvalues(self):
+        """Test the queries that are answered from memory.
+        """
+        obj = snapshot.Snapshot()
+        self.assertTrue(obj.load(self.lines))
+
+        self.assertEqual(obj.getvalues('/ip dns', self.settings,
+                                       ['servers', 'allow-remote-requests']),
+                         [{'servers': '192.0.2.1,192.0.2.2',
+                           'allow-remote-requests': 'true'}])
+        self.assertEqual(obj.getvalues('/ip firewall address-list',
+                                       self.static, ['comment'], 'list=ntp'),
+                         [{'comment': 'a "b"'}])
+        self.assertEqual(obj.getvalues('/user group', self.static,
+                                       ['policy'], 'name=full'),
+                         [{'policy': 'local,ssh'}])
+
+    def test_fallback(self):
+        """Test the queries that are left to the router.
+        """
+        obj = snapshot.Snapshot()
+        obj.load(self.lines)
+
+        self.assertEqual(obj.getvalues('/ip dns', self.settings,
+                                       ['missing']), None)
+        self.assertEqual(obj.getvalues('/ip firewall address-list',
+                                       self.static, ['address'], 'ntp'),
+                         None)
+        self.assertEqual(obj.getvalues('/ip firewall address-list',
+                                       self.static, ['address'], '', True),
+                         None)
+
+        obj.invalidate('/ip dns')
+        self.assertEqual(obj.getvalues('/ip dns', self.settings,
+                                       ['servers']), None)
+        self.assertTrue(obj.fresh())
+        obj.invalidate()
+        self.assertFalse(obj.fresh())
+
+        obj = snapshot.Snapshot(ttl=-1)
+        obj.load(self.lines)
+        self.assertFalse(obj.fresh())
+
+
+if __name__ == '__main__':
+    unittest.main()
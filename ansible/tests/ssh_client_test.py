@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import unittest
+from ansible.module_utils.remote_management.yama.ssh_client import SSHClient
+
+
+class Shell(object):
+    """Console that echoes every line after a prompt, like RouterOS, and
+    sends its output in small pieces with escape sequences.
+    """
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.pending = 'MikroTik RouterOS\r\n\r\n\x1b[9999B'
+
+    def get_pty(self, **kwargs):
+        pass
+
+    def invoke_shell(self):
+        pass
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, data):
+        line = data.strip()
+        self.pending += '\x1b[m[admin@R1] > ' + line + '\r\n'
+
+        if line.startswith(':put "'):
+            self.pending += line[6:-1] + '\r\n'
+        else:
+            self.pending += self.outputs.get(line, '')
+
+    def recv(self, size):
+        data, self.pending = self.pending[:5], self.pending[5:]
+        return data
+
+    def close(self):
+        pass
+
+
+class Transport(object):
+    """Authenticated paramiko.Transport with a fake console.
+    """
+
+    def __init__(self, shell):
+        self.shell = shell
+
+    def open_session(self):
+        if self.shell is None:
+            raise IOError('No console')
+        return self.shell
+
+
+class ssh_client_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    def client(self, shell):
+        """Builds a connected SSHClient with the console <shell>.
+        """
+        obj = SSHClient('192.0.2.1')
+        obj.attach(Transport(shell))
+        return obj
+
+    def test_shell(self):
+        """Test the sentinels, the prompt and the escape sequences.
+        """
+        shell = Shell({'/system identity print': '  name: R1\r\n\r\n'})
+        obj = self.client(shell)
+
+        self.assertTrue(obj.shell_open())
+        self.assertEqual(obj.shell_prompt, '[admin@R1]')
+        self.assertEqual(obj.command('/system identity print', True),
+                         ['  name: R1', ''])
+        self.assertEqual(obj.command('/system identity print'),
+                         ['name: R1'])
+        self.assertEqual(obj.errc(), 0)
+
+    def test_shell_failed(self):
+        """Test that a failed console leaves no shell or connection behind.
+        """
+        obj = self.client(None)
+
+        self.assertFalse(obj.shell_open())
+        self.assertEqual(obj.shell, None)
+        self.assertIn('shell_open:2:', obj.errors())
+
+        calls = []
+        obj = self.client(None)
+        obj.status = 0
+        obj.connect = lambda: setattr(obj, 'status', 1) or True
+        obj.disconnect = lambda: calls.append('disconnect')
+
+        self.assertFalse(obj.shell_open())
+        self.assertEqual(calls, ['disconnect'])
+
+
+if __name__ == '__main__':
+    unittest.main()
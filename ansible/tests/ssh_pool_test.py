@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import unittest
+from ansible.module_utils.remote_management.yama.ssh_pool import SSHPool
+from ansible.module_utils.remote_management.yama.ssh_client import SSHClient
+
+
+class Transport(object):
+    """Authenticated paramiko.Transport.
+    """
+
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+    def send_ignore(self):
+        if not self.active:
+            raise EOFError()
+
+    def close(self):
+        self.active = False
+
+
+class ssh_pool_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    def client(self, host='192.0.2.1', password='secret'):
+        """Builds a SSHClient that connects with a new fake transport.
+        """
+        obj = SSHClient(host, username='admin', password=password)
+        obj.connect = lambda timeout=30: obj.attach(Transport())
+        return obj
+
+    def test_reuse(self):
+        """Test that a released transport is handed out again, to the same
+        credentials only.
+        """
+        pool = SSHPool()
+        client0 = self.client()
+
+        self.assertTrue(pool.connect(client0))
+        transport = client0.gettransport()
+        self.assertTrue(client0.disconnect())
+        self.assertEqual(client0.status, 0)
+        self.assertTrue(transport.is_active())
+
+        client1 = self.client()
+        self.assertTrue(pool.connect(client1))
+        self.assertIs(client1.gettransport(), transport)
+
+        client2 = self.client(password='other')
+        self.assertTrue(pool.connect(client2))
+        self.assertIsNot(client2.gettransport(), transport)
+
+        self.assertEqual(pool.getstats(), {'hits': 1, 'misses': 2,
+                                           'evictions': 0, 'idle': 0,
+                                           'leased': 2})
+
+    def test_evict(self):
+        """Test the eviction of dead and expired transports and the limit
+        per host.
+        """
+        pool = SSHPool(max_host=1)
+        client0 = self.client()
+        pool.connect(client0)
+        transport = client0.gettransport()
+        client0.disconnect()
+
+        transport.active = False
+        client1 = self.client()
+        self.assertTrue(pool.connect(client1))
+        self.assertIsNot(client1.gettransport(), transport)
+        self.assertEqual(pool.getstats()['evictions'], 1)
+
+        self.assertFalse(pool.connect(self.client()))
+        self.assertIn('connect:1:192.0.2.1', pool.errors())
+
+        transport = client1.gettransport()
+        client1.disconnect()
+        pool.ttl = -1
+        self.assertEqual(pool.evict(), 1)
+        self.assertFalse(transport.is_active())
+        self.assertEqual(pool.getstats()['idle'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Michail Topaloudis
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unit tests"""
+
+import unittest
+import ansible.module_utils.remote_management.yama.table as table
+import ansible.module_utils.remote_management.yama.mikrotik_helpers as \
+    mikrotik_helpers
+
+
+class table_test(unittest.TestCase):
+    """Declaring unittest class for testing handled below.
+    """
+
+    properties = ['address', 'list', 'comment']
+    lines = [
+        '*1,192.0.2.1,ntp,"a,b"',
+        '*2,192.0.2.2,ntp,',
+        '*3,192.0.2.3,dns;ntp,'
+    ]
+
+    def test_from_csv(self):
+        """Test that a table converts to the results of csv_to_listdict.
+        """
+        obj = table.Table.from_csv(self.properties, self.lines, True)
+
+        self.assertEqual(len(obj), 3)
+        self.assertEqual(obj.columns, ['.id'] + self.properties)
+        self.assertEqual(obj.column('list'), ['ntp', 'ntp', 'dns,ntp'])
+        self.assertIs(obj.column('list')[0], obj.column('list')[1])
+        self.assertEqual(obj.tolistdict(), mikrotik_helpers.csv_to_listdict(
+            self.properties, self.lines, {'class': 'list'}, True))
+
+    def test_rows(self):
+        """Test the row views.
+        """
+        obj = table.Table.from_listdict(['address', 'list'], [
+            {'address': '192.0.2.1', 'list': 'ntp'},
+            {'address': '192.0.2.2'}])
+
+        self.assertEqual(obj[0]['address'], '192.0.2.1')
+        self.assertEqual(dict(obj[-1]), {'address': '192.0.2.2', 'list': ''})
+        self.assertEqual([row['list'] for row in obj], ['ntp', ''])
+        self.assertRaises(IndexError, lambda: obj[2])
+
+    def test_short_rows(self):
+        """Test that short rows are padded and the JSON form.
+        """
+        obj = table.Table.from_csv(self.properties, ['*1,192.0.2.1',
+                                                     '*2,192.0.2.2,ntp,x'],
+                                   True)
+
+        self.assertEqual(obj.column('list'), ['', 'ntp'])
+        self.assertEqual(obj.column('comment'), ['', 'x'])
+        self.assertEqual(obj.todict(), {
+            'columns': ['.id'] + self.properties,
+            'data': {'.id': ['*1', '*2'],
+                     'address': ['192.0.2.1', '192.0.2.2'],
+                     'list': ['', 'ntp'], 'comment': ['', 'x']}})
+
+    def test_from_unit(self):
+        """Test the columns of the 'unit' wire format.
+        """
+        lines = ['iss\x1f*1\x1f192.0.2.1\x1fntp\x1f',
+                 'iss\x1f*2\x1f192.0.2.2\x1fntp\x1f']
+        obj = table.Table.from_unit(['address', 'list'], lines, True)
+
+        self.assertEqual(obj.column('.id'), ['*1', '*2'])
+        self.assertIs(obj.column('list')[0], obj.column('list')[1])
+
+        lines[1] = 'isa\x1f*2\x1f192.0.2.2\x1fa;b\x1f'
+        obj = table.Table.from_unit(['address', 'list'], lines, True)
+        self.assertEqual(obj.column('list'), ['ntp', 'a,b'])
+
+
+if __name__ == '__main__':
+    unittest.main()